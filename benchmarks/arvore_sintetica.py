@@ -0,0 +1,157 @@
+# Gera uma árvore de arquivos sintética e reproduzível (mesma semente, mesmos
+# bytes) para os benchmarks: JPEG e PNG com EXIF, vídeos pequenos,
+# documentos, com uma fração de cópias idênticas espalhadas em outras pastas.
+# Uso direto:
+#   python benchmarks/arvore_sintetica.py /tmp/arvore --jpegs 500 --duplicados 0.2
+import argparse
+import json
+import math
+import os
+import random
+import shutil
+
+from PIL import Image
+
+try:
+    import cv2
+    import numpy as np
+except ImportError:
+    # Sem OpenCV os "vídeos" são só bytes com extensão de vídeo: o scan
+    # ainda passa por eles, mas não extrai duração
+    cv2 = None
+
+PASTAS_POR_NIVEL = 4
+PROFUNDIDADE = 3
+# Documentos: tamanho log-normal em torno da mediana (KB)
+MEDIANA_DOC_KB = 64
+DISPERSAO_DOC = 1.0
+# Lado das imagens (pixels), sorteado entre os dois
+LADO_MINIMO = 320
+LADO_MAXIMO = 1600
+TAG_DATA_ORIGINAL = 0x9003
+
+
+def _pastas(raiz):
+    # Árvore fixa de PASTAS_POR_NIVEL ** PROFUNDIDADE folhas
+    pastas = ['']
+    for nivel in range(PROFUNDIDADE):
+        pastas = [os.path.join(p, f'n{nivel}_{i}')
+                  for p in pastas for i in range(PASTAS_POR_NIVEL)]
+    for pasta in pastas:
+        os.makedirs(os.path.join(raiz, pasta), exist_ok=True)
+    return pastas
+
+
+def _data(rnd):
+    return (f'{rnd.randint(2005, 2024)}:{rnd.randint(1, 12):02d}:{rnd.randint(1, 28):02d} '
+            f'{rnd.randint(0, 23):02d}:{rnd.randint(0, 59):02d}:{rnd.randint(0, 59):02d}')
+
+
+def _imagem(path, rnd, formato):
+    # Gradiente com ruído: comprime como foto, não como cor sólida
+    largura = rnd.randint(LADO_MINIMO, LADO_MAXIMO)
+    altura = rnd.randint(LADO_MINIMO, LADO_MAXIMO)
+    pequena = Image.frombytes('RGB', (16, 12), rnd.randbytes(16 * 12 * 3))
+    img = pequena.resize((largura, altura), Image.Resampling.BILINEAR)
+    exif = Image.Exif()
+    exif[TAG_DATA_ORIGINAL] = _data(rnd)
+    if formato == 'JPEG':
+        img.save(path, 'JPEG', quality=85, exif=exif)
+    else:
+        img.save(path, 'PNG', exif=exif)
+
+
+def _video(path, rnd, quadros=24):
+    if cv2 is None:
+        with open(path, 'wb') as f:
+            f.write(rnd.randbytes(rnd.randint(50, 200) * 1024))
+        return
+    escritor = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'MJPG'), 12, (160, 120))
+    base = np.frombuffer(rnd.randbytes(120 * 160 * 3), dtype=np.uint8).reshape(120, 160, 3)
+    for n in range(quadros):
+        escritor.write(np.roll(base, n * 4, axis=1))
+    escritor.release()
+
+
+def _documento(path, rnd, mediana_kb):
+    kb = max(1, int(rnd.lognormvariate(math.log(mediana_kb), DISPERSAO_DOC)))
+    with open(path, 'wb') as f:
+        f.write(rnd.randbytes(kb * 1024))
+
+
+def gerar_arvore(raiz, jpegs=200, pngs=50, videos=10, documentos=100, duplicados=0.2,
+                 mediana_doc_kb=MEDIANA_DOC_KB, semente=0):
+    # duplicados: fração dos arquivos que são cópias de um original já gerado,
+    # gravadas em outra pasta. Devolve o manifesto (contagens e bytes).
+    rnd = random.Random(semente)
+    pastas = _pastas(raiz)
+    tipos = (['jpg'] * jpegs + ['png'] * pngs +
+             ['avi'] * videos + ['pdf'] * documentos)
+    rnd.shuffle(tipos)
+    originais = []
+    manifesto = {'semente': semente, 'arquivos': 0, 'copias': 0, 'bytes': 0,
+                 'por_ext': {}}
+    for n, ext in enumerate(tipos):
+        path = os.path.join(raiz, rnd.choice(pastas), f'arq{n:07d}.{ext}')
+        if originais and rnd.random() < duplicados:
+            shutil.copy2(rnd.choice(originais), path)
+            manifesto['copias'] += 1
+        else:
+            if ext == 'jpg':
+                _imagem(path, rnd, 'JPEG')
+            elif ext == 'png':
+                _imagem(path, rnd, 'PNG')
+            elif ext == 'avi':
+                _video(path, rnd)
+            else:
+                _documento(path, rnd, mediana_doc_kb)
+            originais.append(path)
+        manifesto['arquivos'] += 1
+        manifesto['bytes'] += os.path.getsize(path)
+        manifesto['por_ext'][ext] = manifesto['por_ext'].get(ext, 0) + 1
+    return manifesto
+
+
+def alterar_arquivos(raiz, fracao, semente=1):
+    # Para o scan delta: acrescenta bytes a uma fração dos arquivos
+    rnd = random.Random(semente)
+    alterados = 0
+    for pasta, _, nomes in os.walk(raiz):
+        for nome in sorted(nomes):
+            if rnd.random() < fracao:
+                with open(os.path.join(pasta, nome), 'ab') as f:
+                    f.write(rnd.randbytes(16))
+                alterados += 1
+    return alterados
+
+
+def add_arvore_args(parser):
+    parser.add_argument('--jpegs', type=int, default=200,
+                        help='JPEGs com EXIF (padrão: 200)')
+    parser.add_argument('--pngs', type=int, default=50,
+                        help='PNGs com EXIF (padrão: 50)')
+    parser.add_argument('--videos', type=int, default=10,
+                        help='Vídeos pequenos (MJPG/AVI; padrão: 10)')
+    parser.add_argument('--documentos', type=int, default=100,
+                        help='Documentos de bytes aleatórios (padrão: 100)')
+    parser.add_argument('--duplicados', type=float, default=0.2,
+                        help='Fração de cópias idênticas (padrão: 0.2)')
+    parser.add_argument('--mediana-doc-kb', type=int, default=MEDIANA_DOC_KB,
+                        help=f'Mediana do tamanho dos documentos em KB (padrão: {MEDIANA_DOC_KB})')
+    parser.add_argument('--semente', type=int, default=0,
+                        help='Semente do gerador (padrão: 0)')
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Gera uma árvore sintética para benchmarks')
+    parser.add_argument('raiz', help='Pasta de destino (criada se não existir)')
+    add_arvore_args(parser)
+    args = parser.parse_args()
+    manifesto = gerar_arvore(args.raiz, args.jpegs, args.pngs, args.videos, args.documentos,
+                             args.duplicados, args.mediana_doc_kb, args.semente)
+    print(json.dumps(manifesto, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+# Mede a busca de phash similares com hashes aleatórios (mais alguns
+# quase iguais para formar grupos). Uso:
+#   python benchmarks/bench_phash.py --n 1000000 --k 6
+#   python benchmarks/bench_phash.py --n 20000 --numpy --bk
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from phash_utils import (DISTANCIA_SIMILAR, grupos_similares,  # noqa: E402
+                         grupos_similares_faixas, grupos_similares_numpy)
+
+
+def gerar_itens(n, semente=0):
+    # 90% hashes independentes, 10% cópias com até 3 bits trocados
+    rnd = random.Random(semente)
+    itens = []
+    for id_ in range(n):
+        if itens and rnd.random() < 0.1:
+            h = rnd.choice(itens)[1]
+            for _ in range(rnd.randint(0, 3)):
+                h ^= 1 << rnd.randrange(64)
+        else:
+            h = rnd.getrandbits(64)
+        itens.append((id_, h))
+    return itens
+
+
+def medir(nome, fn, itens, k):
+    inicio = time.perf_counter()
+    grupos = fn(itens, k)
+    segundos = time.perf_counter() - inicio
+    n = len({h for _, h in itens})
+    comparacoes = n * (n - 1) / 2
+    print(f"{nome:>6}: {segundos:8.2f} s  {len(grupos):7d} grupos  "
+          f"{segundos / comparacoes * 1e6 * 1000:8.3f} ms por milhão de pares "
+          f"({comparacoes / segundos / 1e6:8.1f} M pares/s)")
+    return grupos
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Benchmark da busca por hash perceptual')
+    parser.add_argument('--n', type=int, default=100000,
+                        help='Quantidade de hashes (padrão: 100000)')
+    parser.add_argument('--k', type=int, default=DISTANCIA_SIMILAR,
+                        help=f'Distância máxima (padrão: {DISTANCIA_SIMILAR})')
+    parser.add_argument('--numpy', action='store_true',
+                        help='Mede também a força bruta em blocos e confere se os grupos batem')
+    parser.add_argument('--bk', action='store_true',
+                        help='Mede também a árvore BK e confere se os grupos batem')
+    args = parser.parse_args()
+    itens = gerar_itens(args.n)
+    print(f"[i] {args.n} hashes, k={args.k}")
+    grupos = medir('faixas', grupos_similares_faixas, itens, args.k)
+    for nome, ativo, fn in (('numpy', args.numpy, grupos_similares_numpy),
+                            ('bk', args.bk, grupos_similares)):
+        if ativo:
+            outros = medir(nome, fn, itens, args.k)
+            print('[✓] Mesmos grupos' if grupos ==
+                  outros else '[!] Grupos diferentes')
+
+
+if __name__ == '__main__':
+    main()
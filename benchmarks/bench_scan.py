@@ -0,0 +1,232 @@
+# Mede o scanner e as consultas sobre uma árvore sintética (arvore_sintetica):
+# scan completo, delta sem alteração, delta com alterações, busca de
+# duplicados e miniaturas. Tudo roda numa pasta temporária, sem rede.
+# Os resultados vão para JSON, para comparar uma execução com outra. Uso:
+#   python benchmarks/bench_scan.py --jpegs 2000 --saida antes.json
+#   python benchmarks/bench_scan.py --jpegs 2000 --saida depois.json --comparar antes.json
+import argparse
+import contextlib
+import datetime
+import json
+import os
+import platform
+import shutil
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+RAIZ_PROJETO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ_PROJETO)
+
+import encontra_repetidos_sqlite as scanner  # noqa: E402
+from arvore_sintetica import (add_arvore_args, alterar_arquivos,  # noqa: E402
+                              gerar_arvore)
+from db_utils import buscar_duplicadas, ensure_indices, get_connection  # noqa: E402
+from file_exts import IMG_EXTS  # noqa: E402
+from image_utils import gerar_miniatura  # noqa: E402
+from metricas_utils import Metricas  # noqa: E402
+from paginacao_utils import FonteDuplicadas  # noqa: E402
+from thumb_cache_utils import CacheMiniaturas  # noqa: E402
+
+TAMANHO_MINIATURA = 256
+
+
+class Medidas:
+    # nome -> lista de segundos (uma por repetição) e itens processados
+    def __init__(self):
+        self.segundos = {}
+        self.itens = {}
+
+    @contextlib.contextmanager
+    def medir(self, nome, itens=None):
+        inicio = time.perf_counter()
+        yield
+        self.segundos.setdefault(nome, []).append(time.perf_counter() - inicio)
+        if itens is not None:
+            self.itens[nome] = itens
+
+    def resultados(self):
+        saida = {}
+        for nome, tempos in self.segundos.items():
+            melhor = min(tempos)
+            r = {'min_s': round(melhor, 4), 'mediana_s': round(statistics.median(tempos), 4),
+                 'execucoes_s': [round(t, 4) for t in tempos]}
+            if nome in self.itens:
+                r['itens'] = self.itens[nome]
+                r['itens_s'] = round(self.itens[nome] / melhor, 1) if melhor else None
+            saida[nome] = r
+        return saida
+
+
+def abrir_banco(path):
+    conn = sqlite3.connect(path)
+    scanner.create_table(conn)
+    scanner.apply_scan_pragmas(conn)
+    return conn
+
+
+def rodar_scan(conn, raiz, args, delta=False):
+    # Mesmo caminho do run_scan, sem handler de Ctrl+C e sem a saída na tela
+    pool = scanner.ScanPool(args.workers, use_processes=args.processos, metricas=Metricas())
+    writer = scanner.BatchWriter(conn, args.batch_size, pool.metricas)
+    with open(os.devnull, 'w') as nulo, contextlib.redirect_stdout(nulo):
+        if delta:
+            scanner.update_only_changes([raiz], conn, size_first=args.tamanho_primeiro,
+                                        staged=args.hash_em_estagios, pool=pool, writer=writer)
+        else:
+            scanner.collect_metadata_to_db([raiz], conn, size_first=args.tamanho_primeiro,
+                                           staged=args.hash_em_estagios, pool=pool, writer=writer)
+    pool.shutdown()
+    return pool.metricas.snapshot()
+
+
+def medir_consultas(medidas, db_path):
+    conn = get_connection(db_path)
+    with medidas.medir('indices'):
+        ensure_indices(conn)
+    grupos = []
+    with medidas.medir('busca_duplicadas'):
+        grupos = buscar_duplicadas(conn, 'todos')
+    medidas.itens['busca_duplicadas'] = sum(len(g) for g in grupos)
+    with medidas.medir('busca_duplicadas_sem_data'):
+        grupos = buscar_duplicadas(conn, 'todos', considerar_data_criacao=False)
+    medidas.itens['busca_duplicadas_sem_data'] = sum(len(g) for g in grupos)
+    fonte = FonteDuplicadas(conn)
+    with medidas.medir('paginacao_carregar'):
+        fonte.carregar('todos')
+    medidas.itens['paginacao_carregar'] = fonte.total
+    conn.close()
+
+
+def medir_miniaturas(medidas, db_path, pasta, limite):
+    conn = get_connection(db_path)
+    linhas = conn.execute(
+        f"SELECT * FROM arquivos WHERE ext IN ({','.join(['?'] * len(IMG_EXTS))}) ORDER BY id LIMIT ?",
+        (*IMG_EXTS, limite)).fetchall()
+    conn.close()
+    with medidas.medir('miniaturas', len(linhas)):
+        for row in linhas:
+            gerar_miniatura(row['path'], TAMANHO_MINIATURA)
+    cache_path = os.path.join(pasta, 'miniaturas.db')
+    if os.path.exists(cache_path):
+        os.remove(cache_path)
+    cache = CacheMiniaturas(cache_path)
+    for nome in ('miniaturas_cache_fria', 'miniaturas_cache_quente'):
+        with medidas.medir(nome, len(linhas)):
+            for row in linhas:
+                cache.obter(row, TAMANHO_MINIATURA,
+                            lambda size, path=row['path']: gerar_miniatura(path, size))
+    cache.conn.close()
+
+
+def versao_git():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=RAIZ_PROJETO,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def comparar(resultados, anterior_path):
+    with open(anterior_path, encoding='utf-8') as f:
+        anterior = json.load(f)['resultados']
+    print(f"\n{'medida':<28}{'antes (s)':>12}{'agora (s)':>12}{'variação':>10}")
+    for nome, r in resultados.items():
+        if nome not in anterior:
+            continue
+        antes, agora = anterior[nome]['min_s'], r['min_s']
+        variacao = f"{(agora - antes) / antes * 100:+.1f}%" if antes else '-'
+        print(f"{nome:<28}{antes:>12.4f}{agora:>12.4f}{variacao:>10}")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Benchmark do scan, do delta, da busca de duplicados e das miniaturas')
+    add_arvore_args(parser)
+    parser.add_argument('--repeticoes', type=int, default=3,
+                        help='Execuções de cada medida; vale a menor (padrão: 3)')
+    parser.add_argument('--alterados', type=float, default=0.05,
+                        help='Fração de arquivos alterados antes do delta com alterações (padrão: 0.05)')
+    parser.add_argument('--miniaturas', type=int, default=100,
+                        help='Imagens usadas na medida de miniaturas (padrão: 100)')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help='Workers do scan (padrão: núcleos da CPU)')
+    parser.add_argument('--processos', action='store_true',
+                        help='Usa processos para verify/EXIF do Pillow')
+    parser.add_argument('--batch-size', type=int, default=scanner.BATCH_SIZE,
+                        help=f'Linhas por commit (padrão: {scanner.BATCH_SIZE})')
+    parser.add_argument('--tamanho-primeiro', action='store_true',
+                        help='Scan com hash só de tamanhos repetidos')
+    parser.add_argument('--hash-em-estagios', action='store_true',
+                        help='Scan com hash em estágios')
+    parser.add_argument('--pasta', help='Pasta de trabalho (padrão: temporária, apagada no fim)')
+    parser.add_argument('--saida', help='Arquivo JSON com os resultados')
+    parser.add_argument('--comparar', metavar='JSON',
+                        help='Resultados anteriores para comparar')
+    args = parser.parse_args()
+
+    pasta = args.pasta or tempfile.mkdtemp(prefix='bench_scan_')
+    raiz = os.path.join(pasta, 'arvore')
+    medidas = Medidas()
+    try:
+        if os.path.exists(raiz):
+            shutil.rmtree(raiz)
+        inicio = time.perf_counter()
+        manifesto = gerar_arvore(raiz, args.jpegs, args.pngs, args.videos, args.documentos,
+                                 args.duplicados, args.mediana_doc_kb, args.semente)
+        print(f"[i] Árvore: {manifesto['arquivos']} arquivos ({manifesto['copias']} cópias), "
+              f"{manifesto['bytes'] / 1024 / 1024:.1f} MB em {time.perf_counter() - inicio:.1f} s")
+        metricas = {}
+        for n in range(args.repeticoes):
+            db_path = os.path.join(pasta, 'arquivos.db')
+            for sufixo in ('', '-wal', '-shm'):
+                if os.path.exists(db_path + sufixo):
+                    os.remove(db_path + sufixo)
+            conn = abrir_banco(db_path)
+            with medidas.medir('scan_completo', manifesto['arquivos']):
+                metricas['scan_completo'] = rodar_scan(conn, raiz, args)
+            with medidas.medir('delta_sem_alteracao', manifesto['arquivos']):
+                metricas['delta_sem_alteracao'] = rodar_scan(conn, raiz, args, delta=True)
+            conn.close()
+            medir_consultas(medidas, db_path)
+            medir_miniaturas(medidas, db_path, pasta, args.miniaturas)
+            # Por último: muda os arquivos para as próximas repetições também
+            alterados = alterar_arquivos(raiz, args.alterados, semente=args.semente + n + 1)
+            conn = abrir_banco(db_path)
+            with medidas.medir('delta_com_alteracao', manifesto['arquivos']):
+                metricas['delta_com_alteracao'] = rodar_scan(conn, raiz, args, delta=True)
+            conn.close()
+            print(f"[i] Repetição {n + 1}/{args.repeticoes} ({alterados} arquivos alterados)")
+    finally:
+        if not args.pasta:
+            shutil.rmtree(pasta, ignore_errors=True)
+
+    resultados = medidas.resultados()
+    print(f"\n{'medida':<28}{'min (s)':>10}{'mediana (s)':>13}{'itens/s':>12}")
+    for nome, r in resultados.items():
+        itens_s = f"{r['itens_s']:.1f}" if r.get('itens_s') else '-'
+        print(f"{nome:<28}{r['min_s']:>10.4f}{r['mediana_s']:>13.4f}{itens_s:>12}")
+    if args.comparar:
+        comparar(resultados, args.comparar)
+    if args.saida:
+        relatorio = {
+            'instante': datetime.datetime.now().isoformat(timespec='seconds'),
+            'git': versao_git(),
+            'maquina': {'sistema': platform.platform(), 'python': platform.python_version(),
+                        'cpus': os.cpu_count()},
+            'parametros': {k: v for k, v in vars(args).items() if k not in ('saida', 'comparar')},
+            'arvore': manifesto,
+            'resultados': resultados,
+            # Tempo por etapa da última repetição (ver metricas_utils)
+            'metricas': metricas,
+        }
+        with open(args.saida, 'w', encoding='utf-8') as f:
+            json.dump(relatorio, f, indent=2, ensure_ascii=False)
+        print(f"\n[✓] Resultados em {args.saida}")
+
+
+if __name__ == '__main__':
+    main()
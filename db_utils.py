@@ -2,6 +2,8 @@ import sqlite3
 from pathlib import Path
 
 from file_exts import DOC_EXTS, IMG_EXTS, VIDEO_EXTS
+from phash_utils import (DISTANCIA_SIMILAR, de_int64, grupos_similares,
+                         grupos_similares_faixas, grupos_similares_numpy)
 
 
 def ensure_ignorado_column(conn):
@@ -14,6 +16,38 @@ def ensure_ignorado_column(conn):
         conn.commit()
 
 
+def ensure_phash_column(conn):
+    # Bancos de antes do hash perceptual e da assinatura de vídeo
+    # (o scanner preenche na próxima passada)
+    cur = conn.cursor()
+    cur.execute("PRAGMA table_info(arquivos)")
+    columns = [row[1] for row in cur.fetchall()]
+    if 'phash' not in columns:
+        cur.execute("ALTER TABLE arquivos ADD COLUMN phash INTEGER")
+    if 'assinatura' not in columns:
+        cur.execute("ALTER TABLE arquivos ADD COLUMN assinatura BLOB")
+    conn.commit()
+
+
+def ensure_dedup_columns(conn):
+    # dedup: 'hardlink' ou 'reflink'; dedup_origem: id do arquivo mantido
+    cur = conn.cursor()
+    cur.execute("PRAGMA table_info(arquivos)")
+    columns = [row[1] for row in cur.fetchall()]
+    if 'dedup' not in columns:
+        cur.execute("ALTER TABLE arquivos ADD COLUMN dedup TEXT")
+    if 'dedup_origem' not in columns:
+        cur.execute("ALTER TABLE arquivos ADD COLUMN dedup_origem INTEGER")
+    conn.commit()
+
+
+def marcar_ignorados(conn, paths):
+    # Lote: alterna o ignorado de todos os paths numa única transação
+    with conn:
+        conn.executemany(
+            "UPDATE arquivos SET ignorado = NOT IFNULL(ignorado,0) WHERE path=?", ((p,) for p in paths))
+
+
 def marcar_ignorado(conn, path):
     cur = conn.cursor()
     cur.execute(
@@ -28,10 +62,8 @@ def total_deletados_count(conn):
 
 
 def buscar_corrompidos(conn, contexto=None):
-    if contexto == 'imagens':
-        exts = IMG_EXTS
-    elif contexto == 'videos':
-        exts = VIDEO_EXTS
+    if contexto in ('imagens', 'videos'):
+        exts = exts_do_contexto(contexto)
     else:
         exts = IMG_EXTS + VIDEO_EXTS
     q = '''SELECT * FROM arquivos WHERE corrompida=1 AND ext IN ({})'''.format(
@@ -45,67 +77,175 @@ def get_connection(db_path):
     return conn
 
 
-def buscar_duplicadas(conn, contexto, considerar_data_criacao=True, considerar_deletados=True, considerar_ignorados=True):
+def ensure_indices(conn):
+    # Índice parcial e "covering" para a busca de duplicadas: o GROUP BY
+    # percorre o índice em ordem e filtra ext/deletado/ignorado sem ler a tabela.
+    # Ele também atende hash=?; o antigo idx_hash_tam_data, com as mesmas
+    # colunas no início, só custava mais uma escrita por linha.
+    ensure_ignorado_column(conn)
+    ensure_phash_column(conn)
+    ensure_dedup_columns(conn)
+    conn.execute('''CREATE INDEX IF NOT EXISTS idx_dup_cobertura
+        ON arquivos (hash, tamanho, data_criacao, ext, deletado, ignorado)
+        WHERE hash IS NOT NULL''')
+    conn.execute('DROP INDEX IF EXISTS idx_hash_tam_data')
+    conn.commit()
+
+
+def exts_do_contexto(contexto):
     if contexto == 'imagens':
-        exts = IMG_EXTS
+        return IMG_EXTS
     elif contexto == 'videos':
-        exts = VIDEO_EXTS
+        return VIDEO_EXTS
     elif contexto == 'documentos':
-        exts = DOC_EXTS
-    else:
-        exts = IMG_EXTS + VIDEO_EXTS + DOC_EXTS
+        return DOC_EXTS
+    elif contexto == 'similares':
+        return IMG_EXTS
+    elif contexto == 'videos_similares':
+        return VIDEO_EXTS
+    return IMG_EXTS + VIDEO_EXTS + DOC_EXTS
+
+
+def iter_duplicadas(conn, contexto, considerar_data_criacao=True, considerar_deletados=True, considerar_ignorados=True):
+    # Uma única consulta: os grupos repetidos saem do índice e são unidos
+    # de volta à tabela, já ordenados por grupo. Devolve um grupo (lista de
+    # linhas) por vez.
+    exts = exts_do_contexto(contexto)
     if considerar_data_criacao:
-        group_by = 'hash, tamanho, data_criacao'
-        select = 'hash, tamanho, data_criacao, COUNT(*) as qtd'
-        having = 'HAVING qtd > 1'
+        chave = ['hash', 'tamanho', 'data_criacao']
     else:
-        group_by = 'hash, tamanho'
-        select = 'hash, tamanho, COUNT(*) as qtd'
-        having = 'HAVING qtd > 1'
-    where = f"ext IN ({','.join(['?']*len(exts))})"
+        chave = ['hash', 'tamanho']
+    # hash NULL = arquivo de tamanho único, nunca é duplicado
+    where = f"hash IS NOT NULL AND ext IN ({','.join(['?']*len(exts))})"
+    if not considerar_deletados:
+        where += " AND (deletado=0 OR deletado IS NULL)"
+    if not considerar_ignorados:
+        where += " AND (ignorado=0 OR ignorado IS NULL)"
+    cols = ', '.join(chave)
+    q = f'''WITH grupos AS (
+            SELECT {cols} FROM arquivos WHERE {where}
+            GROUP BY {cols} HAVING COUNT(*) > 1)
+        SELECT a.* FROM grupos g JOIN arquivos a USING ({cols})
+        WHERE {where}
+        ORDER BY {', '.join('a.' + c for c in chave)}, a.id'''
+    cur = conn.execute(q, list(exts) * 2)
+    nomes = [d[0] for d in cur.description]
+    idx_chave = [nomes.index(c) for c in chave]
+    grupo = []
+    chave_atual = None
+    for row in cur:
+        chave_row = tuple(row[i] for i in idx_chave)
+        if grupo and chave_row != chave_atual:
+            yield grupo
+            grupo = []
+        chave_atual = chave_row
+        grupo.append(row)
+    if grupo:
+        yield grupo
+
+
+def buscar_duplicadas(conn, contexto, considerar_data_criacao=True, considerar_deletados=True, considerar_ignorados=True):
+    return list(iter_duplicadas(conn, contexto, considerar_data_criacao, considerar_deletados, considerar_ignorados))
+
+
+def itens_similares(conn, considerar_deletados=True, considerar_ignorados=True):
+    # [(id, phash sem sinal)] das imagens que entram na busca por similares
+    where = f"phash IS NOT NULL AND ext IN ({','.join(['?']*len(IMG_EXTS))})"
     if not considerar_deletados:
         where += " AND (deletado=0 OR deletado IS NULL)"
     if not considerar_ignorados:
         where += " AND (ignorado=0 OR ignorado IS NULL)"
-    q = f'''SELECT {select} FROM arquivos WHERE {where} GROUP BY {group_by} {having}'''
-    rows = conn.execute(q, exts).fetchall()
+    cur = conn.execute(f"SELECT id, phash FROM arquivos WHERE {where}", IMG_EXTS)
+    return [(id_, de_int64(phash)) for id_, phash in cur]
+
+
+def agrupar_similares(itens, distancia=DISTANCIA_SIMILAR, motor='faixas'):
+    # Não usa o banco: pode rodar fora da thread da conexão (GUI).
+    # 'faixas' (multi-index hashing, o padrão), 'numpy' (força bruta em
+    # blocos) ou 'bk' (árvore BK, só para comparar no benchmark).
+    if motor == 'bk':
+        return grupos_similares(itens, distancia)
+    if motor == 'numpy':
+        return grupos_similares_numpy(itens, distancia)
+    return grupos_similares_faixas(itens, distancia)
+
+
+def ids_similares(conn, distancia=DISTANCIA_SIMILAR, considerar_deletados=True, considerar_ignorados=True, motor='faixas'):
+    # Grupos de imagens com phash a no máximo 'distancia' bits; cada grupo
+    # é uma lista de ids. A busca é feita em memória (agrupar_similares).
+    return agrupar_similares(itens_similares(conn, considerar_deletados, considerar_ignorados),
+                             distancia, motor)
+
+
+def buscar_similares(conn, distancia=DISTANCIA_SIMILAR, considerar_deletados=True, considerar_ignorados=True, motor='faixas'):
+    # Mesmo formato de buscar_duplicadas: lista de grupos, cada um uma lista de linhas
     grupos = []
-    for row in rows:
-        if considerar_data_criacao:
-            hash_, tamanho, data_criacao, qtd = row
-            # Garante que data_criacao é string
-            if not isinstance(data_criacao, str):
-                import datetime
-                try:
-                    data_criacao = datetime.datetime.fromtimestamp(
-                        float(data_criacao)).strftime('%Y-%m-%d %H:%M:%S')
-                except Exception:
-                    data_criacao = str(data_criacao)
-            files_q = '''SELECT * FROM arquivos WHERE hash=? AND tamanho=? AND data_criacao=?'''
-            files_params = [hash_, tamanho, data_criacao]
-            if not considerar_deletados:
-                files_q += " AND (deletado=0 OR deletado IS NULL)"
-            if not considerar_ignorados:
-                files_q += " AND (ignorado=0 OR ignorado IS NULL)"
-            files = conn.execute(files_q, files_params).fetchall()
-        else:
-            hash_, tamanho, qtd = row
-            files_q = '''SELECT * FROM arquivos WHERE hash=? AND tamanho=?'''
-            files_params = [hash_, tamanho]
-            if not considerar_deletados:
-                files_q += " AND (deletado=0 OR deletado IS NULL)"
-            if not considerar_ignorados:
-                files_q += " AND (ignorado=0 OR ignorado IS NULL)"
-            files = conn.execute(files_q, files_params).fetchall()
-        grupos.append(files)
+    for ids in ids_similares(conn, distancia, considerar_deletados, considerar_ignorados, motor):
+        grupos.append(conn.execute(
+            f"SELECT * FROM arquivos WHERE id IN ({','.join(['?']*len(ids))}) ORDER BY id", ids).fetchall())
     return grupos
 
 
+def itens_videos_similares(conn, considerar_deletados=True, considerar_ignorados=True):
+    # [(id, duração, assinatura)] dos vídeos que entram na busca por similares
+    from video_fingerprint_utils import blob_para_assinatura
+    where = f"duracao IS NOT NULL AND LENGTH(assinatura) > 0 AND ext IN ({','.join(['?']*len(VIDEO_EXTS))})"
+    if not considerar_deletados:
+        where += " AND (deletado=0 OR deletado IS NULL)"
+    if not considerar_ignorados:
+        where += " AND (ignorado=0 OR ignorado IS NULL)"
+    cur = conn.execute(
+        f"SELECT id, duracao, assinatura FROM arquivos WHERE {where}", VIDEO_EXTS)
+    return [(id_, duracao, blob_para_assinatura(assinatura)) for id_, duracao, assinatura in cur]
+
+
+def agrupar_videos_similares(itens):
+    # Não usa o banco (como agrupar_similares)
+    from video_fingerprint_utils import grupos_videos_similares
+    return grupos_videos_similares(itens)
+
+
+def ids_videos_similares(conn, considerar_deletados=True, considerar_ignorados=True):
+    # Vídeos recodificados: candidatos por duração, confirmados pela assinatura
+    return agrupar_videos_similares(itens_videos_similares(conn, considerar_deletados, considerar_ignorados))
+
+
+def buscar_videos_similares(conn, considerar_deletados=True, considerar_ignorados=True):
+    grupos = []
+    for ids in ids_videos_similares(conn, considerar_deletados, considerar_ignorados):
+        grupos.append(conn.execute(
+            f"SELECT * FROM arquivos WHERE id IN ({','.join(['?']*len(ids))}) ORDER BY id", ids).fetchall())
+    return grupos
+
+
+def marcar_deletados(conn, paths):
+    # Lote: uma única transação em vez de um commit por arquivo
+    with conn:
+        conn.executemany(
+            "UPDATE arquivos SET deletado=1 WHERE path=?", ((p,) for p in paths))
+
+
 def marcar_deletado(conn, path):
     conn.execute("UPDATE arquivos SET deletado=1 WHERE path=?", (path,))
     conn.commit()
 
 
+def marcar_ligados(conn, resultados):
+    # resultados de dedup_utils.executar_links; uma única transação.
+    # Grava também o stat novo, para o scan delta não ver o arquivo como alterado.
+    linhas = []
+    for destino_id, origem_id, status, st, _ in resultados:
+        if st is None or status not in ('reflink', 'hardlink', 'ja_ligado'):
+            continue
+        modo = 'hardlink' if status == 'ja_ligado' else status
+        linhas.append((modo, origem_id, st.st_ino, st.st_dev,
+                      st.st_mtime_ns, destino_id))
+    with conn:
+        conn.executemany('''UPDATE arquivos SET dedup=?, dedup_origem=?, inode=?, dispositivo=?, mtime_ns=?
+            WHERE id=?''', linhas)
+    return len(linhas)
+
+
 def total_deletado_mb(conn):
     cur = conn.cursor()
     cur.execute("SELECT SUM(tamanho) FROM arquivos WHERE deletado=1")
@@ -0,0 +1,165 @@
+import os
+import shutil
+
+try:
+    import fcntl
+except ImportError:
+    # Windows: só hardlink
+    fcntl = None
+
+# ioctl FICLONE (linux/fs.h): o destino passa a compartilhar os blocos da
+# origem (btrfs, XFS com reflink=1); cada arquivo continua independente
+FICLONE = 0x40049409
+BLOCO_COMPARACAO = 1024 * 1024
+MODOS = ('auto', 'reflink', 'hardlink')
+
+
+def mesmo_conteudo(path_a, path_b, bloco=BLOCO_COMPARACAO):
+    # Comparação byte a byte; o hash igual só diz que provavelmente são iguais
+    if os.path.getsize(path_a) != os.path.getsize(path_b):
+        return False
+    with open(path_a, 'rb') as fa, open(path_b, 'rb') as fb:
+        while True:
+            a = fa.read(bloco)
+            if a != fb.read(bloco):
+                return False
+            if not a:
+                return True
+
+
+def _temporario(destino):
+    pasta, nome = os.path.split(destino)
+    return os.path.join(pasta, f'.{nome}.dedup-{os.getpid()}')
+
+
+def reflink(origem, destino):
+    # Clona num temporário ao lado e troca de uma vez (os.replace é atômico)
+    if fcntl is None:
+        raise OSError('reflink não suportado neste sistema')
+    tmp = _temporario(destino)
+    try:
+        with open(origem, 'rb') as src, open(tmp, 'wb') as dst:
+            fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+        shutil.copystat(destino, tmp)
+        os.replace(tmp, destino)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+def hardlink(origem, destino):
+    tmp = _temporario(destino)
+    try:
+        os.link(origem, tmp)
+        os.replace(tmp, destino)
+    except BaseException:
+        if os.path.lexists(tmp):
+            os.remove(tmp)
+        raise
+
+
+def substituir_por_link(origem, destino, modo='auto'):
+    # Troca 'destino' por um link para 'origem' se o conteúdo for idêntico.
+    # Devolve (status, stat novo do destino ou None, erro ou None); status:
+    # 'reflink', 'hardlink', 'ja_ligado', 'diferente' ou 'erro'.
+    try:
+        st_origem = os.stat(origem)
+        st_destino = os.stat(destino)
+        if (st_origem.st_ino, st_origem.st_dev) == (st_destino.st_ino, st_destino.st_dev):
+            return 'ja_ligado', st_destino, None
+        if st_origem.st_dev != st_destino.st_dev:
+            return 'erro', None, 'arquivos em dispositivos diferentes'
+        if not mesmo_conteudo(origem, destino):
+            return 'diferente', None, None
+        status = None
+        if modo in ('auto', 'reflink'):
+            try:
+                reflink(origem, destino)
+                status = 'reflink'
+            except OSError as e:
+                if modo == 'reflink':
+                    return 'erro', None, str(e)
+        if status is None:
+            hardlink(origem, destino)
+            status = 'hardlink'
+        return status, os.stat(destino), None
+    except OSError as e:
+        return 'erro', None, str(e)
+
+
+def planejar_links(conn, ids):
+    # Para cada id, a origem é um arquivo do mesmo grupo (hash + tamanho)
+    # que não está na lista nem deletado. Devolve [(origem, destino)] e os
+    # destinos sem origem possível (grupo inteiro selecionado).
+    ids = set(ids)
+    pares = []
+    sem_origem = []
+    origens = {}
+    linhas = conn.execute(
+        f"SELECT * FROM arquivos WHERE id IN ({','.join(['?']*len(ids))}) ORDER BY id", sorted(ids)).fetchall() if ids else []
+    for destino in linhas:
+        if destino['hash'] is None or destino['deletado']:
+            sem_origem.append(destino)
+            continue
+        chave = (destino['hash'], destino['tamanho'])
+        if chave not in origens:
+            origens[chave] = None
+            for candidata in conn.execute('''SELECT * FROM arquivos WHERE hash=? AND tamanho=?
+                    AND NOT IFNULL(deletado, 0) ORDER BY id''', chave):
+                if candidata['id'] not in ids:
+                    origens[chave] = candidata
+                    break
+        if origens[chave] is None:
+            sem_origem.append(destino)
+        else:
+            pares.append((origens[chave], destino))
+    return pares, sem_origem
+
+
+def ligar_par(par, modo='auto', simular=False):
+    # par: (linha origem, linha destino). Devolve o resultado
+    # (destino_id, origem_id, status, stat, erro). Pode rodar em threads.
+    origem, destino = par
+    if simular:
+        ligado = _mesmo_inode(origem['path'], destino['path'])
+        return (destino['id'], origem['id'], 'ja_ligado' if ligado else 'simulado', None, None)
+    status, st, erro = substituir_por_link(
+        origem['path'], destino['path'], modo)
+    return (destino['id'], origem['id'], status, st, erro)
+
+
+def bytes_recuperados(pares, resultados):
+    # Destinos que já eram hardlinks entre si liberam o espaço uma vez só
+    destinos = {destino['id']: destino for _, destino in pares}
+    liberados = set()
+    recuperado = 0
+    for destino_id, _, status, _, _ in resultados:
+        if status not in ('reflink', 'hardlink', 'simulado'):
+            continue
+        destino = destinos[destino_id]
+        dado = (destino['dispositivo'], destino['inode']
+                ) if destino['inode'] else destino_id
+        if dado not in liberados:
+            liberados.add(dado)
+            recuperado += destino['tamanho'] or 0
+    return recuperado
+
+
+def executar_links(pares, modo='auto', simular=False, progresso=None):
+    # pares: [(linha origem, linha destino)]. Devolve a lista de resultados
+    # e os bytes recuperados. progresso(n, total, path) a cada arquivo.
+    resultados = []
+    for n, par in enumerate(pares, 1):
+        resultados.append(ligar_par(par, modo, simular))
+        if progresso is not None:
+            progresso(n, len(pares), par[1]['path'])
+    return resultados, bytes_recuperados(pares, resultados)
+
+
+def _mesmo_inode(a, b):
+    try:
+        sa, sb = os.stat(a), os.stat(b)
+    except OSError:
+        return False
+    return (sa.st_ino, sa.st_dev) == (sb.st_ino, sb.st_dev)
@@ -0,0 +1,98 @@
+import os
+import time
+from collections import deque
+
+# Uma linha por pasta cuja subárvore inteira já foi gravada em 'arquivos'
+TABELA_DIARIO = 'scan_pastas'
+
+
+def criar_tabela_diario(conn):
+    conn.execute(f'''CREATE TABLE IF NOT EXISTS {TABELA_DIARIO} (
+        pasta TEXT PRIMARY KEY,
+        concluida_em REAL
+    ) WITHOUT ROWID''')
+    conn.commit()
+
+
+def limpar_diario(conn):
+    conn.execute(f"DELETE FROM {TABELA_DIARIO}")
+    conn.commit()
+
+
+class DiarioScan:
+    # Acompanha quais pastas terminaram durante o scan e grava cada uma pelo
+    # mesmo BatchWriter das linhas de 'arquivos', então a pasta só aparece
+    # como concluída no mesmo commit dos seus arquivos.
+    #
+    # O walk avisa (pasta_listada) depois do último arquivo de cada pasta;
+    # como o pool devolve os resultados na ordem de envio, a pasta tem os
+    # arquivos gravados quando o consumidor passa daquele ponto. A subárvore
+    # termina quando a pasta e todas as subpastas terminaram. Pasta com
+    # arquivo que falhou (ou que não pôde ser listada) nunca termina, nem as
+    # de cima, e é percorrida de novo na retomada.
+    def __init__(self, conn, writer, retomar=False):
+        self.conn = conn
+        self.writer = writer
+        self.retomar = retomar
+        self.enviados = 0
+        self.consumidos = 0
+        self._marcas = deque()  # (enviados, pasta, subpastas)
+        self._pendentes = {}  # pasta -> subpastas ainda não concluídas
+        self._pai = {}
+        self._falhas = set()
+        criar_tabela_diario(conn)
+        if not retomar:
+            limpar_diario(conn)
+
+    def pasta_concluida(self, pasta):
+        # skip_dir do walk: só na retomada
+        if not self.retomar:
+            return False
+        return self.conn.execute(f"SELECT 1 FROM {TABELA_DIARIO} WHERE pasta=?",
+                                 (pasta,)).fetchone() is not None
+
+    def arquivo_gravado(self, path):
+        # Pasta pela metade na retomada: consulta arquivo por arquivo (idx_path)
+        if not self.retomar:
+            return False
+        return self.conn.execute("SELECT 1 FROM arquivos WHERE path=? LIMIT 1",
+                                 (path,)).fetchone() is not None
+
+    def enviado(self):
+        self.enviados += 1
+
+    def pasta_listada(self, pasta, subpastas):
+        # on_dir do walk
+        self._marcas.append((self.enviados, pasta, subpastas))
+
+    def resultado(self, path, ok=True):
+        # Chamado pelo consumidor para cada arquivo enviado, na ordem de envio
+        self.consumidos += 1
+        if not ok:
+            self._falhas.add(os.path.dirname(path))
+        self._avancar()
+
+    def fim(self):
+        # Todos os resultados consumidos: fecha as pastas que faltam
+        self._avancar()
+
+    def _avancar(self):
+        while self._marcas and self._marcas[0][0] <= self.consumidos:
+            _, pasta, subpastas = self._marcas.popleft()
+            for subpasta in subpastas:
+                self._pai[subpasta] = pasta
+            if pasta in self._falhas:
+                continue
+            self._pendentes[pasta] = len(subpastas)
+            self._concluir(pasta)
+
+    def _concluir(self, pasta):
+        while pasta is not None and self._pendentes.get(pasta) == 0:
+            del self._pendentes[pasta]
+            self.writer.execute(f"INSERT OR REPLACE INTO {TABELA_DIARIO} (pasta, concluida_em) VALUES (?, ?)",
+                                (pasta, time.time()))
+            pasta = self._pai.pop(pasta, None)
+            if pasta is not None and pasta in self._pendentes:
+                self._pendentes[pasta] -= 1
+            else:
+                pasta = None
@@ -0,0 +1,100 @@
+import os
+import threading
+from functools import lru_cache
+
+# Leitores simultâneos por dispositivo. Disco giratório: um só, para a
+# cabeça não ficar pulando entre arquivos. Rede: poucos, a latência é
+# que pesa. SSD (e desconhecido): o número de workers.
+LEITORES_HDD = 1
+LEITORES_REDE = 4
+FS_REDE = frozenset(('nfs', 'nfs4', 'cifs', 'smb3', 'smbfs', 'afs',
+                     'ceph', 'glusterfs', '9p', 'fuse.sshfs', 'fuse.rclone'))
+
+
+@lru_cache(maxsize=None)
+def _montagens():
+    # 'major:minor' -> (tipo do sistema de arquivos, origem), de /proc/self/mountinfo
+    montagens = {}
+    try:
+        with open('/proc/self/mountinfo', encoding='utf-8') as f:
+            for linha in f:
+                campos, _, resto = linha.partition(' - ')
+                campos, resto = campos.split(), resto.split()
+                if len(campos) > 2 and len(resto) > 1:
+                    montagens.setdefault(campos[2], (resto[0], resto[1]))
+    except OSError:
+        pass
+    return montagens
+
+
+def _rotacional(major, minor):
+    # /sys/dev/block/M:m aponta para o disco ou para a partição; a partição
+    # não tem queue/, o disco (a pasta de cima) tem
+    base = os.path.realpath(f'/sys/dev/block/{major}:{minor}')
+    for pasta in (base, os.path.dirname(base)):
+        try:
+            with open(os.path.join(pasta, 'queue', 'rotational')) as f:
+                return f.read().strip() == '1'
+        except OSError:
+            continue
+    return None
+
+
+@lru_cache(maxsize=None)
+def tipo_dispositivo(dispositivo):
+    # st_dev -> 'hdd', 'ssd', 'rede' ou 'desconhecido' (fora do Linux,
+    # ou sem /sys). btrfs e afins usam um st_dev anônimo: aí vale o
+    # dispositivo de origem da montagem.
+    if not hasattr(os, 'major'):
+        return 'desconhecido'
+    major, minor = os.major(dispositivo), os.minor(dispositivo)
+    tipo, origem = _montagens().get(f'{major}:{minor}', (None, None))
+    if tipo in FS_REDE:
+        return 'rede'
+    rotacional = _rotacional(major, minor)
+    if rotacional is None and origem and origem.startswith('/dev/'):
+        try:
+            rdev = os.stat(origem).st_rdev
+            rotacional = _rotacional(os.major(rdev), os.minor(rdev))
+        except OSError:
+            pass
+    if rotacional is None:
+        return 'desconhecido'
+    return 'hdd' if rotacional else 'ssd'
+
+
+class OrcamentoDispositivos:
+    # Quantos arquivos de cada dispositivo podem ser lidos ao mesmo tempo
+    def __init__(self, workers, hdd=LEITORES_HDD, rede=LEITORES_REDE):
+        self.workers = max(1, workers)
+        self.hdd = max(1, hdd)
+        self.rede = max(1, rede)
+        self._limites = {}
+        self._lock = threading.Lock()
+
+    def limite(self, dispositivo):
+        with self._lock:
+            limite = self._limites.get(dispositivo)
+            if limite is None:
+                limite = self._limites[dispositivo] = self._calcular(dispositivo)
+            return limite
+
+    def _calcular(self, dispositivo):
+        if dispositivo is None:
+            return self.workers
+        try:
+            tipo = tipo_dispositivo(dispositivo)
+        except (TypeError, ValueError, OverflowError):
+            return self.workers
+        if tipo == 'hdd':
+            return min(self.hdd, self.workers)
+        if tipo == 'rede':
+            return min(self.rede, self.workers)
+        return self.workers
+
+    def descrever(self, dispositivo):
+        try:
+            tipo = tipo_dispositivo(dispositivo)
+        except (TypeError, ValueError, OverflowError):
+            tipo = 'desconhecido'
+        return f"{tipo}, {self.limite(dispositivo)} leitor(es)"
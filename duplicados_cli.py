@@ -0,0 +1,371 @@
+# Linha de comando sem perguntas, para rodar em cron/servidor sem tela:
+#   scan       escaneia as raízes (continua de onde parou; --do-zero apaga antes)
+#   delta      só novos, modificados e removidos
+#   relatorio  grupos de duplicados em JSON Lines ou CSV, com a cópia mantida
+#   aplicar    manda as cópias não mantidas para a lixeira ou troca por links
+#   observar   fica rodando e atualiza o banco a cada mudança nas raízes
+# A cópia mantida de cada grupo sai das regras de --manter (selecao_utils).
+import argparse
+import csv
+import json
+import os
+import sqlite3
+import sys
+import time
+from collections import Counter
+from functools import partial
+
+import encontra_repetidos_sqlite as scanner
+from db_utils import (ensure_indices, get_connection, iter_duplicadas,
+                      marcar_deletados, marcar_ligados)
+from dedup_utils import MODOS, bytes_recuperados, ligar_par
+from indexador_utils import Indexador
+from lote_utils import LOTE_WORKERS, LoteEmThreads
+from metricas_utils import Metricas
+from observador_utils import (ESPERA, ESPERA_MAXIMA, INTERVALO_POLLING,
+                              Agregador, ObservadorPolling, criar_observador)
+from selecao_utils import (REGRAS, chave_manter, normalizar_prefixos,
+                           separar_grupo)
+
+CAMPOS_RELATORIO = ['grupo', 'acao', 'id', 'path',
+                    'tamanho', 'data_criacao', 'hash', 'ext']
+CAMPOS_APLICAR = ['grupo', 'id', 'path', 'mantido',
+                  'acao', 'status', 'erro']
+# Arquivos por lote no 'aplicar': cada lote é uma transação no banco
+LOTE_APLICAR = 1000
+
+
+class Saida:
+    # Escreve um dicionário por linha, em JSON Lines ou CSV (com cabeçalho)
+    def __init__(self, arquivo, formato, campos):
+        self.arquivo = arquivo
+        self.campos = campos
+        self.csv = None
+        if formato == 'csv':
+            self.csv = csv.DictWriter(
+                arquivo, campos, extrasaction='ignore', lineterminator='\n')
+            self.csv.writeheader()
+
+    def escrever(self, linha):
+        if self.csv is not None:
+            self.csv.writerow(linha)
+        else:
+            self.arquivo.write(json.dumps(
+                {c: linha.get(c) for c in self.campos}, ensure_ascii=False) + '\n')
+
+
+def abrir_saida(args, campos):
+    if args.saida in (None, '-'):
+        return Saida(sys.stdout, args.formato, campos), None
+    arquivo = open(args.saida, 'w', encoding='utf-8', newline='')
+    return Saida(arquivo, args.formato, campos), arquivo
+
+
+def log(msg):
+    # Mensagens vão para stderr: stdout fica só com o relatório
+    print(msg, file=sys.stderr)
+
+
+def iter_grupos_separados(conn, args):
+    # (número do grupo, mantido, [descartados]); deletados e ignorados ficam
+    # de fora, como no botão de excluir da GUI
+    regras = list(args.manter or [])
+    if args.prefixo and 'prefixo' not in regras:
+        regras.insert(0, 'prefixo')
+    chave = chave_manter(regras, args.prefixo or [])
+    protegidos = normalizar_prefixos(args.prefixo or [])
+    grupos = iter_duplicadas(conn, args.contexto, not args.ignorar_data,
+                             considerar_deletados=False, considerar_ignorados=False)
+    for n, grupo in enumerate(grupos):
+        mantido, descartados = separar_grupo(grupo, chave, protegidos)
+        yield n, mantido, descartados
+
+
+def linha_arquivo(n, acao, row):
+    return {'grupo': n, 'acao': acao, 'id': row['id'], 'path': row['path'],
+            'tamanho': row['tamanho'], 'data_criacao': row['data_criacao'],
+            'hash': row['hash'], 'ext': row['ext']}
+
+
+def cmd_scan(args):
+    conn = sqlite3.connect(args.db)
+    scanner.create_table(conn)
+    already = 0
+    mode = 'full'
+    if args.do_zero:
+        scanner.reset_table(conn)
+    elif args.comando == 'delta':
+        mode = 'delta'
+    else:
+        already = conn.execute(
+            f"SELECT COUNT(*) FROM {scanner.TABLE_NAME}").fetchone()[0]
+        if already:
+            mode = 'continue'
+    roots = scanner.roots_from_args(args, args.raiz)
+    if not roots:
+        log("[!] Nenhuma pasta: informe RAIZ ou --raizes.")
+        conn.close()
+        return 2
+    scanner.run_scan(conn, roots, mode, args, already)
+    return 0
+
+
+def cmd_observar(args):
+    roots = scanner.roots_from_args(args, args.raiz)
+    if not roots:
+        log("[!] Nenhuma pasta: informe RAIZ ou --raizes.")
+        return 2
+    conn = sqlite3.connect(args.db)
+    scanner.create_table(conn)
+    scanner.apply_scan_pragmas(conn)
+    metricas = Metricas(args.metricas, args.metricas_intervalo)
+    pool = scanner.make_pool(args, metricas)
+    writer = scanner.BatchWriter(conn, args.batch_size, metricas)
+    raizes = scanner.register_roots(conn, roots, pool)
+    # O observador começa antes do delta inicial: o que mudar durante o
+    # delta fica na fila e é conferido depois
+    observador = criar_observador([raiz for _, raiz, _ in raizes], scanner.SCAN_EXTS,
+                                  args.polling, args.intervalo)
+    indexador = Indexador(conn, raizes, pool, writer)
+    agregador = Agregador(args.espera, args.espera_maxima)
+    try:
+        if not args.sem_delta_inicial:
+            indexador.delta(args.tamanho_primeiro, args.hash_em_estagios)
+        log(f"[i] Observando {len(raizes)} raiz(es) (Ctrl+C para sair)...")
+        while True:
+            for evento in observador.ler(min(1.0, args.espera)):
+                agregador.adicionar(evento, time.monotonic())
+            if observador.esgotado is not None:
+                # Watches acabaram com uma pasta nova: o delta completo
+                # (transbordou) cobre o que ficou sem eventos até aqui
+                log(f"[!] inotify sem watches ({observador.esgotado}); usando polling a cada {args.intervalo:g} s.")
+                observador.fechar()
+                observador = ObservadorPolling([raiz for _, raiz, _ in raizes], scanner.SCAN_EXTS,
+                                               args.intervalo)
+            estrutura, paths, transbordou = agregador.prontos(time.monotonic())
+            if transbordou:
+                log("[!] Eventos perdidos (fila do inotify cheia ou sem watches); rodando o delta completo.")
+                indexador.delta(args.tamanho_primeiro, args.hash_em_estagios)
+            if estrutura or paths:
+                contagem = +indexador.aplicar(estrutura, paths)
+                if contagem:
+                    log('[i] ' + ', '.join(f'{chave}: {n}' for chave, n in sorted(contagem.items())) +
+                        (f" ({agregador.pendentes()} aguardando)" if agregador.pendentes() else ''))
+    except KeyboardInterrupt:
+        log("[!] Encerrando; o que já foi indexado está gravado no banco.")
+    finally:
+        observador.fechar()
+        pool.shutdown()
+        writer.flush()
+        conn.close()
+        metricas.encerrar()
+    return 0
+
+
+def cmd_relatorio(args):
+    conn = get_connection(args.db)
+    ensure_indices(conn)
+    saida, arquivo = abrir_saida(args, CAMPOS_RELATORIO)
+    grupos = descartados_total = bytes_total = 0
+    try:
+        for n, mantido, descartados in iter_grupos_separados(conn, args):
+            saida.escrever(linha_arquivo(n, 'manter', mantido))
+            for row in descartados:
+                saida.escrever(linha_arquivo(n, 'descartar', row))
+                bytes_total += row['tamanho'] or 0
+            grupos += 1
+            descartados_total += len(descartados)
+    finally:
+        if arquivo is not None:
+            arquivo.close()
+        conn.close()
+    log(f"[i] {grupos} grupos, {descartados_total} cópias a descartar "
+        f"({bytes_total / 1024 / 1024:.2f} MB).")
+    return 0
+
+
+def executar_lote(conn, args, pares):
+    # pares: [(grupo, mantido, descartado)]. Roda as operações de arquivo nas
+    # threads e grava o resultado no banco numa transação. Devolve
+    # [(grupo, mantido, descartado, status, erro)] e os bytes liberados.
+    if args.acao == 'links':
+        lote = LoteEmThreads([(m, d) for _, m, d in pares],
+                             partial(ligar_par, modo=args.modo, simular=args.simular), args.workers)
+    elif args.simular:
+        lote = LoteEmThreads([d['path'] for _, _, d in pares],
+                             lambda path: 'simulado', args.workers)
+    else:
+        from send2trash import send2trash
+        lote = LoteEmThreads([d['path'] for _, _, d in pares], send2trash,
+                             args.workers, chave=os.path.basename)
+    lote.iniciar()
+    try:
+        lote.esperar()
+    except KeyboardInterrupt:
+        # Termina o que está em andamento e grava antes de sair
+        lote.cancelar()
+        lote.esperar()
+        raise
+    finally:
+        resultados = registrar_lote(conn, args, pares, lote)
+    return resultados
+
+
+def registrar_lote(conn, args, pares, lote):
+    if args.acao == 'links':
+        por_id = {r[0]: r for _, r, _ in lote.resultados}
+        if not args.simular:
+            marcar_ligados(conn, por_id.values())
+        liberado = bytes_recuperados([(m, d) for _, m, d in pares], por_id.values())
+        resultados = []
+        for grupo, mantido, descartado in pares:
+            r = por_id.get(descartado['id'])
+            if r is not None:
+                resultados.append((grupo, mantido, descartado, r[2], r[4]))
+        return resultados, liberado
+    por_path = {path: (retorno, erro) for path, retorno, erro in lote.resultados}
+    if not args.simular:
+        marcar_deletados(conn, [path for path, (_, erro) in por_path.items()
+                                if erro is None])
+    resultados = []
+    liberado = 0
+    for grupo, mantido, descartado in pares:
+        if descartado['path'] not in por_path:
+            continue
+        retorno, erro = por_path[descartado['path']]
+        if erro is not None:
+            resultados.append((grupo, mantido, descartado, 'erro', str(erro)))
+            continue
+        resultados.append((grupo, mantido, descartado,
+                          retorno or 'lixeira', None))
+        liberado += descartado['tamanho'] or 0
+    return resultados, liberado
+
+
+def planejar_lotes(conn, args):
+    # Junta grupos inteiros até LOTE_APLICAR arquivos (um grupo nunca é
+    # dividido, para os hardlinks do grupo serem contados uma vez só).
+    # Os grupos são lidos antes de qualquer escrita no banco.
+    lote = []
+    lotes = []
+    for n, mantido, descartados in iter_grupos_separados(conn, args):
+        lote.extend((n, mantido, d) for d in descartados)
+        if len(lote) >= args.lote:
+            lotes.append(lote)
+            lote = []
+    if lote:
+        lotes.append(lote)
+    return lotes
+
+
+def cmd_aplicar(args):
+    conn = get_connection(args.db)
+    ensure_indices(conn)
+    lotes = planejar_lotes(conn, args)
+    total = sum(len(lote) for lote in lotes)
+    log(f"[i] {total} arquivos: {args.acao}" +
+        (" (simulação)" if args.simular else ""))
+    saida, arquivo = abrir_saida(args, CAMPOS_APLICAR)
+    contagem = Counter()
+    liberado = 0
+    feitos = 0
+    try:
+        for lote in lotes:
+            resultados, bytes_lote = executar_lote(conn, args, lote)
+            liberado += bytes_lote
+            for grupo, mantido, descartado, status, erro in resultados:
+                contagem[status] += 1
+                saida.escrever({'grupo': grupo, 'id': descartado['id'], 'path': descartado['path'],
+                                'mantido': mantido['path'], 'acao': args.acao,
+                                'status': status, 'erro': erro})
+            feitos += len(lote)
+            log(f"[i] {feitos}/{total}")
+    except KeyboardInterrupt:
+        log("[!] Interrompido; o que já foi feito está gravado no banco.")
+        return 130
+    finally:
+        if arquivo is not None:
+            arquivo.close()
+        conn.close()
+    if contagem:
+        log('[i] ' + ', '.join(f'{status}: {n}' for status,
+            n in sorted(contagem.items())))
+    log(f"[✓] {liberado / 1024 / 1024:.2f} MB liberados" +
+        (" (simulação)" if args.simular else ""))
+    return 1 if contagem['erro'] or contagem['diferente'] else 0
+
+
+def parse_args(argv=None):
+    comum = argparse.ArgumentParser(add_help=False)
+    comum.add_argument('--db', default=scanner.DB_PATH,
+                       help='Banco do escaneamento (padrão: arquivos.db ao lado dos scripts)')
+
+    selecao = argparse.ArgumentParser(add_help=False)
+    selecao.add_argument('--contexto', choices=['imagens', 'videos', 'documentos', 'todos'], default='todos',
+                         help='Tipos de arquivo considerados (padrão: todos)')
+    selecao.add_argument('--ignorar-data', action='store_true',
+                         help='Agrupa só por hash e tamanho, sem a data de criação')
+    selecao.add_argument('--manter', action='append', choices=REGRAS,
+                         help='Regra para escolher a cópia mantida; repita para desempatar '
+                         '(padrão: a de menor id)')
+    selecao.add_argument('--prefixo', action='append',
+                         help='Pasta cujos arquivos são sempre mantidos (implica --manter prefixo); pode repetir')
+    selecao.add_argument('--formato', choices=['jsonl', 'csv'], default='jsonl',
+                         help='Formato da saída (padrão: jsonl)')
+    selecao.add_argument('--saida', help='Arquivo de saída (padrão: stdout)')
+
+    parser = argparse.ArgumentParser(
+        description='Escaneia, lista e resolve duplicados sem interação.')
+    sub = parser.add_subparsers(dest='comando', required=True)
+    for nome, ajuda in (('scan', 'Escaneia as raízes (continua de onde parou)'),
+                        ('delta', 'Atualiza só novos, modificados e removidos')):
+        p = sub.add_parser(nome, parents=[comum], help=ajuda)
+        p.add_argument('raiz', nargs='*',
+                       help='Pastas a escanear, em um ou mais discos (e/ou --raizes)')
+        if nome == 'scan':
+            p.add_argument('--do-zero', action='store_true',
+                           help='Apaga os dados do banco antes de escanear')
+        scanner.add_scan_args(p)
+        p.set_defaults(func=cmd_scan, do_zero=False)
+    p = sub.add_parser('observar', aliases=['watch'], parents=[comum],
+                       help='Fica rodando e indexa cada arquivo criado, alterado, movido ou removido')
+    p.add_argument('raiz', nargs='*',
+                   help='Pastas a observar (e/ou --raizes)')
+    p.add_argument('--espera', type=float, default=ESPERA,
+                   help=f'Segundos sem mudança antes de indexar um arquivo (padrão: {ESPERA:g})')
+    p.add_argument('--espera-maxima', type=float, default=ESPERA_MAXIMA,
+                   help=f'Indexa mesmo se continuar mudando depois de tantos segundos (padrão: {ESPERA_MAXIMA:g})')
+    p.add_argument('--polling', action='store_true',
+                   help='Varre as raízes periodicamente em vez de usar inotify (ex.: NFS/SMB)')
+    p.add_argument('--intervalo', type=float, default=INTERVALO_POLLING,
+                   help=f'Segundos entre varreduras no polling (padrão: {INTERVALO_POLLING:g})')
+    p.add_argument('--sem-delta-inicial', action='store_true',
+                   help='Não roda o delta completo antes de começar a observar')
+    scanner.add_scan_args(p)
+    p.set_defaults(func=cmd_observar)
+    p = sub.add_parser('relatorio', aliases=['report'], parents=[comum, selecao],
+                       help='Lista os grupos de duplicados e a cópia mantida')
+    p.set_defaults(func=cmd_relatorio)
+    p = sub.add_parser('aplicar', aliases=['apply'], parents=[comum, selecao],
+                       help='Descarta as cópias não mantidas')
+    p.add_argument('--acao', choices=['lixeira', 'links'], required=True,
+                   help='lixeira: envia para a lixeira; links: troca por hardlink/reflink')
+    p.add_argument('--modo', choices=MODOS, default='auto',
+                   help='Tipo de link com --acao links (padrão: auto)')
+    p.add_argument('--simular', action='store_true',
+                   help='Só mostra o que seria feito')
+    p.add_argument('--workers', type=int, default=LOTE_WORKERS,
+                   help=f'Threads para as operações de arquivo (padrão: {LOTE_WORKERS})')
+    p.add_argument('--lote', type=int, default=LOTE_APLICAR,
+                   help=f'Arquivos por transação no banco (padrão: {LOTE_APLICAR})')
+    p.set_defaults(func=cmd_aplicar)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    sys.exit(args.func(args))
+
+
+if __name__ == '__main__':
+    main()
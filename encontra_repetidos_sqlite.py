@@ -1,94 +1,97 @@
-import hashlib
+import argparse
+import datetime
 import os
 import signal
 import sqlite3
 import sys
-from pathlib import Path
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    Future,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    as_completed,
+    wait,
+)
 
+from db_utils import ensure_indices
+from diario_utils import DiarioScan, criar_tabela_diario, limpar_diario
+from dispositivo_utils import LEITORES_HDD, LEITORES_REDE, OrcamentoDispositivos
 from file_exts import DOC_EXTS, IMG_EXTS, VIDEO_EXTS
+from hash_utils import PREFIX_SIZE, SAMPLE_SIZE, hash_amostra, hash_completo, hash_prefixo
+from image_utils import data_exif, inspecionar_imagem, phash_imagem
+from metricas_utils import INTERVALO_METRICAS, Metricas
 from PIL import Image
+from raizes_utils import (criar_tabela_raizes, ler_arquivo_raizes,
+                          prefixo_raiz, registrar_raizes)
+from video_meta_utils import (
+    FFPROBE_CONCURRENCY,
+    FFPROBE_TIMEOUT,
+    configure_video_meta_service,
+    probe_video,
+)
+from walk_utils import count_files, iter_files
 
-# Set your target folder here
+# Set your target folder here (padrão quando não vem --raiz nem --raizes)
 TARGET_ROOT = r'D:\Imagens'
-# Set batch size for commits
-BATCH_SIZE = 200
+# Set batch size for commits (linhas por executemany/commit)
+BATCH_SIZE = 1000
+# Tamanhos por consulta em hash_size_partners (limite de parâmetros do sqlite)
+SIZES_PER_QUERY = 500
 
 # Always place the database in the same folder as this script
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 DB_PATH = os.path.join(SCRIPT_DIR, 'arquivos.db')
 TABLE_NAME = 'arquivos'
+SCAN_EXTS = frozenset(IMG_EXTS + VIDEO_EXTS + DOC_EXTS)
 
 
-def file_hash(path, chunk_size=8192):
-    hasher = hashlib.sha256()
-    with open(path, 'rb') as f:
-        while True:
-            chunk = f.read(chunk_size)
-            if not chunk:
-                break
-            hasher.update(chunk)
-    return hasher.hexdigest()
-
+def timed_file_hash(path):
+    # (hash, segundos): o tempo vai para as métricas junto com o resultado
+    inicio = time.perf_counter()
+    return hash_completo(path), time.perf_counter() - inicio
 
-def creation_date(path):
-    import datetime
-    import os
 
-    from PIL import Image
+def creation_date(path, stat=None, video_meta=None):
     ext = os.path.splitext(str(path))[1].lower()
     # 1. Tenta EXIF para imagens
     if ext in IMG_EXTS:
         try:
             with Image.open(path) as img:
-                try:
-                    exif = img.getexif()
-                except Exception:
-                    exif = getattr(img, '_getexif', lambda: None)()
-                if exif:
-                    for tag, value in exif.items():
-                        from PIL.ExifTags import TAGS
-                        tag_name = TAGS.get(tag, tag)
-                        if tag_name == 'DateTimeOriginal':
-                            # Formato EXIF: 'YYYY:MM:DD HH:MM:SS'
-                            try:
-                                dt = datetime.datetime.strptime(
-                                    value, '%Y:%m:%d %H:%M:%S')
-                                return dt.strftime('%Y-%m-%d %H:%M:%S')
-                            except Exception:
-                                pass
+                data = data_exif(img)
+            if data:
+                return data
         except Exception:
             pass
-    # 2. Tenta metadata de vídeo (ffprobe, pymediainfo, etc.)
+    # 2. Tenta metadata de vídeo (ffprobe, com limite de concorrência e timeout)
     if ext in VIDEO_EXTS:
         try:
-            import json
-            import subprocess
-            cmd = [
-                'ffprobe', '-v', 'error', '-select_streams', 'v:0',
-                '-show_entries', 'format_tags=creation_time',
-                '-of', 'json', str(path)
-            ]
-            result = subprocess.run(
-                cmd, capture_output=True, text=True, timeout=3)
-            if result.returncode == 0:
-                data = json.loads(result.stdout)
-                tags = data.get('format', {}).get('tags', {})
-                creation_time = tags.get('creation_time')
-                if creation_time:
-                    # Normaliza para formato ISO 8601
-                    try:
-                        dt = datetime.datetime.fromisoformat(
-                            creation_time.replace('Z', '').replace('T', ' '))
-                        return dt.strftime('%Y-%m-%d %H:%M:%S')
-                    except Exception:
-                        return creation_time[:19].replace('T', ' ')
+            if video_meta is None:
+                video_meta = probe_video(path)
+            creation_time = video_meta.get('creation_time')
+            if creation_time:
+                # Normaliza para formato ISO 8601
+                try:
+                    dt = datetime.datetime.fromisoformat(
+                        creation_time.replace('Z', '').replace('T', ' '))
+                    return dt.strftime('%Y-%m-%d %H:%M:%S')
+                except Exception:
+                    return creation_time[:19].replace('T', ' ')
         except Exception:
             pass
-    # 3. Usa data do sistema (st_birthtime ou st_birthtime)
-    stat = os.stat(path)
+    # 3. Usa data do sistema
+    return system_date(path, stat)
+
+
+def system_date(path, stat=None):
+    # st_birthtime quando o sistema tem; senão st_ctime
+    if stat is None:
+        stat = os.stat(path)
     ts = getattr(stat, 'st_birthtime', None)
     if ts is None:
-        ts = stat.st_birthtime
+        ts = stat.st_ctime
     return datetime.datetime.fromtimestamp(ts).strftime('%Y-%m-%d %H:%M:%S')
 
 
@@ -102,32 +105,116 @@ def create_table(conn):
         data_criacao TEXT,
         corrompida BOOLEAN,
         ext TEXT,
-        deletado BOOLEAN DEFAULT 0
+        deletado BOOLEAN DEFAULT 0,
+        mtime_ns INTEGER,
+        hash_prefixo TEXT,
+        hash_amostra TEXT,
+        inode INTEGER,
+        dispositivo INTEGER,
+        duracao REAL,
+        phash INTEGER,
+        assinatura BLOB,
+        dedup TEXT,
+        dedup_origem INTEGER
     )''')
+    ensure_scan_columns(conn)
+    ensure_indices(conn)
+    conn.execute(
+        'CREATE INDEX IF NOT EXISTS idx_tamanho ON arquivos (tamanho)')
     conn.execute(
-        'CREATE INDEX IF NOT EXISTS idx_hash_tam_data ON arquivos (hash, tamanho, data_criacao)')
+        'CREATE INDEX IF NOT EXISTS idx_path ON arquivos (path)')
+    conn.execute(
+        'CREATE INDEX IF NOT EXISTS idx_inode ON arquivos (dispositivo, inode)')
     conn.commit()
+    criar_tabela_diario(conn)
+    criar_tabela_raizes(conn)
 
 
-def insert_file(conn, info):
-    # Garante que data_criacao é string
-    data_criacao = info['data_criacao']
-    if not isinstance(data_criacao, str):
-        import datetime
-        try:
-            data_criacao = datetime.datetime.fromtimestamp(
-                float(data_criacao)).strftime('%Y-%m-%d %H:%M:%S')
-        except Exception:
-            data_criacao = str(data_criacao)
-    conn.execute('''INSERT INTO arquivos (nome, path, hash, tamanho, data_criacao, corrompida, ext, deletado)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?)''',
-                 (info['nome'], info['path'], info['hash'], info['tamanho'], data_criacao, bool(info['corrompida']), info['ext'], False))
+# Colunas adicionadas depois da primeira versão da tabela
+SCAN_COLUMNS = [
+    ('mtime_ns', 'INTEGER'),
+    ('hash_prefixo', 'TEXT'),
+    ('hash_amostra', 'TEXT'),
+    ('inode', 'INTEGER'),
+    ('dispositivo', 'INTEGER'),
+    ('duracao', 'REAL'),
+    ('phash', 'INTEGER'),
+    ('assinatura', 'BLOB'),
+    ('dedup', 'TEXT'),
+    ('dedup_origem', 'INTEGER'),
+    ('root_id', 'INTEGER'),
+]
 
 
-def get_existing_paths(conn):
+def ensure_scan_columns(conn):
     cur = conn.cursor()
-    cur.execute(f"SELECT path FROM {TABLE_NAME}")
-    return set(row[0] for row in cur.fetchall())
+    cur.execute(f"PRAGMA table_info({TABLE_NAME})")
+    columns = [row[1] for row in cur.fetchall()]
+    for nome, tipo in SCAN_COLUMNS:
+        if nome not in columns:
+            cur.execute(f"ALTER TABLE {TABLE_NAME} ADD COLUMN {nome} {tipo}")
+    conn.commit()
+
+
+INSERT_SQL = '''INSERT INTO arquivos (nome, path, hash, tamanho, data_criacao, corrompida, ext, deletado, mtime_ns, inode, dispositivo, duracao, phash, root_id)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)'''
+
+
+def file_row(info):
+    data_criacao = normalize_date(info['data_criacao'])
+    return (info['nome'], info['path'], info['hash'], info['tamanho'], data_criacao, bool(info['corrompida']), info['ext'], False, info.get('mtime_ns'), info.get('inode'), info.get('dispositivo'), info.get('duracao'), info.get('phash'), info.get('root_id'))
+
+
+def insert_file(conn, info):
+    conn.execute(INSERT_SQL, file_row(info))
+
+
+def apply_scan_pragmas(conn):
+    # Ajustes para a sessão de escaneamento: WAL com synchronous=NORMAL
+    # (fsync só no checkpoint), cache de páginas maior e leitura via mmap.
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    conn.execute('PRAGMA cache_size=-262144')  # 256 MB
+    conn.execute('PRAGMA mmap_size=1073741824')  # 1 GB
+    conn.execute('PRAGMA temp_store=MEMORY')
+
+
+class BatchWriter:
+    # Acumula INSERTs e UPDATEs e grava tudo com executemany, num único
+    # commit a cada batch_size linhas.
+    def __init__(self, conn, batch_size=BATCH_SIZE, metricas=None):
+        self.conn = conn
+        self.metricas = metricas
+        self.batch_size = max(1, batch_size)
+        self.pending = {}
+        self.count = 0
+
+    def insert(self, info):
+        self.execute(INSERT_SQL, file_row(info))
+
+    def execute(self, sql, params):
+        self.pending.setdefault(sql, []).append(params)
+        self.count += 1
+        if self.count >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        # Troca o buffer antes de gravar, para um flush vindo do handler
+        # de Ctrl+C não repetir linhas.
+        pending, self.pending = self.pending, {}
+        self.count = 0
+        inicio = time.perf_counter()
+        for sql, rows in pending.items():
+            self.conn.executemany(sql, rows)
+        self.conn.commit()
+        if self.metricas is not None:
+            self.metricas.tempo('db', time.perf_counter() - inicio)
+
+
+def reset_table(conn):
+    conn.execute(f"DELETE FROM {TABLE_NAME}")
+    conn.commit()
+    limpar_diario(conn)
 
 
 def ask_reset_table(conn):
@@ -137,238 +224,821 @@ def ask_reset_table(conn):
     print("[3] Atualizar apenas alterações (novos, modificados, removidos)")
     choice = input("Escolha uma opção (1, 2 ou 3): ").strip()
     if choice == '1':
-        cur = conn.cursor()
-        cur.execute(f"DELETE FROM {TABLE_NAME}")
-        conn.commit()
+        reset_table(conn)
         print("Todos os dados foram apagados. Nova coleta iniciada.")
-        return set(), 0, 'full'
+        return 0, 'full'
     elif choice == '2':
+        # Pastas concluídas (tabela scan_pastas) são puladas inteiras
         print("Continuando de onde parou...")
         cur = conn.cursor()
         cur.execute(f"SELECT COUNT(*) FROM {TABLE_NAME}")
         already = cur.fetchone()[0]
-        return get_existing_paths(conn), already, 'continue'
+        return already, 'continue'
     elif choice == '3':
         print("Atualizando apenas alterações...")
         cur = conn.cursor()
         cur.execute(f"SELECT COUNT(*) FROM {TABLE_NAME}")
         already = cur.fetchone()[0]
-        return get_existing_paths(conn), already, 'delta'
+        return already, 'delta'
     else:
         print("Opção inválida. Abortando.")
         sys.exit(1)
 
 
-def collect_metadata_to_db(root_folder, conn, processed_paths, start_count=0):
-    total = sum(len(files) for _, _, files in os.walk(root_folder))
-    count = start_count
-    batch_count = 0
-    for root, _, files in os.walk(root_folder):
-        for name in files:
-            path = Path(root) / name
-            ext = path.suffix.lower()
-            if ext not in IMG_EXTS and ext not in VIDEO_EXTS and ext not in DOC_EXTS:
-                continue
+def normalize_date(data_criacao):
+    # Garante que data_criacao é string
+    if not isinstance(data_criacao, str):
+        try:
+            data_criacao = datetime.datetime.fromtimestamp(
+                float(data_criacao)).strftime('%Y-%m-%d %H:%M:%S')
+        except Exception:
+            data_criacao = str(data_criacao)
+    return data_criacao
+
+
+def scan_file_metadata(path_str, ext, known=None, stat=None):
+    # Roda no worker (thread ou processo): data de criação e verify.
+    # known=(tamanho, data_criacao) já gravados; se baterem, alterado=False.
+    # known=() é um arquivo já gravado que mudou pelo stat.
+    # stat vem do walker; só faz os.stat se não vier.
+    # Os tempos de cada etapa voltam em info['tempos'] (o worker pode ser
+    # outro processo, então não registra direto nas métricas)
+    tempos = {}
+    if stat is None:
+        stat = os.stat(path_str)
+    video_meta = {}
+    if ext in VIDEO_EXTS:
+        inicio = time.perf_counter()
+        video_meta = probe_video(path_str)
+        tempos['ffprobe'] = time.perf_counter() - inicio
+    inicio = time.perf_counter()
+    if ext in IMG_EXTS:
+        # Uma única abertura do Pillow para EXIF, integridade e phash
+        corrupted, data_criacao, phash = inspecionar_imagem(path_str)
+        data_criacao = data_criacao or system_date(path_str, stat)
+        tempos['verify_exif'] = time.perf_counter() - inicio
+    else:
+        corrupted = False
+        phash = None
+        data_criacao = creation_date(path_str, stat, video_meta)
+        tempos['data'] = time.perf_counter() - inicio
+    info = {
+        'nome': os.path.basename(path_str),
+        'path': path_str,
+        'hash': None,
+        'tamanho': stat.st_size,
+        'data_criacao': normalize_date(data_criacao),
+        'corrompida': corrupted,
+        'ext': ext,
+        'mtime_ns': stat.st_mtime_ns,
+        'inode': stat.st_ino,
+        'dispositivo': stat.st_dev,
+        'duracao': video_meta.get('duracao'),
+        'phash': phash,
+        'alterado': True,
+        'tempos': tempos
+    }
+    if known and tuple(known) == (info['tamanho'], info['data_criacao']):
+        info['alterado'] = False
+    # Para documentos, não verifica corrupção
+    return info
+
+
+def init_worker(initializer=None, initargs=()):
+    # Processos do pool ignoram o Ctrl+C: o processo principal é quem
+    # decide parar, e ainda espera os arquivos que já estão com eles
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    if initializer is not None:
+        initializer(*initargs)
+
+
+class ScanPool:
+    # Threads para o hash (I/O) e threads ou processos para Pillow/EXIF/ffprobe.
+    # Os resultados voltam para a thread que consome imap, que é a única
+    # que escreve no sqlite (e registra nas métricas).
+    # Com orcamento (OrcamentoDispositivos) cada dispositivo tem o seu
+    # limite de arquivos em voo e as suas threads de hash: um HDD lento
+    # não ocupa as threads de um SSD, e vice-versa.
+    def __init__(self, workers=1, use_processes=False, max_pending=None, initializer=None, initargs=(), metricas=None, orcamento=None):
+        self.workers = max(1, workers)
+        self.metricas = metricas or Metricas()
+        self.orcamento = orcamento
+        self.hash_executor = ThreadPoolExecutor(self.workers)
+        self.device_executors = {}
+        self._device_lock = threading.Lock()
+        if use_processes:
+            # initializer roda em cada processo (ex.: configurar o ffprobe)
+            self.meta_executor = ProcessPoolExecutor(
+                self.workers, initializer=init_worker, initargs=(initializer, initargs))
+        else:
+            self.meta_executor = self.hash_executor
+        self.max_pending = max_pending or self.workers * 4
+        self.stopping = False
+
+    def stop(self):
+        # Para de enviar arquivos; imap e map_unordered ainda devolvem os
+        # que já estão em andamento, para serem gravados
+        self.stopping = True
+
+    def limit(self, device):
+        if self.orcamento is None:
+            return self.max_pending
+        return self.orcamento.limite(device)
+
+    def hash_executor_for(self, device):
+        # Chamado também das threads de metadados (on_meta)
+        if self.orcamento is None:
+            return self.hash_executor
+        with self._device_lock:
+            executor = self.device_executors.get(device)
+            if executor is None:
+                executor = self.device_executors[device] = ThreadPoolExecutor(
+                    self.orcamento.limite(device))
+            return executor
+
+    def submit(self, path_str, ext, with_hash, known=None, stat=None):
+        result = Future()
+        meta = self.meta_executor.submit(
+            scan_file_metadata, path_str, ext, known, stat)
+
+        def on_hash(hash_future):
             try:
-                if sys.platform.startswith('win'):
-                    path_str = str(path)
-                else:
-                    path_str = path.as_posix()
-                if path_str in processed_paths:
-                    continue  # já processado
-                corrupted = False
-                if ext in IMG_EXTS:
-                    try:
-                        with Image.open(path) as img:
-                            img.verify()
-                    except Exception:
-                        corrupted = True
-                # Para documentos, não verifica corrupção
-                info = {
-                    'nome': name,
-                    'path': path_str,
-                    'hash': file_hash(path),
-                    'tamanho': path.stat().st_size,
-                    'data_criacao': creation_date(path),
-                    'corrompida': corrupted,
-                    'ext': ext
-                }
-                insert_file(conn, info)
-            except Exception as e:
-                print(f'Falha ao obter metadados de : {path_str}')
-                pass
-            count += 1
-            batch_count += 1
-            if count % 10 == 0 or count == total:
-                pct = 100 * count // total
-                sys.stdout.write(
-                    f"\033[F\033[KColetando metadados: {path_str}\n\033[KProgresso: {count}/{total} arquivos ({pct:.0f}%)")
-                sys.stdout.flush()
-            if batch_count >= BATCH_SIZE:
-                conn.commit()
-                batch_count = 0
+                info['hash'], info['tempos']['hash'] = hash_future.result()
+                result.set_result(info)
+            except BaseException as e:
+                result.set_exception(e)
+
+        def on_meta(meta_future):
+            nonlocal info
+            try:
+                info = meta_future.result()
+            except BaseException as e:
+                result.set_exception(e)
+                return
+            if not with_hash or not info['alterado']:
+                result.set_result(info)
+                return
+            try:
+                self.hash_executor_for(info['dispositivo']).submit(
+                    timed_file_hash, path_str).add_done_callback(on_hash)
+            except RuntimeError as e:
+                # pool já encerrado (Ctrl+C)
+                result.set_exception(e)
+        info = None
+        meta.add_done_callback(on_meta)
+        return result
+
+    def imap(self, jobs):
+        # jobs: (path_str, ext, with_hash, known, stat, root_id). Devolve
+        # (job, info, erro) na ordem de envio, com no máximo max_pending
+        # arquivos em voo, e no máximo limit(dispositivo) de cada dispositivo.
+        pending = deque()
+        in_flight = Counter()
+        jobs = iter(jobs)
+        while not self.stopping:
+            job = next(jobs, None)
+            if job is None:
+                break
+            device = job[4].st_dev if job[4] is not None else None
+            while pending and (len(pending) >= self.max_pending or in_flight[device] >= self.limit(device)):
+                yield self._pop(pending, in_flight)
+            pending.append((job, device, self.submit(*job[:5])))
+            in_flight[device] += 1
+        while pending:
+            yield self._pop(pending, in_flight)
+
+    def map_unordered(self, fn, items, device=None):
+        # fn(item) nas threads de hash, com no máximo max_pending em voo.
+        # device(item) -> st_dev: cada dispositivo nas suas threads, todos
+        # ao mesmo tempo (ver map_by_device)
+        if device is not None and self.orcamento is not None:
+            yield from self.map_by_device(fn, items, device)
+            return
+        pending = set()
+        for item in items:
+            if self.stopping:
+                break
+            future = self.hash_executor.submit(fn, item)
+            future.item = item
+            pending.add(future)
+            if len(pending) >= self.max_pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                yield from ((f.item, f) for f in done)
+        for f in as_completed(pending):
+            yield f.item, f
+
+    def map_by_device(self, fn, items, device):
+        # Uma fila por dispositivo; cada um mantém até o dobro do seu limite
+        # em voo (o limite rodando e o mesmo tanto esperando na fila da
+        # sua executor), então um HDD com um leitor lê em sequência
+        # enquanto um SSD lê com todos os workers.
+        queues = {}
+        for item in items:
+            queues.setdefault(device(item), deque()).append(item)
+        in_flight = Counter()
+        pending = set()
+        while not self.stopping:
+            for dev, queue in queues.items():
+                while queue and in_flight[dev] < 2 * self.limit(dev):
+                    item = queue.popleft()
+                    future = self.hash_executor_for(dev).submit(fn, item)
+                    future.item, future.device = item, dev
+                    pending.add(future)
+                    in_flight[dev] += 1
+            if not pending:
+                break
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for f in done:
+                in_flight[f.device] -= 1
+                yield f.item, f
+        for f in as_completed(pending):
+            yield f.item, f
+
+    @staticmethod
+    def _pop(pending, in_flight):
+        job, device, future = pending.popleft()
+        in_flight[device] -= 1
+        try:
+            return job, future.result(), None
+        except Exception as e:
+            return job, None, e
+
+    def shutdown(self, wait=True):
+        self.hash_executor.shutdown(wait=wait, cancel_futures=True)
+        with self._device_lock:
+            executors = list(self.device_executors.values())
+        for executor in executors:
+            executor.shutdown(wait=wait, cancel_futures=True)
+        if self.meta_executor is not self.hash_executor:
+            self.meta_executor.shutdown(wait=wait, cancel_futures=True)
+
+
+def seen_inode(linked, stat):
+    # True se outro link do mesmo inode já foi visto nesta passada. Só
+    # guarda arquivos com mais de um link (st_ino 0 = stat sem inode, Windows).
+    if stat is None or stat.st_nlink < 2 or not stat.st_ino:
+        return False
+    key = (stat.st_dev, stat.st_ino)
+    if key in linked:
+        return True
+    linked.add(key)
+    return False
+
+
+def share_hash_by_inode(conn):
+    # Hardlinks pulados no hash recebem o hash do link que foi lido
+    conn.execute(f'''UPDATE {TABLE_NAME} SET hash = (
+            SELECT b.hash FROM {TABLE_NAME} b
+            WHERE b.dispositivo = {TABLE_NAME}.dispositivo AND b.inode = {TABLE_NAME}.inode
+            AND b.hash IS NOT NULL LIMIT 1)
+        WHERE hash IS NULL AND inode IS NOT NULL AND inode <> 0''')
     conn.commit()
+
+
+def stop_if_requested(pool, writer):
+    # Depois do Ctrl+C os arquivos em andamento já foram consumidos:
+    # grava e encerra aqui, antes de qualquer passo que suponha o walk inteiro
+    if pool.stopping:
+        writer.flush()
+        raise KeyboardInterrupt
+
+
+def print_progress(msg, count, total, estimated=False, rate=''):
+    # Sempre exibe duas linhas: mensagem e progresso. Com total estimado
+    # (ou desconhecido) o percentual nunca passa de 99% antes do fim.
+    # rate: taxas das métricas (arq/s, MB/s), no fim da linha de progresso.
+    if total:
+        pct = 100 * count // total
+        if estimated:
+            pct = min(pct, 99)
+        prefix = '~' if estimated else ''
+        progresso = f"Progresso: {count}/{prefix}{total} arquivos ({pct:.0f}%)"
+    else:
+        progresso = f"Progresso: {count} arquivos"
+    if rate:
+        progresso += f" - {rate}"
+    sys.stdout.write(f"\033[F\033[K{msg}\n\033[K{progresso}")
+    sys.stdout.flush()
+
+
+def scan_total(roots, conn, estimate_total=False):
+    # Total para a barra de progresso. A contagem exata custa uma travessia
+    # extra da árvore; a estimativa usa o número de linhas já no banco.
+    if estimate_total:
+        cur = conn.execute(f"SELECT COUNT(*) FROM {TABLE_NAME}")
+        return cur.fetchone()[0] or None
+    return sum(count_files(root, SCAN_EXTS) for _, root, _ in roots)
+
+
+def register_roots(conn, roots, pool):
+    # [(root_id, path, dispositivo)], as do mesmo dispositivo juntas
+    if isinstance(roots, str):
+        roots = [roots]
+    roots = registrar_raizes(conn, roots)
+    for _, root, device in roots:
+        descricao = pool.orcamento.descrever(device) if pool.orcamento else ''
+        print(f"[i] Raiz {root}" + (f" ({descricao})" if descricao else ''))
+    return roots
+
+
+def collect_metadata_to_db(roots, conn, start_count=0, size_first=False, staged=False, pool=None, estimate_total=False, writer=None, resume=False):
+    # roots: lista de pastas, percorridas uma depois da outra (agrupadas por
+    # dispositivo); o paralelismo entre discos fica para os estágios de hash.
+    # Com size_first=True o hash fica NULL nesta passada e só é calculado
+    # depois, em hash_size_candidates, para arquivos com tamanho repetido.
+    # staged=True usa os hashes parciais (prefixo, amostra) antes do completo.
+    # resume=True pula as pastas que o diário marca como concluídas.
+    size_first = size_first or staged
+    pool = pool or ScanPool()
+    writer = writer or BatchWriter(conn, metricas=pool.metricas)
+    metricas = pool.metricas
+    diario = DiarioScan(conn, writer, resume)
+    roots = register_roots(conn, roots, pool)
+    total = scan_total(roots, conn, estimate_total)
+    count = start_count
+    path_str = ''
+
+    linked = set()
+
+    def jobs():
+        for root_id, root, _ in roots:
+            files = iter_files(root, SCAN_EXTS,
+                               on_error=lambda path, e: metricas.erro('walk', path, e),
+                               skip_dir=diario.pasta_concluida, on_dir=diario.pasta_listada)
+            for path_str, _, ext, stat in metricas.medir_iter('walk', files):
+                if diario.arquivo_gravado(path_str):
+                    continue  # já processado
+                diario.enviado()
+                yield path_str, ext, not size_first and not seen_inode(linked, stat), None, stat, root_id
+
+    metricas.etapa('metadados')
+    for (path_str, *_, root_id), info, error in pool.imap(jobs()):
+        if error is None:
+            info['root_id'] = root_id
+            writer.insert(info)
+            metricas.arquivo(info)
+        else:
+            print(f'Falha ao obter metadados de : {path_str}')
+            metricas.erro('metadados', path_str, error)
+        diario.resultado(path_str, error is None)
+        count += 1
+        if count % 10 == 0:
+            print_progress(f"Coletando metadados: {path_str}",
+                           count, total, estimate_total, metricas.taxa())
+    if not pool.stopping:
+        diario.fim()
+    writer.flush()
+    stop_if_requested(pool, writer)
+    print_progress(f"Coletando metadados: {path_str}", count, count)
+    sys.stdout.write("\n")
+    if size_first:
+        hash_size_candidates(conn, staged=staged, pool=pool, writer=writer)
+    elif linked:
+        share_hash_by_inode(conn)
+
+
+def hash_size_candidates(conn, staged=False, pool=None, writer=None):
+    # Só arquivos que dividem o tamanho com outro podem ser duplicados.
+    # Os de tamanho único continuam com hash NULL.
+    pool = pool or ScanPool()
+    writer = writer or BatchWriter(conn, metricas=pool.metricas)
+    if staged:
+        hash_candidates_staged(conn, pool, writer)
+        return
+    rows = conn.execute(f'''SELECT id, path, tamanho, inode, dispositivo FROM {TABLE_NAME}
+        WHERE hash IS NULL AND tamanho IN (
+            SELECT tamanho FROM {TABLE_NAME} GROUP BY tamanho HAVING COUNT(*) > 1)''').fetchall()
+    run_hash_stage(conn, rows, 'Hash', lambda path, tamanho: {
+        'hash': hash_completo(path)}, pool, writer, bytes_read=lambda tamanho: tamanho)
+
+
+def hash_size_partners(conn, sizes, pool, writer):
+    # Bancos feitos com --tamanho-primeiro/--hash-em-estagios têm linhas de
+    # tamanho único sem hash completo. Quando um arquivo novo ou alterado
+    # recebe o hash e passa a dividir o tamanho com elas, elas precisam do
+    # hash também, senão o par não aparece como duplicado.
+    sizes = list(sizes)
+    rows = []
+    for i in range(0, len(sizes), SIZES_PER_QUERY):
+        lote = sizes[i:i + SIZES_PER_QUERY]
+        rows += conn.execute(f'''SELECT id, path, tamanho, inode, dispositivo FROM {TABLE_NAME}
+            WHERE hash IS NULL AND tamanho IN ({','.join(['?'] * len(lote))})''', lote).fetchall()
+    run_hash_stage(conn, rows, 'Hash', lambda path, tamanho: {
+        'hash': hash_completo(path)}, pool, writer, bytes_read=lambda tamanho: tamanho)
+
+
+def hash_candidates_staged(conn, pool, writer):
+    # Estágio 1: hash dos primeiros PREFIX_SIZE bytes dos tamanhos repetidos.
+    # Arquivos pequenos cabem inteiros no prefixo, então já recebem o hash completo.
+    rows = conn.execute(f'''SELECT id, path, tamanho, inode, dispositivo FROM {TABLE_NAME}
+        WHERE hash_prefixo IS NULL AND tamanho IN (
+            SELECT tamanho FROM {TABLE_NAME} GROUP BY tamanho HAVING COUNT(*) > 1)''').fetchall()
+
+    def stage_prefix(path, tamanho):
+        prefixo = hash_prefixo(path)
+        if tamanho <= PREFIX_SIZE:
+            return {'hash_prefixo': prefixo, 'hash': prefixo}
+        return {'hash_prefixo': prefixo}
+    run_hash_stage(conn, rows, 'Prefixo', stage_prefix, pool, writer,
+                   bytes_read=lambda tamanho: min(tamanho, PREFIX_SIZE))
+    # Estágio 2: início + meio + fim, só onde tamanho e prefixo colidem
+    rows = conn.execute(f'''SELECT id, path, tamanho, inode, dispositivo FROM {TABLE_NAME}
+        WHERE hash_amostra IS NULL AND tamanho > ? AND (tamanho, hash_prefixo) IN (
+            SELECT tamanho, hash_prefixo FROM {TABLE_NAME} WHERE hash_prefixo IS NOT NULL
+            GROUP BY tamanho, hash_prefixo HAVING COUNT(*) > 1)''', (PREFIX_SIZE,)).fetchall()
+    run_hash_stage(conn, rows, 'Amostra', lambda path, tamanho: {
+        'hash_amostra': hash_amostra(path, tamanho)}, pool, writer,
+        bytes_read=lambda tamanho: min(tamanho, 3 * SAMPLE_SIZE))
+    # Estágio 3: hash completo apenas para grupos que ainda colidem
+    rows = conn.execute(f'''SELECT id, path, tamanho, inode, dispositivo FROM {TABLE_NAME}
+        WHERE hash IS NULL AND tamanho > ? AND (tamanho, hash_amostra) IN (
+            SELECT tamanho, hash_amostra FROM {TABLE_NAME} WHERE hash_amostra IS NOT NULL
+            GROUP BY tamanho, hash_amostra HAVING COUNT(*) > 1)''', (PREFIX_SIZE,)).fetchall()
+    run_hash_stage(conn, rows, 'Hash completo', lambda path, tamanho: {
+        'hash': hash_completo(path)}, pool, writer, bytes_read=lambda tamanho: tamanho)
+
+
+def group_by_inode(rows):
+    # rows: (id, path, x, inode, dispositivo). Hardlinks (mesmo inode no mesmo
+    # dispositivo) são o mesmo dado: só o primeiro é lido, os outros ids
+    # recebem o mesmo resultado. Devolve [(row, [ids])].
+    grupos = {}
+    result = []
+    for row in rows:
+        id_, _, _, inode, dispositivo = row
+        if inode:
+            ids = grupos.get((inode, dispositivo))
+            if ids is not None:
+                ids.append(id_)
+                continue
+            ids = grupos[(inode, dispositivo)] = [id_]
+        else:
+            ids = [id_]
+        result.append((row, ids))
+    return result
+
+
+def run_hash_stage(conn, rows, label, hash_fn, pool, writer, bytes_read=None):
+    # hash_fn(path, tamanho) devolve {coluna: valor} a gravar na linha.
+    # O cálculo roda nas threads do pool; o UPDATE, nesta thread.
+    # bytes_read(tamanho): quanto o estágio lê de cada arquivo (métricas).
+    rows = group_by_inode(rows)
+    total = len(rows)
+    if not total:
+        return
+    metricas = pool.metricas
+    etapa = label.lower()
+    metricas.etapa(etapa)
+    print(f"[i] {label}: calculando {total} arquivos...\n")
+    count = 0
+
+    def timed(item):
+        inicio = time.perf_counter()
+        values = hash_fn(item[0][1], item[0][2])
+        return values, time.perf_counter() - inicio
+    # row[4] é o dispositivo: cada disco com o seu limite de leitores
+    results = pool.map_unordered(timed, rows, device=lambda item: item[0][4])
+    for ((id_, path_str, tamanho, *_), ids), future in results:
+        try:
+            values, segundos = future.result()
+            cols = ', '.join(f'{col}=?' for col in values)
+            for id_ in ids:
+                writer.execute(f"UPDATE {TABLE_NAME} SET {cols} WHERE id=?",
+                               (*values.values(), id_))
+            metricas.item(etapa, path_str, segundos,
+                          bytes_read(tamanho or 0) if bytes_read else 0)
+        except Exception as e:
+            print(f'Falha ao calcular hash de : {path_str}')
+            metricas.erro(etapa, path_str, e)
+        count += 1
+        if count % 10 == 0 or count == total:
+            print_progress(f"{label}: {path_str}", count, total, rate=metricas.taxa())
+    # Flush antes do próximo estágio, que consulta o que foi gravado aqui
+    writer.flush()
+    stop_if_requested(pool, writer)
     sys.stdout.write("\n")
 
 
+def fill_missing_phash(conn, pool=None, writer=None):
+    # Linhas gravadas antes da coluna phash: calcula só o que falta
+    pool = pool or ScanPool()
+    writer = writer or BatchWriter(conn, metricas=pool.metricas)
+    rows = conn.execute(f'''SELECT id, path, tamanho, inode, dispositivo FROM {TABLE_NAME}
+        WHERE phash IS NULL AND NOT IFNULL(corrompida, 0) AND NOT IFNULL(deletado, 0)
+        AND ext IN ({','.join(['?']*len(IMG_EXTS))})''', IMG_EXTS).fetchall()
+    run_hash_stage(conn, rows, 'Hash perceptual', lambda path, tamanho: {
+        'phash': phash_imagem(path)}, pool, writer)
+
+
+def fill_video_signatures(conn, pool=None, writer=None):
+    # Assinatura (dHash de quadros amostrados) dos vídeos que ainda não têm.
+    # Cada arquivo tem um orçamento de tempo; quem estoura fica com b''
+    # para não ser tentado de novo até mudar. Sem duração no banco (timeout
+    # do ffprobe, 'N/A', linhas antigas) grava a que o OpenCV leu, senão o
+    # vídeo nunca entraria em "Vídeos similares".
+    from video_fingerprint_utils import assinatura_para_blob, assinatura_video
+    pool = pool or ScanPool()
+    writer = writer or BatchWriter(conn, metricas=pool.metricas)
+    rows = conn.execute(f'''SELECT id, path, duracao, inode, dispositivo FROM {TABLE_NAME}
+        WHERE assinatura IS NULL AND NOT IFNULL(corrompida, 0) AND NOT IFNULL(deletado, 0)
+        AND ext IN ({','.join(['?']*len(VIDEO_EXTS))})''', VIDEO_EXTS).fetchall()
+
+    def signature(path, duracao):
+        hashes, duracao = assinatura_video(path, duracao)
+        return {'assinatura': assinatura_para_blob(hashes), 'duracao': duracao}
+    run_hash_stage(conn, rows, 'Assinatura de vídeo', signature, pool, writer)
+
+
+# Chave de agrupamento: o hash mais forte disponível em cada linha
+HASH_KEY = 'COALESCE(hash, hash_amostra, hash_prefixo)'
+
+
 def find_duplicates(conn, exts=None):
     if exts:
-        q = '''SELECT hash, tamanho, data_criacao, COUNT(*) as qtd FROM arquivos WHERE ext IN ({}) GROUP BY hash, tamanho, data_criacao HAVING qtd > 1'''.format(
-            ','.join(['?']*len(exts)))
+        q = '''SELECT {key} as chave, tamanho, data_criacao, COUNT(*) as qtd FROM arquivos WHERE {key} IS NOT NULL AND ext IN ({}) GROUP BY chave, tamanho, data_criacao HAVING qtd > 1'''.format(
+            ','.join(['?']*len(exts)), key=HASH_KEY)
         params = exts
     else:
-        q = '''SELECT hash, tamanho, data_criacao, COUNT(*) as qtd FROM arquivos GROUP BY hash, tamanho, data_criacao HAVING qtd > 1'''
+        q = '''SELECT {key} as chave, tamanho, data_criacao, COUNT(*) as qtd FROM arquivos WHERE {key} IS NOT NULL GROUP BY chave, tamanho, data_criacao HAVING qtd > 1'''.format(
+            key=HASH_KEY)
         params = []
     return conn.execute(q, params).fetchall()
 
 
 def list_files_by_key(conn, hash_, tamanho, data_criacao):
-    return conn.execute('''SELECT * FROM arquivos WHERE hash=? AND tamanho=? AND data_criacao=?''', (hash_, tamanho, data_criacao)).fetchall()
+    return conn.execute(f'''SELECT * FROM arquivos WHERE {HASH_KEY}=? AND tamanho=? AND data_criacao=?''', (hash_, tamanho, data_criacao)).fetchall()
 
 
-def update_only_changes(root_folder, conn):
-    print("[i] Buscando arquivos atuais no disco...")
-    disk_paths = set()
-    for root, _, files in os.walk(root_folder):
-        for name in files:
-            path = Path(root) / name
-            ext = path.suffix.lower()
-            if ext not in IMG_EXTS and ext not in VIDEO_EXTS and ext not in DOC_EXTS:
-                continue
-            if sys.platform.startswith('win'):
-                path_str = str(path)
-            else:
-                path_str = path.as_posix()
-            disk_paths.add(path_str)
-    db_paths = get_existing_paths(conn)
-    # Remover do banco os que não existem mais
-    to_remove = db_paths - disk_paths
-    if to_remove:
-        print(
-            f"[i] Removendo {len(to_remove)} arquivos que não existem mais...\n")
-        cur = conn.cursor()
-        for p in to_remove:
-            cur.execute(f"DELETE FROM {TABLE_NAME} WHERE path=?", (p,))
-        conn.commit()
-    # Inserir novos e atualizar modificados
+def print_duplicates(conn):
+    grupos = find_duplicates(conn)
+    for chave, tamanho, data_criacao, qtd in grupos:
+        print(f"\n[=] {qtd} arquivos, {tamanho} bytes, {data_criacao} ({chave[:12]})")
+        for row in list_files_by_key(conn, chave, tamanho, data_criacao):
+            print(f"    {row[2]}")
+    print(f"\n[i] {len(grupos)} grupos de duplicados encontrados.")
+
+
+def load_file_stats(conn, roots=None):
+    # Uma única consulta: path -> (tamanho, mtime_ns, inode, dispositivo, data_criacao).
+    # roots: só os arquivos dentro dessas pastas (os de outras raízes não
+    # são vistos pelo walk e não podem ser dados como removidos)
+    sql = f"SELECT path, tamanho, mtime_ns, inode, dispositivo, data_criacao FROM {TABLE_NAME}"
+    params = []
+    if roots is not None:
+        prefixes = [prefixo_raiz(root) for root in roots]
+        if not prefixes:
+            return {}
+        sql += ' WHERE ' + ' OR '.join(['substr(path, 1, ?) = ?'] * len(prefixes))
+        params = [v for prefix in prefixes for v in (len(prefix), prefix)]
+    cur = conn.execute(sql, params)
+    return {row[0]: row[1:] for row in cur}
+
+
+def stat_unchanged(row, stat):
+    tamanho, mtime_ns, inode, dispositivo, _ = row
+    return (mtime_ns is not None and tamanho == stat.st_size and mtime_ns == stat.st_mtime_ns
+            and inode == stat.st_ino and dispositivo == stat.st_dev)
+
+
+def store_scan_result(writer, info, known):
+    # Grava um resultado de scan_file_metadata; known None é arquivo novo
+    # (ver submit). Devolve 'novo', 'modificado' ou 'sem_alteracao'.
+    if known is None:
+        writer.insert(info)
+        return 'novo'
+    if info['alterado']:
+        writer.execute(f"UPDATE {TABLE_NAME} SET tamanho=?, data_criacao=?, hash=?, corrompida=?, mtime_ns=?, inode=?, dispositivo=?, duracao=?, phash=?, assinatura=NULL, dedup=NULL, dedup_origem=NULL, hash_prefixo=NULL, hash_amostra=NULL WHERE path=?",
+                       (info['tamanho'], info['data_criacao'], info['hash'], info['corrompida'], info['mtime_ns'], info['inode'], info['dispositivo'], info['duracao'], info['phash'], info['path']))
+        return 'modificado'
+    writer.execute(f"UPDATE {TABLE_NAME} SET mtime_ns=?, inode=?, dispositivo=? WHERE path=?",
+                   (info['mtime_ns'], info['inode'], info['dispositivo'], info['path']))
+    return 'sem_alteracao'
+
+
+def update_only_changes(roots, conn, size_first=False, staged=False, pool=None, estimate_total=False, writer=None):
+    size_first = size_first or staged
+    pool = pool or ScanPool()
+    writer = writer or BatchWriter(conn, metricas=pool.metricas)
+    # Inserir novos e atualizar modificados, numa única passada pelo disco.
+    # "Sem alteração" é decidido só pelo stat (tamanho, mtime, inode),
+    # comparado com o que foi carregado do banco numa única consulta.
     print("[i] Verificando novos e modificados...")
-    cur = conn.cursor()
-    # Calcular total de arquivos para barra de progresso
-    total = sum(len(files) for _, _, files in os.walk(root_folder))
+    roots = register_roots(conn, roots, pool)
+    total = scan_total(roots, conn, estimate_total)
+    db_rows = load_file_stats(conn, [root for _, root, _ in roots])
     count = 0
-    for root, _, files in os.walk(root_folder):
-        for name in files:
-            path = Path(root) / name
-            ext = path.suffix.lower()
-            if ext not in IMG_EXTS and ext not in VIDEO_EXTS and ext not in DOC_EXTS:
-                continue
-            if sys.platform.startswith('win'):
-                path_str = str(path)
-            else:
-                path_str = path.as_posix()
-            stat = path.stat()
-            cur.execute(
-                f"SELECT tamanho, data_criacao, hash FROM {TABLE_NAME} WHERE path=?", (path_str,))
-            row = cur.fetchone()
-            if row is None:
-                # Novo arquivo
-                corrupted = False
-                if ext in IMG_EXTS:
-                    try:
-                        with Image.open(path) as img:
-                            img.verify()
-                    except Exception:
-                        corrupted = True
-                # Para documentos, não verifica corrupção
-                info = {
-                    'nome': name,
-                    'path': path_str,
-                    'hash': file_hash(path),
-                    'tamanho': stat.st_size,
-                    'data_criacao': creation_date(path),
-                    'corrompida': corrupted,
-                    'ext': ext
-                }
-                insert_file(conn, info)
+    unchanged = 0
+    msg = '[i] Sem alteração'
+    linked = set()
+    hashed_sizes = set()
+    metricas = pool.metricas
+
+    def jobs():
+        nonlocal count, unchanged
+        for root_id, root, _ in roots:
+            files = iter_files(root, SCAN_EXTS,
+                               on_error=lambda path, e: metricas.erro('walk', path, e))
+            for path_str, _, ext, stat in metricas.medir_iter('walk', files):
+                row = db_rows.pop(path_str, None)
+                if row is None:
+                    known = None
+                elif stat_unchanged(row, stat):
+                    unchanged += 1
+                    count += 1
+                    metricas.contar('sem_alteracao')
+                    if count % 1000 == 0:
+                        print_progress(f"[i] Sem alteração: {path_str}",
+                                       count, total, estimate_total, metricas.taxa())
+                    continue
+                elif row[1] is None:
+                    # Linha antiga, sem mtime_ns: compara como antes e grava o stat
+                    known = (row[0], row[4])
+                else:
+                    known = ()
+                yield path_str, ext, not size_first and not seen_inode(linked, stat), known, stat, root_id
+
+    metricas.etapa('delta')
+    for (path_str, _, _, known, _, root_id), info, error in pool.imap(jobs()):
+        if error is not None:
+            msg = f"Falha ao obter metadados de : {path_str}\n"
+            metricas.erro('metadados', path_str, error)
+        else:
+            info['root_id'] = root_id
+            status = store_scan_result(writer, info, known)
+            if info['hash'] is not None and status != 'sem_alteracao':
+                hashed_sizes.add(info['tamanho'])
+            if status == 'novo':
                 msg = f"[+] Novo: {path_str}\n"
+            elif status == 'modificado':
+                msg = f"[*] Modificado: {path_str}\n"
             else:
-                tam_db, dt_db, hash_db = row
-                tam_fs = stat.st_size
-                dt_fs = creation_date(path)
-                if tam_db != tam_fs or dt_db != dt_fs:
-                    # Modificado
-                    corrupted = False
-                    if ext in IMG_EXTS:
-                        try:
-                            with Image.open(path) as img:
-                                img.verify()
-                        except Exception:
-                            corrupted = True
-                    hash_fs = file_hash(path)
-                    # Garante que data_criacao é string
-                    if not isinstance(dt_fs, str):
-                        import datetime
-                        try:
-                            dt_fs = datetime.datetime.fromtimestamp(
-                                float(dt_fs)).strftime('%Y-%m-%d %H:%M:%S')
-                        except Exception:
-                            dt_fs = str(dt_fs)
-                    cur.execute(f"UPDATE {TABLE_NAME} SET tamanho=?, data_criacao=?, hash=?, corrompida=? WHERE path=?",
-                                (tam_fs, dt_fs, hash_fs, corrupted, path_str))
-                    msg = f"[*] Modificado: {path_str}\n"
-                else:
-                    msg = f"[i] Sem alteração: {path_str}"
-            count += 1
-            if count % 10 == 0 or count == total:
-                pct = 100 * count // total
-                # Sempre exibe duas linhas: path (ou vazio) e progresso, igual ao encontra_repetidos.py
-                sys.stdout.write(
-                    f"\033[F\033[K{msg}\n\033[KProgresso: {count}/{total} arquivos ({pct:.0f}%)")
-                sys.stdout.flush()
-    conn.commit()
+                unchanged += 1
+                msg = f"[i] Sem alteração: {path_str}"
+            metricas.arquivo(info)
+        count += 1
+        if count % 10 == 0:
+            print_progress(msg, count, total, estimate_total, metricas.taxa())
+    writer.flush()
+    # Interrompido: o que sobrou em db_rows não foi visto, não foi removido
+    stop_if_requested(pool, writer)
+    print_progress(msg, count, count)
     sys.stdout.write("\n")
+    print(f"[i] {unchanged} arquivos sem alteração.")
+    # Remover do banco os que não existem mais (o que sobrou em db_rows)
+    if db_rows:
+        print(
+            f"[i] Removendo {len(db_rows)} arquivos que não existem mais...")
+        conn.executemany(f"DELETE FROM {TABLE_NAME} WHERE path=?",
+                         ((p,) for p in db_rows))
+        conn.commit()
+    if size_first:
+        hash_size_candidates(conn, staged=staged, pool=pool, writer=writer)
+    else:
+        if linked:
+            share_hash_by_inode(conn)
+        # Delta comum sobre um banco feito com --tamanho-primeiro
+        hash_size_partners(conn, hashed_sizes, pool, writer)
     print("[✓] Atualização concluída.")
 
 
-def main():
-    conn = sqlite3.connect(DB_PATH)
-    create_table(conn)
-    cur = conn.cursor()
-    cur.execute(f"SELECT COUNT(*) FROM {TABLE_NAME}")
-    count = cur.fetchone()[0]
-    if count > 0:
-        processed_paths, already, mode = ask_reset_table(conn)
-    else:
-        processed_paths = set()
-        already = 0
-        mode = 'full'
+def add_scan_args(parser):
+    # Opções do escaneamento, usadas também pelo duplicados_cli.py
+    parser.add_argument('--tamanho-primeiro', action='store_true',
+                        help='Calcula o hash apenas de arquivos com tamanho repetido')
+    parser.add_argument('--hash-em-estagios', action='store_true',
+                        help='Como --tamanho-primeiro, mas compara prefixo e amostras antes do hash completo')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help='Número de workers para hash e metadados (padrão: núcleos da CPU)')
+    parser.add_argument('--processos', action='store_true',
+                        help='Usa processos (em vez de threads) para verify/EXIF do Pillow')
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE,
+                        help=f'Linhas por executemany/commit (padrão: {BATCH_SIZE})')
+    parser.add_argument('--raizes', metavar='ARQUIVO',
+                        help='Arquivo com as pastas a escanear, uma por linha (# comenta)')
+    parser.add_argument('--leitores-hdd', type=int, default=LEITORES_HDD,
+                        help=f'Arquivos lidos ao mesmo tempo em cada disco giratório (padrão: {LEITORES_HDD})')
+    parser.add_argument('--leitores-rede', type=int, default=LEITORES_REDE,
+                        help=f'Arquivos lidos ao mesmo tempo em cada montagem de rede (padrão: {LEITORES_REDE})')
+    parser.add_argument('--total-estimado', action='store_true',
+                        help='Não percorre a árvore só para contar; estima o total pelo banco')
+    parser.add_argument('--ffprobe-concorrencia', type=int, default=FFPROBE_CONCURRENCY,
+                        help=f'Máximo de ffprobe rodando ao mesmo tempo (padrão: {FFPROBE_CONCURRENCY})')
+    parser.add_argument('--ffprobe-timeout', type=float, default=FFPROBE_TIMEOUT,
+                        help=f'Segundos até desistir de um vídeo no ffprobe (padrão: {FFPROBE_TIMEOUT})')
+    parser.add_argument('--assinatura-video', action='store_true',
+                        help='Calcula a assinatura dos vídeos para achar recodificações (decodifica quadros)')
+    parser.add_argument('--metricas', metavar='DESTINO',
+                        help='Grava snapshots JSON (arq/s, MB/s, tempo por etapa, erros) em um arquivo '
+                        'JSON Lines, em udp://host:porta ou em - (stderr)')
+    parser.add_argument('--metricas-intervalo', type=float, default=INTERVALO_METRICAS,
+                        help=f'Segundos entre snapshots (padrão: {INTERVALO_METRICAS:g})')
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Coleta metadados dos arquivos e busca duplicados.')
+    add_scan_args(parser)
+    parser.add_argument('--raiz', action='append',
+                        help=f'Pasta a escanear; pode repetir (padrão: {TARGET_ROOT})')
+    parser.add_argument('--so-busca', action='store_true',
+                        help='Não escaneia, apenas lista os duplicados já gravados no banco')
+    return parser.parse_args(argv)
+
 
-    # Handler para commit seguro no Ctrl+C
+def roots_from_args(args, roots=()):
+    # roots (da linha de comando) mais as do arquivo de --raizes
+    roots = list(roots)
+    if args.raizes:
+        roots += ler_arquivo_raizes(args.raizes)
+    return roots
+
+
+def make_pool(args, metricas):
+    # ScanPool das opções de add_scan_args: ffprobe configurado (também nos
+    # processos) e limite de leitores por dispositivo
+    video_meta_args = (args.ffprobe_concorrencia, args.ffprobe_timeout)
+    if not configure_video_meta_service(*video_meta_args).has_ffprobe:
+        print("[!] ffprobe não encontrado; vídeos usam OpenCV (sem data de criação).")
+    orcamento = OrcamentoDispositivos(args.workers, args.leitores_hdd, args.leitores_rede)
+    return ScanPool(args.workers, use_processes=args.processos,
+                    initializer=configure_video_meta_service, initargs=video_meta_args, metricas=metricas,
+                    orcamento=orcamento)
+
+
+def run_scan(conn, roots, mode, args, already=0):
+    # roots: pastas a escanear, no mesmo banco (duplicados entre discos
+    # aparecem juntos); mode: 'full', 'continue' ou 'delta' (as opções de
+    # ask_reset_table); args: opções de add_scan_args. Fecha a conexão no fim.
+    apply_scan_pragmas(conn)
+    metricas = Metricas(args.metricas, args.metricas_intervalo)
+    pool = make_pool(args, metricas)
+    writer = BatchWriter(conn, args.batch_size, metricas)
+
+    def finish_metrics():
+        metricas.encerrar()
+        print(metricas.resumo())
+
+    # Ctrl+C: o primeiro para de enviar arquivos e deixa o laço gravar os
+    # que estão em andamento (e o diário); o segundo sai na hora
     def handle_sigint(signum, frame):
-        print("\n[!] Interrompido pelo usuário. Salvando progresso...")
-        conn.commit()
+        if not pool.stopping:
+            print("\n[!] Interrompido pelo usuário. Gravando os arquivos em andamento "
+                  "(Ctrl+C de novo para sair já)...")
+            pool.stop()
+            return
+        print("\n[!] Saindo sem esperar. Salvando progresso...")
+        pool.shutdown(wait=False)
+        writer.flush()
         conn.close()
+        finish_metrics()
         sys.exit(0)
     signal.signal(signal.SIGINT, handle_sigint)
 
     try:
         if mode == 'full':
             collect_metadata_to_db(
-                TARGET_ROOT, conn, processed_paths, start_count=already)
+                roots, conn, start_count=already, size_first=args.tamanho_primeiro, staged=args.hash_em_estagios, pool=pool, estimate_total=args.total_estimado, writer=writer)
         elif mode == 'continue':
             collect_metadata_to_db(
-                TARGET_ROOT, conn, processed_paths, start_count=already)
+                roots, conn, start_count=already, size_first=args.tamanho_primeiro, staged=args.hash_em_estagios, pool=pool, estimate_total=args.total_estimado, writer=writer, resume=True)
         elif mode == 'delta':
-            update_only_changes(TARGET_ROOT, conn)
+            update_only_changes(
+                roots, conn, size_first=args.tamanho_primeiro, staged=args.hash_em_estagios, pool=pool, estimate_total=args.total_estimado, writer=writer)
+        fill_missing_phash(conn, pool=pool, writer=writer)
+        if args.assinatura_video:
+            fill_video_signatures(conn, pool=pool, writer=writer)
     except KeyboardInterrupt:
         print("\n[!] Interrompido pelo usuário. Salvando progresso...")
-        conn.commit()
+        pool.shutdown(wait=False)
+        writer.flush()
         conn.close()
+        finish_metrics()
         sys.exit(0)
+    pool.shutdown()
     conn.commit()
     conn.close()
+    finish_metrics()
     print("\n[✓] Coleta finalizada.")
 
 
+def main():
+    args = parse_args()
+    conn = sqlite3.connect(DB_PATH)
+    create_table(conn)
+    if args.so_busca:
+        print_duplicates(conn)
+        conn.close()
+        return
+    cur = conn.cursor()
+    cur.execute(f"SELECT COUNT(*) FROM {TABLE_NAME}")
+    count = cur.fetchone()[0]
+    if count > 0:
+        already, mode = ask_reset_table(conn)
+    else:
+        already = 0
+        mode = 'full'
+    run_scan(conn, roots_from_args(args, args.raiz or ()) or [TARGET_ROOT], mode, args, already)
+
+
 if __name__ == '__main__':
     main()
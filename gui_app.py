@@ -1,60 +1,157 @@
 # Módulo para a interface gráfica principal
-import fnmatch
 import os
+import queue
 import sys
 import tkinter as tk
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from tkinter import messagebox, ttk
 
-from db_utils import (
-    buscar_duplicadas,
-    get_connection,
-    marcar_deletado,
-    total_deletado_mb,
-)
+from db_utils import (get_connection, marcar_deletados, marcar_ignorados,
+                      marcar_ligados, total_deletado_mb)
+from dedup_utils import bytes_recuperados, ligar_par, planejar_links
 from document_utils import existe_documento, gerar_miniatura_documento
+from file_exts import IMG_EXTS, VIDEO_EXTS
 from image_utils import existe_arquivo, gerar_miniatura, verificar_corrompida
+from lote_utils import LoteEmThreads
+from paginacao_utils import BUSCAS_EM_MEMORIA, FonteDuplicadas
 from PIL import ImageTk
 from send2trash import send2trash
+from thumb_cache_utils import CacheMiniaturas
 from video_utils import existe_video, gerar_thumb_video
 
 DB_PATH = os.path.join(os.path.dirname(
     os.path.abspath(__file__)), 'arquivos.db')
 
+# Grade virtual (pixels)
+GRADE_MARGEM = 10
+GRADE_ESPACO = 12
+GRADE_CABECALHO = 24
+QUADRO_FUNDO = '#f0f0f0'
+GRUPO_CORES = ('#3a6ea5', '#c07a1a')
+# Quantas miniaturas (PhotoImage) ficam em memória para rolar de volta
+FOTOS_EM_MEMORIA = 600
+
+
+class QuadroCanvas:
+    # Um quadro da grade: itens desenhados direto no canvas, reaproveitados
+    # para outro arquivo quando saem da área visível
+    def __init__(self, canvas, size, largura, altura):
+        self.canvas = canvas
+        self.tag = f'quadro{id(self)}'
+        self.idx = None
+        self.arquivo = None
+        self.x = self.y = 0
+        self.largura = largura
+        tags = ('quadro', self.tag)
+        meio = largura // 2
+        topo = 22
+        self.fundo = canvas.create_rectangle(
+            0, 0, largura, altura, width=2, tags=tags)
+        self.data = canvas.create_text(
+            meio, 4, anchor='n', font=("Arial", 9), fill="#333", tags=tags)
+        self.area = canvas.create_rectangle(
+            meio - size // 2, topo, meio + size // 2, topo + size, width=0, tags=tags)
+        self.img = canvas.create_image(meio, topo + size // 2, tags=tags)
+        self.msg = canvas.create_text(
+            meio, topo + size // 2, width=size, justify='center', tags=tags)
+        self.chk = canvas.create_text(
+            meio, topo + size + 14, font=("Arial", 10), tags=tags)
+        self.path = canvas.create_text(
+            8, topo + size + 30, anchor='nw', width=largura - 16, font=("Arial", 8), tags=tags)
+        self.esconder()
+
+    def mover(self, x, y):
+        self.canvas.move(self.tag, x - self.x, y - self.y)
+        self.x, self.y = x, y
+        self.canvas.itemconfig(self.tag, state='normal')
+
+    def esconder(self):
+        self.canvas.itemconfig(self.tag, state='hidden')
+        self.canvas.itemconfig(self.img, image='')
+        self.idx = None
+        self.arquivo = None
+
+    def mensagem(self, texto, fundo='', cor='black', fonte=("Arial", 9)):
+        self.canvas.itemconfig(self.img, image='', state='hidden')
+        self.canvas.itemconfig(self.area, fill=fundo)
+        self.canvas.itemconfig(
+            self.msg, text=texto, fill=cor, font=fonte, state='normal')
+
+    def imagem(self, foto):
+        self.canvas.itemconfig(self.msg, state='hidden')
+        self.canvas.itemconfig(self.area, fill='')
+        self.canvas.itemconfig(self.img, image=foto, state='normal')
+
+    def encurtar(self, path):
+        # Até 3 linhas (Arial 8 ~ 5.5px por caractere); corta o início
+        limite = int((self.largura - 16) / 5.5) * 3
+        if len(path) > limite:
+            return '…' + path[-(limite - 1):]
+        return path
+
 
 class DuplicadasDBApp(tk.Tk):
     def _selecionar_todos_filtro(self):
         # Só permite seleção se o filtro estiver preenchido
         filtro = self.var_path_filter.get().strip()
-        # Se não houver coringa, adiciona '*' ao final
-        if filtro and '*' not in filtro and '?' not in filtro:
-            filtro += '*'
-        filtro_lower = filtro.lower()
         if not filtro:
             messagebox.showinfo(
                 "Filtro obrigatório", "Digite um path no filtro para usar esta função.")
             return
-        for i, (arquivo, grupo_idx) in enumerate(self.all_arquivos):
-            path = str(arquivo['path']).lower()
-            deletado = arquivo['deletado'] if 'deletado' in arquivo.keys(
-            ) else False
-            if fnmatch.fnmatch(path, filtro_lower) and not deletado:
-                self.check_vars[i].set(True)
-            else:
-                self.check_vars[i].set(False)
-        self._show_page()
+        # Seleciona exatamente os arquivos (não deletados) que casam com o filtro
+        self.selecionados = self.fonte.ids_por_filtro(filtro)
+        self._atualizar_visiveis()
 
     def __init__(self):
         tk.Tk.__init__(self)
         self.title('Visualizador de Duplicadas (DB)')
         self.conn = get_connection(DB_PATH)
-        from db_utils import ensure_ignorado_column
-        ensure_ignorado_column(self.conn)
+        from db_utils import ensure_indices
+        ensure_indices(self.conn)
+        self.fonte = FonteDuplicadas(self.conn)
+        self.cache_miniaturas = CacheMiniaturas()
+        # Miniaturas são geradas em threads; o resultado volta por uma fila
+        # lida com after(). Trocar a "geração" descarta o que estava pendente.
+        self._thumb_executor = ThreadPoolExecutor(
+            max_workers=min(8, os.cpu_count() or 2))
+        self._thumb_fila = queue.Queue()
+        self._thumb_geracao = 0
+        self._thumb_futures = []
+        self._thumb_pendentes = 0
+        self._thumb_poll_id = None
+        self._solicitadas = set()
+        # Pré-carga da próxima página: uma thread só, separada, para nunca
+        # ficar na frente das miniaturas da tela; cancelada ao rolar
+        self._prefetch_executor = ThreadPoolExecutor(max_workers=1)
+        self._prefetch_geracao = 0
+        self._prefetch_futures = []
+        # Espera pelos grupos de 'similares'/'videos_similares' (calculados
+        # numa thread da fonte); cada _load_duplicadas troca a espera e a
+        # anterior para
+        self._busca_espera = 0
+        self._buscando = False
+        # Grade virtual: só as linhas visíveis viram itens no canvas e os
+        # quadros são reaproveitados ao rolar (ver _render_visiveis)
+        self.arquivos_pagina = []
+        self._linhas = []
+        self._pos = []
+        self._passo = 1
+        self._colunas = 0
+        self._visiveis = {}
+        self._quadros_livres = []
+        self._cabecalhos_visiveis = {}
+        self._cabecalhos_livres = []
+        self._fotos = OrderedDict()
+        self.protocol('WM_DELETE_WINDOW', self._on_close)
         self.contexto = 'imagens'
         self.per_page = 50
         self.page = 0
+        self.total_pages = 1
         self.thumb_size = 200
-        self.img_refs = []
-        self.check_vars = []
+        self.quadros_video = 1
+        # Seleção guardada só como ids
+        self.selecionados = set()
         self.var_path_filter = tk.StringVar()
         self.var_considerar_ignorados = tk.BooleanVar(value=True)
         self._build_ui_pre_canvas()
@@ -66,43 +163,62 @@ class DuplicadasDBApp(tk.Tk):
         self.chk_ignorados.pack(side=tk.LEFT, padx=5)
         self._load_duplicadas()
 
+    def _on_close(self):
+        self._cancelar_miniaturas()
+        self._thumb_executor.shutdown(wait=False, cancel_futures=True)
+        self._prefetch_executor.shutdown(wait=False, cancel_futures=True)
+        self.destroy()
+
     def _on_considerar_ignorados_change(self):
         self._load_duplicadas()
 
     def ignorar_selecionados(self):
-        from db_utils import marcar_ignorado
-        selecionados = [i for i, var in enumerate(
-            self.check_vars) if var.get()]
+        selecionados = list(self.fonte.arquivos_por_ids(self.selecionados))
         if not selecionados:
             messagebox.showinfo(
                 "Nenhum selecionado", "Selecione arquivos para ignorar/desfazer ignorar.")
             return
         if not messagebox.askyesno("Confirmar ignorar", f"Ignorar/desfazer ignorar {len(selecionados)} arquivos?"):
             return
-        # Janela de progresso
+        # Só banco: um executemany numa transação, sem janela de progresso
+        try:
+            marcar_ignorados(
+                self.conn, [arquivo['path'] for arquivo in selecionados])
+        except Exception as e:
+            messagebox.showerror("Erro ao ignorar", str(e))
+        self._load_duplicadas()
+
+    def _acompanhar_lote(self, titulo, lote, ao_concluir):
+        # Janela de progresso atualizada por after(): o lote roda em threads
+        # e a thread principal só lê o contador; ao_concluir(lote) grava no banco
         progresso = tk.Toplevel(self)
-        progresso.title("Ignorando arquivos...")
-        progresso.geometry("400x100")
-        label = tk.Label(
-            progresso, text="Ignorando arquivos...", font=("Arial", 12))
+        progresso.title(titulo)
+        progresso.geometry("400x130")
+        progresso.transient(self)
+        label = tk.Label(progresso, text=titulo, font=("Arial", 12))
         label.pack(pady=10)
         barra = ttk.Progressbar(progresso, length=350,
-                                mode='determinate', maximum=len(selecionados))
-        barra.pack(pady=10)
-        progresso.update()
-        for n, idx in enumerate(selecionados, 1):
-            arquivo, _ = self.all_arquivos[idx]
-            path = arquivo['path']
-            try:
-                marcar_ignorado(self.conn, path)
-            except Exception as e:
-                messagebox.showerror("Erro ao ignorar", f"{path}\n{e}")
-            barra['value'] = n
-            label.config(
-                text=f"Ignorando arquivo {n} de {len(selecionados)}...")
-            progresso.update()
-        progresso.destroy()
-        self._load_duplicadas()
+                                mode='determinate', maximum=max(lote.total, 1))
+        barra.pack(pady=5)
+        btn_cancelar = tk.Button(
+            progresso, text='Cancelar', command=lote.cancelar)
+        btn_cancelar.pack(pady=5)
+        progresso.protocol('WM_DELETE_WINDOW', lote.cancelar)
+        progresso.grab_set()
+
+        def atualizar():
+            barra['value'] = lote.feitos
+            if lote.cancelado:
+                label.config(text=f"Cancelando... {lote.feitos} de {lote.total}")
+            else:
+                label.config(text=f"Arquivo {lote.feitos} de {lote.total}...")
+            if lote.concluido:
+                progresso.grab_release()
+                progresso.destroy()
+                ao_concluir(lote)
+            else:
+                self.after(100, atualizar)
+        atualizar()
 
     def _on_considerar_deletados_change(self):
         self._load_duplicadas()
@@ -128,6 +244,10 @@ class DuplicadasDBApp(tk.Tk):
                        value='videos', command=self._on_contexto_change).pack(side=tk.LEFT)
         tk.Radiobutton(header1, text='Documentos', variable=self.var_contexto,
                        value='documentos', command=self._on_contexto_change).pack(side=tk.LEFT)
+        tk.Radiobutton(header1, text='Similares', variable=self.var_contexto,
+                       value='similares', command=self._on_contexto_change).pack(side=tk.LEFT)
+        tk.Radiobutton(header1, text='Vídeos similares', variable=self.var_contexto,
+                       value='videos_similares', command=self._on_contexto_change).pack(side=tk.LEFT)
         tk.Radiobutton(header1, text='Corrompidos', variable=self.var_contexto,
                        value='corrompidos', command=self._on_contexto_change).pack(side=tk.LEFT)
         self.lbl_total_duplicados = tk.Label(
@@ -155,7 +275,7 @@ class DuplicadasDBApp(tk.Tk):
             side=tk.LEFT, padx=5)
         self.var_per_page = tk.StringVar(value=str(self.per_page))
         self.per_page_menu = ttk.Combobox(header2, textvariable=self.var_per_page, values=[
-            "50", "100", "200"], width=5, state='readonly')
+            "50", "100", "200", "500", "1000", "5000"], width=5, state='readonly')
         self.per_page_menu.pack(side=tk.LEFT)
         self.per_page_menu.bind('<<ComboboxSelected>>',
                                 self._on_per_page_change)
@@ -182,6 +302,14 @@ class DuplicadasDBApp(tk.Tk):
         self.thumb_size_menu.pack(side=tk.LEFT)
         self.thumb_size_menu.bind(
             '<<ComboboxSelected>>', self._on_thumb_size_change)
+        tk.Label(header2, text='Quadros por vídeo:').pack(
+            side=tk.LEFT, padx=10)
+        self.var_quadros_video = tk.StringVar(value=str(self.quadros_video))
+        self.quadros_video_menu = ttk.Combobox(header2, textvariable=self.var_quadros_video, values=[
+            "1", "3", "4", "9"], width=3, state='readonly')
+        self.quadros_video_menu.pack(side=tk.LEFT)
+        self.quadros_video_menu.bind(
+            '<<ComboboxSelected>>', self._on_quadros_video_change)
 
         # Cabeçalho 3: filtro de path
         header3 = tk.Frame(self.main_frame)
@@ -212,22 +340,20 @@ class DuplicadasDBApp(tk.Tk):
         self.btn_excluir = tk.Button(rodape, text="Excluir Selecionados",
                                      command=self.excluir_selecionados, bg='#c00', fg='white')
         self.btn_excluir.pack(side=tk.LEFT, fill=tk.X, expand=True)
+        self.btn_linkar = tk.Button(rodape, text="Substituir Selecionados por Links",
+                                    command=self.linkar_selecionados, bg='#06c', fg='white')
+        self.btn_linkar.pack(side=tk.LEFT, fill=tk.X, expand=True)
 
     def _build_canvas_area(self):
         # Frame dedicado para canvas e scrollbar lado a lado
         self.canvas_frame = tk.Frame(self.main_frame)
         self.canvas_frame.pack(side=tk.TOP, fill=tk.BOTH, expand=True)
-        self.scroll_canvas = tk.Canvas(self.canvas_frame)
+        self.scroll_canvas = tk.Canvas(self.canvas_frame, yscrollincrement=40)
         self.scroll_canvas.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
         self.scrollbar = ttk.Scrollbar(
-            self.canvas_frame, orient="vertical", command=self.scroll_canvas.yview)
+            self.canvas_frame, orient="vertical", command=self._on_yview)
         self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
         self.scroll_canvas.configure(yscrollcommand=self.scrollbar.set)
-        self.inner_frame = tk.Frame(self.scroll_canvas)
-        self.window_id = self.scroll_canvas.create_window(
-            (0, 0), window=self.inner_frame, anchor='nw')
-        self.inner_frame.bind("<Configure>", lambda e: self.scroll_canvas.configure(
-            scrollregion=self.scroll_canvas.bbox("all")))
         self.scroll_canvas.bind_all("<MouseWheel>", self._on_mousewheel)
         self.scroll_canvas.bind_all("<Button-4>", self._on_mousewheel)
         self.scroll_canvas.bind_all("<Button-5>", self._on_mousewheel)
@@ -236,7 +362,7 @@ class DuplicadasDBApp(tk.Tk):
         def on_resize(event):
             if self._resize_after_id:
                 self.after_cancel(self._resize_after_id)
-            self._resize_after_id = self.after(300, self._show_page)
+            self._resize_after_id = self.after(100, self._relayout)
         self.scroll_canvas.bind('<Configure>', on_resize)
 
     # ... (Canvas já criado em _build_ui_pre_canvas)
@@ -261,190 +387,376 @@ class DuplicadasDBApp(tk.Tk):
         except Exception as e:
             messagebox.showerror("Erro ao abrir", f"{path}\n{e}")
 
-    def _destacar_quadro(self, var, quadro_widget, ignorado=False):
+    def _on_check(self, quadro):
+        arquivo = quadro.arquivo
+        if arquivo is None or arquivo['deletado']:
+            return
+        if arquivo['id'] in self.selecionados:
+            self.selecionados.discard(arquivo['id'])
+        else:
+            self.selecionados.add(arquivo['id'])
+        self._destacar_quadro(quadro)
+
+    def _on_ctrl_click(self, event, quadro):
+        if quadro.arquivo is not None and not quadro.arquivo['deletado']:
+            self._open_path(event, quadro.arquivo['path'], open_folder=True)
+
+    def _destacar_quadro(self, quadro):
         # Selecionado: amarelo. Ignorado: cinza escuro. Ambos: amarelo.
-        if var.get():
-            quadro_widget.config(bg='yellow')
-        elif ignorado:
-            quadro_widget.config(bg='#888')
+        arquivo = quadro.arquivo
+        selecionado = arquivo['id'] in self.selecionados
+        if selecionado:
+            cor = 'yellow'
+        elif arquivo['ignorado']:
+            cor = '#888'
         else:
-            quadro_widget.config(bg='SystemButtonFace')
+            cor = QUADRO_FUNDO
+        # Grupos vizinhos alternam a cor da borda
+        borda = GRUPO_CORES[arquivo['grupo'] % len(GRUPO_CORES)]
+        self.scroll_canvas.itemconfig(quadro.fundo, fill=cor, outline=borda)
+        self.scroll_canvas.itemconfig(
+            quadro.chk, text='☑ Selecionado' if selecionado else '☐ Selecionar',
+            fill='#999' if arquivo['deletado'] else 'black')
+
+    def _geometria(self):
+        # (miniatura, largura, altura) de um quadro
+        size = self.thumb_size
+        return size, max(size, 240) + 16, size + 98
+
+    def _montar_layout(self):
+        # Posição de cada arquivo da página numa grade de colunas fixas.
+        # Os grupos seguem um após o outro, como na antiga disposição com
+        # LabelFrames; o título do grupo fica na faixa acima do 1º quadro.
+        _, largura, altura = self._geometria()
+        largura_canvas = self.scroll_canvas.winfo_width()
+        if largura_canvas < 400:
+            largura_canvas = 1100
+        colunas = max(1, (largura_canvas - 2 * GRADE_MARGEM +
+                      GRADE_ESPACO) // (largura + GRADE_ESPACO))
+        self._colunas = colunas
+        self._passo = GRADE_CABECALHO + altura + GRADE_ESPACO
+        self._linhas = []
+        self._pos = []
+        col = colunas
+        grupo_anterior = None
+        arquivos = self.arquivos_pagina
+        for idx, arquivo in enumerate(arquivos):
+            grupo = arquivo['grupo']
+            if grupo != grupo_anterior and col > 0 and col < colunas:
+                # Começa o grupo na linha seguinte se ele não couber no resto desta
+                restantes = 0
+                while idx + restantes < len(arquivos) and arquivos[idx + restantes]['grupo'] == grupo:
+                    restantes += 1
+                if col + restantes > colunas:
+                    col = colunas
+            if col == colunas:
+                self._linhas.append([idx, idx, []])
+                col = 0
+            linha = len(self._linhas) - 1
+            x = GRADE_MARGEM + col * (largura + GRADE_ESPACO)
+            y = GRADE_MARGEM + linha * self._passo
+            if grupo != grupo_anterior:
+                self._linhas[linha][2].append(
+                    (x, f"Grupo {grupo+1} ({arquivo['qtd_grupo']} arquivos)"))
+                grupo_anterior = grupo
+            self._linhas[linha][1] = idx + 1
+            self._pos.append((x, y + GRADE_CABECALHO))
+            col += 1
+        altura_total = GRADE_MARGEM * 2 + len(self._linhas) * self._passo
+        self.scroll_canvas.configure(
+            scrollregion=(0, 0, largura_canvas, altura_total))
+        self._liberar_visiveis()
+        self._render_visiveis()
+
+    def _relayout(self):
+        # Redimensionar só remonta o layout se o número de colunas mudar
+        self._resize_after_id = None
+        _, largura, _ = self._geometria()
+        colunas = max(1, (self.scroll_canvas.winfo_width() - 2 * GRADE_MARGEM +
+                      GRADE_ESPACO) // (largura + GRADE_ESPACO))
+        if colunas != self._colunas and self.arquivos_pagina:
+            topo = self.scroll_canvas.yview()[0]
+            self._montar_layout()
+            self.scroll_canvas.yview_moveto(topo)
+        self._render_visiveis()
+
+    def _liberar_visiveis(self):
+        for quadro in self._visiveis.values():
+            quadro.esconder()
+            self._quadros_livres.append(quadro)
+        self._visiveis = {}
+        for itens in self._cabecalhos_visiveis.values():
+            for item in itens:
+                self.scroll_canvas.itemconfig(item, state='hidden')
+                self._cabecalhos_livres.append(item)
+        self._cabecalhos_visiveis = {}
+
+    def _descartar_quadros(self):
+        # Tamanho da miniatura mudou: os quadros existentes não servem mais
+        self._liberar_visiveis()
+        self.scroll_canvas.delete('quadro')
+        self._quadros_livres = []
+        self._fotos.clear()
+
+    def _render_visiveis(self):
+        # Materializa só as linhas na área visível (mais uma de folga em
+        # cima e embaixo); quadros que saíram voltam para a reserva.
+        if not self._linhas:
+            return
+        canvas = self.scroll_canvas
+        topo = canvas.canvasy(0)
+        fundo = topo + max(canvas.winfo_height(), 1)
+        ultima = len(self._linhas) - 1
+        l0 = min(ultima, max(0, int((topo - GRADE_MARGEM) // self._passo) - 1))
+        l1 = min(ultima, max(0, int((fundo - GRADE_MARGEM) // self._passo) + 1))
+        ini, fim = self._linhas[l0][0], self._linhas[l1][1]
+        for idx in [i for i in self._visiveis if not ini <= i < fim]:
+            quadro = self._visiveis.pop(idx)
+            quadro.esconder()
+            self._quadros_livres.append(quadro)
+        for linha in [n for n in self._cabecalhos_visiveis if not l0 <= n <= l1]:
+            for item in self._cabecalhos_visiveis.pop(linha):
+                canvas.itemconfig(item, state='hidden')
+                self._cabecalhos_livres.append(item)
+        for idx in range(ini, fim):
+            if idx not in self._visiveis:
+                if self._quadros_livres:
+                    quadro = self._quadros_livres.pop()
+                else:
+                    quadro = self._novo_quadro()
+                self._visiveis[idx] = quadro
+                self._preencher_quadro(quadro, idx)
+        for linha in range(l0, l1 + 1):
+            if linha in self._cabecalhos_visiveis:
+                continue
+            itens = []
+            y = GRADE_MARGEM + linha * self._passo + 4
+            for x, texto in self._linhas[linha][2]:
+                if self._cabecalhos_livres:
+                    item = self._cabecalhos_livres.pop()
+                else:
+                    item = canvas.create_text(0, 0, anchor='nw', font=(
+                        "Arial", 10, "bold"), tags=('cabecalho',))
+                canvas.coords(item, x, y)
+                canvas.itemconfig(item, text=texto, state='normal')
+                itens.append(item)
+            self._cabecalhos_visiveis[linha] = itens
+
+    def _novo_quadro(self):
+        size, largura, altura = self._geometria()
+        quadro = QuadroCanvas(self.scroll_canvas, size, largura, altura)
+        self.scroll_canvas.tag_bind(
+            quadro.chk, '<Button-1>', lambda e, q=quadro: self._on_check(q))
+        self.scroll_canvas.tag_bind(
+            quadro.area, '<Button-1>', lambda e, q=quadro: self._on_check(q))
+        self.scroll_canvas.tag_bind(
+            quadro.img, '<Button-1>', lambda e, q=quadro: self._on_check(q))
+        self.scroll_canvas.tag_bind(
+            quadro.tag, '<Control-Button-1>', lambda e, q=quadro: self._on_ctrl_click(e, q))
+        return quadro
+
+    def _preencher_quadro(self, quadro, idx):
+        canvas = self.scroll_canvas
+        arquivo = self.arquivos_pagina[idx]
+        quadro.idx = idx
+        quadro.arquivo = arquivo
+        quadro.mover(*self._pos[idx])
+        ts = arquivo['data_criacao']
+        dt_str = str(ts) if ts else ''
+        if arquivo['dedup']:
+            dt_str += f" · {arquivo['dedup']}"
+        canvas.itemconfig(quadro.data, text=dt_str)
+        canvas.itemconfig(quadro.path, text=quadro.encurtar(arquivo['path']))
+        self._destacar_quadro(quadro)
+        fonte_grande = ("Arial", int(self.thumb_size/10), "bold")
+        if arquivo['deletado']:
+            quadro.mensagem('DELETADO', 'green', 'white', fonte_grande)
+        elif arquivo['corrompida']:
+            quadro.mensagem('CORROMPIDO', 'red', 'white', fonte_grande)
+        else:
+            foto = self._fotos.get(arquivo['id'])
+            if foto is None:
+                # Texto no lugar da miniatura até ela chegar do pool
+                quadro.mensagem('Carregando...')
+                if arquivo['id'] not in self._solicitadas:
+                    self._agendar_miniatura(arquivo, self.thumb_size, idx)
+            else:
+                self._fotos.move_to_end(arquivo['id'])
+                self._mostrar_foto(quadro, foto)
+
+    def _mostrar_foto(self, quadro, foto):
+        if isinstance(foto, str):
+            quadro.mensagem(foto)
+        else:
+            quadro.imagem(foto)
+
+    def _guardar_foto(self, arquivo_id, foto):
+        # PhotoImages recentes ficam em memória para rolar de volta sem
+        # regerar; as que estão na tela nunca saem
+        self._fotos[arquivo_id] = foto
+        if len(self._fotos) <= FOTOS_EM_MEMORIA:
+            return
+        na_tela = {q.arquivo['id'] for q in self._visiveis.values()}
+        for antigo in list(self._fotos):
+            if len(self._fotos) <= FOTOS_EM_MEMORIA:
+                break
+            if antigo not in na_tela:
+                del self._fotos[antigo]
+
+    def _atualizar_visiveis(self):
+        for quadro in self._visiveis.values():
+            self._destacar_quadro(quadro)
+
+    def _gerar_miniatura_thread(self, arquivo, size):
+        # Roda no pool: usa o cache e, se preciso, decodifica o original.
+        # Devolve (imagem, None) ou (None, texto para mostrar no quadro).
+        path = arquivo['path']
+        ext = arquivo['ext']
+        if ext in VIDEO_EXTS:
+            if not existe_video(path):
+                return None, 'Arquivo não encontrado'
+            # Ponto representativo (ou tira de N quadros), buscando pela
+            # duração já gravada no banco em vez de decodificar desde o início
+            quadros = self.quadros_video
+            duracao = arquivo['duracao'] if 'duracao' in arquivo.keys() else None
+            img = self.cache_miniaturas.obter(
+                arquivo, size, lambda s: gerar_thumb_video(path, s, quadros, duracao),
+                variante=f'tira{quadros}' if quadros > 1 else '')
+            return img, None if img is not None else 'Sem miniatura'
+        if ext in IMG_EXTS:
+            if not existe_arquivo(path):
+                return None, 'Arquivo não encontrado'
+            img = self.cache_miniaturas.obter(
+                arquivo, size, lambda s: gerar_miniatura(path, s))
+            return img, None if img is not None else 'Erro ao carregar'
+        if not existe_documento(path):
+            return None, 'Arquivo não encontrado'
+        img = gerar_miniatura_documento(path, size)
+        return img, None if img is not None else 'Sem miniatura'
+
+    def _agendar_miniatura(self, arquivo, size, idx):
+        geracao = self._thumb_geracao
+
+        def job():
+            if geracao != self._thumb_geracao:
+                return
+            if idx not in self._visiveis:
+                # Saiu da tela antes de começar: gera quando voltar
+                self._thumb_fila.put((geracao, idx, arquivo['id'], None, None))
+                return
+            try:
+                img, erro = self._gerar_miniatura_thread(arquivo, size)
+            except Exception:
+                img, erro = None, 'Erro ao carregar'
+            self._thumb_fila.put((geracao, idx, arquivo['id'], img, erro))
+        self._thumb_pendentes += 1
+        self._solicitadas.add(arquivo['id'])
+        self._thumb_futures.append(self._thumb_executor.submit(job))
+        if self._thumb_poll_id is None:
+            self._thumb_poll_id = self.after(30, self._receber_miniaturas)
+
+    def _receber_miniaturas(self):
+        # Thread principal: aplica as miniaturas prontas nos quadros visíveis
+        self._thumb_poll_id = None
+        try:
+            while True:
+                geracao, idx, arquivo_id, img, erro = self._thumb_fila.get_nowait()
+                if geracao != self._thumb_geracao:
+                    continue
+                self._thumb_pendentes -= 1
+                self._solicitadas.discard(arquivo_id)
+                quadro = self._visiveis.get(idx)
+                na_tela = quadro is not None and quadro.arquivo['id'] == arquivo_id
+                if img is None and erro is None:
+                    # Pulado por estar fora da tela; se voltou antes deste
+                    # poll, _preencher_quadro não reagendou: agenda aqui
+                    if na_tela and arquivo_id not in self._fotos:
+                        self._agendar_miniatura(quadro.arquivo, self.thumb_size, idx)
+                    continue
+                foto = ImageTk.PhotoImage(img) if img is not None else erro
+                self._guardar_foto(arquivo_id, foto)
+                if na_tela:
+                    self._mostrar_foto(quadro, foto)
+        except queue.Empty:
+            pass
+        self._thumb_futures = [f for f in self._thumb_futures if not f.done()]
+        # Um reagendamento acima pode já ter marcado o próximo poll
+        if self._thumb_pendentes > 0 and self._thumb_poll_id is None:
+            self._thumb_poll_id = self.after(30, self._receber_miniaturas)
+
+    def _cancelar_miniaturas(self):
+        self._thumb_geracao += 1
+        for future in self._thumb_futures:
+            future.cancel()
+        self._thumb_futures = []
+        self._thumb_pendentes = 0
+        self._solicitadas = set()
+        self._cancelar_prefetch()
+
+    def _cancelar_prefetch(self):
+        self._prefetch_geracao += 1
+        for future in self._prefetch_futures:
+            future.cancel()
+        self._prefetch_futures = []
+
+    def _prefetch_proxima_pagina(self, per_page):
+        # Próxima página: linhas do banco e, no cache, as miniaturas da
+        # primeira tela dela (o resto é gerado quando aparecer)
+        self.fonte.prefetch(self.page + 1, per_page)
+        if self.contexto not in ('imagens', 'videos', 'similares', 'videos_similares') or (self.page + 1) * per_page >= self.fonte.total:
+            return
+        linhas = max(self.scroll_canvas.winfo_height(), 1) // self._passo + 1
+        primeira_tela = self.fonte.pagina(self.page + 1, per_page)[:max(1, self._colunas) * linhas]
+        geracao = self._prefetch_geracao
+        size = self.thumb_size
+
+        def job(arquivo):
+            if geracao != self._prefetch_geracao:
+                return
+            try:
+                self._gerar_miniatura_thread(arquivo, size)
+            except Exception:
+                pass
+        for arquivo in primeira_tela:
+            if not arquivo['deletado'] and not arquivo['corrompida']:
+                self._prefetch_futures.append(self._prefetch_executor.submit(job, arquivo))
 
     def _show_page(self):
         # Sempre rola para o topo ao trocar de página ou aplicar filtro
         self.scroll_canvas.yview_moveto(0)
-        for widget in self.inner_frame.winfo_children():
-            widget.destroy()
-        self.img_refs.clear()
+        self._cancelar_miniaturas()
+        # Outra página/contexto/opção: as fotos em memória não valem mais
+        self._fotos.clear()
+        self.scroll_canvas.delete('vazio')
         self._update_cabecalho()
         per_page = int(self.var_per_page.get())
-        if not self.all_arquivos:
+        if not self.fonte.total:
             self.var_page_entry.set('1')
             self.lbl_total_pages.config(text='/ 1')
-            label = tk.Label(self.inner_frame, text="Tudo certo!! Não temos nada repetido por aqui!", font=(
-                "Arial", 18, "bold"), fg="green")
-            label.pack(pady=80)
+            self.arquivos_pagina = []
+            self._montar_layout()
+            if self._buscando:
+                texto = ("Buscando vídeos similares..." if self.contexto == 'videos_similares'
+                         else "Buscando imagens similares...")
+                cor = "gray"
+            else:
+                texto, cor = "Tudo certo!! Não temos nada repetido por aqui!", "green"
+            self.scroll_canvas.create_text(
+                max(self.scroll_canvas.winfo_width(), 400) // 2, 100,
+                text=texto, font=("Arial", 18, "bold"), fill=cor, tags=('vazio',))
             return
-        start = self.page * per_page
-        end = min(start + per_page, len(self.all_arquivos))
-        total_pages = max(1, (len(self.all_arquivos) - 1) // per_page + 1)
+        self.total_pages = max(1, (self.fonte.total - 1) // per_page + 1)
         self.var_page_entry.set(str(self.page+1))
-        self.lbl_total_pages.config(text=f'/ {total_pages}')
-        arquivos_pagina = self.all_arquivos[start:end]
-        grupos_pagina = {}
-        for idx, (arquivo, grupo_idx) in enumerate(arquivos_pagina):
-            grupos_pagina.setdefault(
-                grupo_idx, []).append((arquivo, start+idx))
-        largura_canvas = self.scroll_canvas.winfo_width()
-        if largura_canvas < 400:
-            largura_canvas = 1100
-        x, y = 10, 10
-        max_height_linha = 0
-        size = self.thumb_size
-        for grupo_idx in sorted(grupos_pagina.keys()):
-            grupo = grupos_pagina[grupo_idx]
-            frame_grupo = tk.LabelFrame(
-                self.inner_frame, text=f'Grupo {grupo_idx+1} ({len(self.duplicadas[grupo_idx])} arquivos)', padx=10, pady=10)
-            col = 0
-            for arquivo, global_idx in grupo:
-                path = arquivo['path']
-                corrompida = arquivo['corrompida']
-                deletado = arquivo['deletado']
-                ignorado = arquivo['ignorado'] if 'ignorado' in arquivo.keys(
-                ) else 0
-                var = self.check_vars[global_idx]
-                ts = arquivo['data_criacao'] if 'data_criacao' in arquivo.keys(
-                ) else ''
-                dt_str = str(ts) if ts else ''
-                quadro_ind = tk.Frame(frame_grupo, bd=2, relief='groove')
-                quadro_ind.grid(row=0, column=col, padx=8, pady=8, sticky='n')
-                lbl_data = tk.Label(quadro_ind, text=dt_str,
-                                    font=("Arial", 9), fg="#333")
-                lbl_data.grid(row=0, column=0, padx=5, pady=(0, 2))
-                # O destaque agora é feito via _destacar_quadro
-                self._destacar_quadro(var, quadro_ind, ignorado=bool(ignorado))
-                # Deletado
-                if deletado:
-                    canvas = tk.Canvas(
-                        quadro_ind, width=size, height=size, bg='green', highlightthickness=0)
-                    canvas.create_text(size//2, size//2, text='DELETADO',
-                                       fill='white', font=("Arial", int(size/10), "bold"))
-                    chk = tk.Checkbutton(
-                        quadro_ind, variable=var, state='disabled')
-                    txt_path = tk.Text(quadro_ind, height=3,
-                                       width=40, wrap='word', font=("Arial", 8))
-                    txt_path.insert('1.0', path)
-                    txt_path.config(state='disabled', cursor='arrow')
-                    canvas.grid(row=1, column=0, padx=5, pady=5)
-                    chk.grid(row=2, column=0, padx=5, pady=2)
-                    txt_path.grid(row=3, column=0, padx=5, pady=2)
-                elif corrompida:
-                    canvas = tk.Canvas(
-                        quadro_ind, width=size, height=size, bg='red', highlightthickness=0)
-                    canvas.create_text(size//2, size//2, text='CORROMPIDO',
-                                       fill='white', font=("Arial", int(size/10), "bold"))
-                    chk = tk.Checkbutton(
-                        quadro_ind, variable=var, command=lambda v=var, q=quadro_ind: self._destacar_quadro(v, q))
-                    txt_path = tk.Text(quadro_ind, height=3,
-                                       width=40, wrap='word', font=("Arial", 8))
-                    txt_path.insert('1.0', path)
-                    txt_path.config(state='disabled', cursor='hand2')
-                    txt_path.bind('<Control-Button-1>', lambda e,
-                                  p=path: self._open_path(e, p, open_folder=True))
-                    canvas.grid(row=1, column=0, padx=5, pady=5)
-                    chk.grid(row=2, column=0, padx=5, pady=2)
-                    txt_path.grid(row=3, column=0, padx=5, pady=2)
-                elif self.contexto == "videos" and existe_video(path):
-                    thumb_img = gerar_thumb_video(path, size)
-                    if thumb_img is not None:
-                        img_tk = ImageTk.PhotoImage(thumb_img)
-                        self.img_refs.append(img_tk)
-                        chk = tk.Checkbutton(
-                            quadro_ind, variable=var, command=lambda v=var, q=quadro_ind: self._destacar_quadro(v, q))
-                        lbl = tk.Label(quadro_ind, image=img_tk)
-                    else:
-                        chk = tk.Checkbutton(
-                            quadro_ind, variable=var, command=lambda v=var, q=quadro_ind: self._destacar_quadro(v, q))
-                        lbl = tk.Label(quadro_ind, text='Sem miniatura')
-                    txt_path = tk.Text(quadro_ind, height=3,
-                                       width=40, wrap='word', font=("Arial", 8))
-                    txt_path.insert('1.0', path)
-                    txt_path.config(state='disabled', cursor='hand2')
-                    txt_path.bind('<Control-Button-1>', lambda e,
-                                  p=path: self._open_path(e, p, open_folder=True))
-                    lbl.grid(row=1, column=0, padx=5, pady=5)
-                    chk.grid(row=2, column=0, padx=5, pady=2)
-                    txt_path.grid(row=3, column=0, padx=5, pady=2)
-                elif self.contexto == "imagens" and existe_arquivo(path):
-                    img = gerar_miniatura(path, size)
-                    if img is not None:
-                        img_tk = ImageTk.PhotoImage(img)
-                        self.img_refs.append(img_tk)
-                        chk = tk.Checkbutton(
-                            quadro_ind, variable=var, command=lambda v=var, q=quadro_ind: self._destacar_quadro(v, q))
-                        lbl = tk.Label(quadro_ind, image=img_tk)
-                    else:
-                        chk = tk.Checkbutton(
-                            quadro_ind, variable=var, command=lambda v=var, q=quadro_ind: self._destacar_quadro(v, q))
-                        lbl = tk.Label(quadro_ind, text='Erro ao carregar')
-                    txt_path = tk.Text(quadro_ind, height=3,
-                                       width=40, wrap='word', font=("Arial", 8))
-                    txt_path.insert('1.0', path)
-                    txt_path.config(state='disabled', cursor='hand2')
-                    txt_path.bind('<Control-Button-1>', lambda e,
-                                  p=path: self._open_path(e, p, open_folder=True))
-                    lbl.grid(row=1, column=0, padx=5, pady=5)
-                    chk.grid(row=2, column=0, padx=5, pady=2)
-                    txt_path.grid(row=3, column=0, padx=5, pady=2)
-                elif self.contexto == "documentos" and existe_documento(path):
-                    img = gerar_miniatura_documento(path, size)
-                    if img is not None:
-                        img_tk = ImageTk.PhotoImage(img)
-                        self.img_refs.append(img_tk)
-                        chk = tk.Checkbutton(
-                            quadro_ind, variable=var, command=lambda v=var, q=quadro_ind: self._destacar_quadro(v, q))
-                        lbl = tk.Label(quadro_ind, image=img_tk)
-                    else:
-                        chk = tk.Checkbutton(
-                            quadro_ind, variable=var, command=lambda v=var, q=quadro_ind: self._destacar_quadro(v, q))
-                        lbl = tk.Label(quadro_ind, text='Sem miniatura')
-                    txt_path = tk.Text(quadro_ind, height=3,
-                                       width=40, wrap='word', font=("Arial", 8))
-                    txt_path.insert('1.0', path)
-                    txt_path.config(state='disabled', cursor='hand2')
-                    txt_path.bind('<Control-Button-1>', lambda e,
-                                  p=path: self._open_path(e, p, open_folder=True))
-                    lbl.grid(row=1, column=0, padx=5, pady=5)
-                    chk.grid(row=2, column=0, padx=5, pady=2)
-                    txt_path.grid(row=3, column=0, padx=5, pady=2)
-                else:
-                    continue
-                col += 1
-            frame_grupo.update_idletasks()
-            w = frame_grupo.winfo_reqwidth()
-            h = frame_grupo.winfo_reqheight()
-            if x + w > largura_canvas:
-                x = 10
-                y += max_height_linha + 20
-                max_height_linha = 0
-            frame_grupo.place(x=x, y=y)
-            x += w + 20
-            if h > max_height_linha:
-                max_height_linha = h
-        # Após adicionar todos os grupos, ajusta o tamanho do inner_frame
-        total_height = y + max_height_linha + 20
-        self.inner_frame.config(width=largura_canvas, height=total_height)
-        # Após adicionar todos os grupos, atualiza a área de rolagem
-        self.inner_frame.update_idletasks()
-        self.scroll_canvas.configure(
-            scrollregion=self.scroll_canvas.bbox("all"))
-        # Garante que a largura do inner_frame acompanha a largura do canvas
-        self.scroll_canvas.itemconfig(
-            self.window_id, width=self.scroll_canvas.winfo_width())
+        self.lbl_total_pages.config(text=f'/ {self.total_pages}')
+        # Só as linhas da página atual vêm do banco; só as visíveis viram itens
+        self.arquivos_pagina = self.fonte.pagina(self.page, per_page)
+        self._montar_layout()
+        # Deixa a próxima página pronta enquanto o usuário olha esta
+        self.after_idle(self._prefetch_proxima_pagina, per_page)
 
     def _update_cabecalho(self):
         from db_utils import total_deletados_count
-        total_duplicados = len(self.all_arquivos)
+        total_duplicados = self.fonte.total
         total_del = total_deletados_count(self.conn)
         total_mb = total_deletado_mb(self.conn)
         self.lbl_total_duplicados.config(
@@ -465,13 +777,27 @@ class DuplicadasDBApp(tk.Tk):
 
     def _on_thumb_size_change(self, event=None):
         self.thumb_size = int(self.var_thumb_size.get())
+        self._descartar_quadros()
         self._show_page()
 
+    def _on_quadros_video_change(self, event=None):
+        self.quadros_video = int(self.var_quadros_video.get())
+        if self.contexto in ('videos', 'videos_similares'):
+            self._show_page()
+
     def _on_mousewheel(self, event):
         if event.num == 5 or event.delta < 0:
             self.scroll_canvas.yview_scroll(1, "units")
         elif event.num == 4 or event.delta > 0:
             self.scroll_canvas.yview_scroll(-1, "units")
+        # Rolou: a thread de disco fica para as miniaturas desta página
+        self._cancelar_prefetch()
+        self._render_visiveis()
+
+    def _on_yview(self, *args):
+        self.scroll_canvas.yview(*args)
+        self._cancelar_prefetch()
+        self._render_visiveis()
 
     def _on_page_entry(self, event=None):
         try:
@@ -499,91 +825,129 @@ class DuplicadasDBApp(tk.Tk):
             self._show_page()
 
     def _next_page(self):
-        if (self.page + 1) * int(self.var_per_page.get()) < len(self.all_arquivos):
+        if (self.page + 1) * int(self.var_per_page.get()) < self.fonte.total:
             self.page += 1
             self._show_page()
 
     def excluir_selecionados(self):
-        selecionados = [i for i, var in enumerate(
-            self.check_vars) if var.get()]
+        selecionados = list(self.fonte.arquivos_por_ids(self.selecionados))
         if not selecionados:
             messagebox.showinfo("Nenhum selecionado",
                                 "Selecione arquivos para excluir.")
             return
         if not messagebox.askyesno("Confirmar exclusão", f"Excluir {len(selecionados)} arquivos? (Eles serão enviados para a lixeira)"):
             return
+        # send2trash nas threads; mesmo nome de arquivo sempre na mesma thread
+        lote = LoteEmThreads([arquivo['path'] for arquivo in selecionados], send2trash,
+                             chave=os.path.basename).iniciar()
+
+        def concluir(lote):
+            excluidos = [path for path, _, erro in lote.resultados if erro is None]
+            erros = [(path, erro)
+                     for path, _, erro in lote.resultados if erro is not None]
+            marcar_deletados(self.conn, excluidos)
+            if erros:
+                detalhes = '\n'.join(f"{path}\n{erro}" for path, erro in erros[:10])
+                messagebox.showerror(
+                    "Erro ao excluir", f"{len(erros)} arquivos não foram excluídos:\n{detalhes}")
+            excluidos = set(excluidos)
+            self.selecionados -= {arquivo['id'] for arquivo in selecionados
+                                  if arquivo['path'] in excluidos}
+            self._refresh()
+        self._acompanhar_lote("Excluindo arquivos...", lote, concluir)
+
+    def linkar_selecionados(self):
+        # Troca cada selecionado por um hardlink/reflink para uma cópia não
+        # selecionada do mesmo grupo; o path continua existindo
+        if not self.selecionados:
+            messagebox.showinfo("Nenhum selecionado",
+                                "Selecione as cópias que devem virar links.")
+            return
+        pares, sem_origem = planejar_links(self.conn, self.selecionados)
+        if not pares:
+            messagebox.showinfo(
+                "Nada a fazer", "Deixe ao menos um arquivo de cada grupo sem seleção: ele é a cópia mantida.")
+            return
+        aviso = f"Substituir {len(pares)} arquivos por links para a cópia mantida? O conteúdo é comparado byte a byte antes."
+        if sem_origem:
+            aviso += f"\n{len(sem_origem)} arquivos sem cópia mantida serão pulados."
+        if not messagebox.askyesno("Confirmar links", aviso):
+            return
 
-        # Janela de progresso
-        progresso = tk.Toplevel(self)
-        progresso.title("Excluindo arquivos...")
-        progresso.geometry("400x100")
-        label = tk.Label(
-            progresso, text="Excluindo arquivos...", font=("Arial", 12))
-        label.pack(pady=10)
-        barra = ttk.Progressbar(progresso, length=350,
-                                mode='determinate', maximum=len(selecionados))
-        barra.pack(pady=10)
-        progresso.update()
+        # Links criados nas threads; o banco é atualizado de uma vez no fim
+        lote = LoteEmThreads(pares, ligar_par).iniciar()
+
+        def concluir(lote):
+            resultados = [r for _, r, erro in lote.resultados if erro is None]
+            marcar_ligados(self.conn, resultados)
+            recuperado = bytes_recuperados(pares, resultados)
+            falhas = [r for r in resultados if r[2] in ('erro', 'diferente')]
+            msg = f"{len(resultados) - len(falhas)} arquivos ligados, {recuperado / 1024 / 1024:.2f} MB recuperados."
+            if falhas:
+                msg += f"\n{len(falhas)} não foram ligados (conteúdo diferente ou erro)."
+            if lote.cancelado:
+                msg += f"\n{lote.total - len(lote.resultados)} não foram processados (cancelado)."
+            messagebox.showinfo("Links criados", msg)
+            self.selecionados = set()
+            self._refresh()
+        self._acompanhar_lote("Criando links...", lote, concluir)
+
+    def _aguardar_busca(self, futuro):
+        # Grade vazia com aviso enquanto a busca roda; ao terminar,
+        # _load_duplicadas roda de novo e acha os grupos prontos
+        espera = self._busca_espera
+        self._buscando = True
+        self.fonte.limpar()
+        self.page = 0
+        self.selecionados = set()
+        self._show_page()
 
-        for n, idx in enumerate(selecionados, 1):
-            arquivo, grupo_idx = self.all_arquivos[idx]
-            path = arquivo[2]
-            try:
-                send2trash(path)
-                marcar_deletado(self.conn, path)
-            except Exception as e:
-                messagebox.showerror("Erro ao excluir", f"{path}\n{e}")
-            barra['value'] = n
-            label.config(
-                text=f"Excluindo arquivo {n} de {len(selecionados)}...")
-            progresso.update()
-
-        progresso.destroy()
-        self._refresh()
+        def verificar():
+            if espera != self._busca_espera:
+                return  # outro contexto, opção ou filtro no meio tempo
+            if not futuro.done():
+                self.after(200, verificar)
+            elif futuro.exception() is not None:
+                self._buscando = False
+                self._show_page()
+                messagebox.showerror("Erro ao buscar similares", str(futuro.exception()))
+            else:
+                self._load_duplicadas()
+        self.after(200, verificar)
 
     def _load_duplicadas(self):
-        if self.contexto == 'corrompidos':
-            from db_utils import buscar_corrompidos
-            corrompidos = buscar_corrompidos(self.conn)
-            self.duplicadas = [[arq] for arq in corrompidos]
+        considerar_data = getattr(self, 'var_considerar_data', None)
+        if considerar_data is not None:
+            considerar_data = self.var_considerar_data.get()
         else:
-            considerar_data = getattr(self, 'var_considerar_data', None)
-            if considerar_data is not None:
-                considerar_data = self.var_considerar_data.get()
-            else:
-                considerar_data = True
-            considerar_deletados = getattr(
-                self, 'var_considerar_deletados', None)
-            if considerar_deletados is not None:
-                considerar_deletados = self.var_considerar_deletados.get()
-            else:
-                considerar_deletados = True
-            considerar_ignorados = getattr(
-                self, 'var_considerar_ignorados', None)
-            if considerar_ignorados is not None:
-                considerar_ignorados = self.var_considerar_ignorados.get()
-            else:
-                considerar_ignorados = True
-            from db_utils import buscar_duplicadas as buscar_duplicadas_fn
-            self.duplicadas = buscar_duplicadas_fn(
-                self.conn, self.contexto, considerar_data_criacao=considerar_data, considerar_deletados=considerar_deletados, considerar_ignorados=considerar_ignorados)
-        filtro = self.var_path_filter.get().strip()
-        if filtro and '*' not in filtro and '?' not in filtro:
-            filtro += '*'
-        filtro_lower = filtro.lower()
-        self.all_arquivos = []
-        if filtro:
-            grupos_filtrados = []
-            for grupo in self.duplicadas:
-                if any(fnmatch.fnmatch(str(arq[2]).lower(), filtro_lower) for arq in grupo):
-                    grupos_filtrados.append(grupo)
-            self.duplicadas_filtradas = grupos_filtrados
+            considerar_data = True
+        considerar_deletados = getattr(
+            self, 'var_considerar_deletados', None)
+        if considerar_deletados is not None:
+            considerar_deletados = self.var_considerar_deletados.get()
+        else:
+            considerar_deletados = True
+        considerar_ignorados = getattr(
+            self, 'var_considerar_ignorados', None)
+        if considerar_ignorados is not None:
+            considerar_ignorados = self.var_considerar_ignorados.get()
         else:
-            self.duplicadas_filtradas = self.duplicadas
-        for grupo_idx, grupo in enumerate(self.duplicadas_filtradas):
-            for arquivo in grupo:
-                self.all_arquivos.append((arquivo, grupo_idx))
+            considerar_ignorados = True
+        self._busca_espera += 1
+        self._buscando = False
+        if self.contexto in BUSCAS_EM_MEMORIA:
+            futuro = self.fonte.busca_em_segundo_plano(
+                self.contexto, considerar_deletados, considerar_ignorados)
+            if not futuro.done():
+                self._aguardar_busca(futuro)
+                return
+        # Os grupos ficam numa tabela temporária do sqlite; a GUI só guarda
+        # os totais e busca cada página sob demanda.
+        self.fonte.carregar(self.contexto, considerar_data_criacao=considerar_data, considerar_deletados=considerar_deletados,
+                            considerar_ignorados=considerar_ignorados, filtro=self.var_path_filter.get())
         self.total_pages = max(
-            1, (len(self.all_arquivos) - 1) // int(self.var_per_page.get()) + 1)
-        self.check_vars = [tk.BooleanVar() for _ in self.all_arquivos]
+            1, (self.fonte.total - 1) // int(self.var_per_page.get()) + 1)
+        if self.page >= self.total_pages:
+            self.page = self.total_pages - 1
+        self.selecionados = set()
         self._show_page()
@@ -0,0 +1,36 @@
+import hashlib
+
+# Tamanho de cada amostra lida nos hashes parciais
+PREFIX_SIZE = 64 * 1024
+SAMPLE_SIZE = 64 * 1024
+
+
+def hash_prefixo(path, prefix_size=PREFIX_SIZE):
+    # Hash dos primeiros bytes. Para arquivos menores que prefix_size
+    # é igual ao hash completo (sha256 do arquivo inteiro).
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read(prefix_size)).hexdigest()
+
+
+def hash_amostra(path, tamanho, sample_size=SAMPLE_SIZE):
+    # Hash de três amostras: início, meio e fim do arquivo
+    hasher = hashlib.sha256()
+    hasher.update(str(tamanho).encode())
+    offsets = [0, max(0, tamanho // 2 - sample_size // 2),
+               max(0, tamanho - sample_size)]
+    with open(path, 'rb') as f:
+        for offset in offsets:
+            f.seek(offset)
+            hasher.update(f.read(sample_size))
+    return hasher.hexdigest()
+
+
+def hash_completo(path, chunk_size=1024 * 1024):
+    hasher = hashlib.sha256()
+    with open(path, 'rb') as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            hasher.update(chunk)
+    return hasher.hexdigest()
@@ -1,24 +1,113 @@
+import datetime
+import io
 import os
 
-from PIL import Image
+from phash_utils import dhash, para_int64
+from PIL import ExifTags, Image
 
+# Tags do IFD1 (miniatura embutida no EXIF)
+EXIF_THUMB_OFFSET = 0x0201
+EXIF_THUMB_LENGTH = 0x0202
 
-def verificar_corrompida(path):
+
+def ler_exif(img):
+    # EXIF já lido no open (img.info), sem decodificar os pixels
+    raw = img.info.get('exif')
+    if not raw:
+        return None, None
+    exif = Image.Exif()
+    exif.load(raw)
+    return exif, raw
+
+
+def data_exif(img):
+    exif, _ = ler_exif(img)
+    if not exif:
+        return None
+    for tag, value in exif.items():
+        if ExifTags.TAGS.get(tag, tag) == 'DateTimeOriginal':
+            # Formato EXIF: 'YYYY:MM:DD HH:MM:SS'
+            try:
+                dt = datetime.datetime.strptime(value, '%Y:%m:%d %H:%M:%S')
+                return dt.strftime('%Y-%m-%d %H:%M:%S')
+            except Exception:
+                pass
+    return None
+
+
+def inspecionar_imagem(path, com_phash=True):
+    # Uma única abertura para data EXIF, integridade e hash perceptual.
+    # Devolve (corrompida, data_exif, phash). Com phash a imagem é decodificada
+    # (reduzida pelo draft), o que também detecta arquivo truncado; sem ele,
+    # só verify. O phash vem como INTEGER com sinal, pronto para o sqlite.
     try:
         with Image.open(path) as img:
-            img.verify()
-        return False
+            try:
+                data = data_exif(img)
+            except Exception:
+                data = None
+            if com_phash:
+                phash = para_int64(dhash(img))
+            else:
+                img.verify()
+                phash = None
+        return False, data, phash
     except Exception:
-        return True
+        return True, None, None
 
 
-def gerar_miniatura(path, size):
+def verificar_corrompida(path):
+    return inspecionar_imagem(path, com_phash=False)[0]
+
+
+def phash_imagem(path):
+    return inspecionar_imagem(path)[2]
+
+
+def _miniatura_exif(img, size):
+    # Câmeras gravam uma miniatura JPEG no IFD1; só serve se for grande o bastante
+    exif, raw = ler_exif(img)
+    if not exif:
+        return None
+    ifd1 = exif.get_ifd(ExifTags.IFD.IFD1)
+    offset = ifd1.get(EXIF_THUMB_OFFSET)
+    length = ifd1.get(EXIF_THUMB_LENGTH)
+    if not offset or not length:
+        return None
+    # Os offsets são relativos ao cabeçalho TIFF, depois de 'Exif\0\0'
+    start = offset + (6 if raw.startswith(b'Exif\x00\x00') else 0)
+    thumb = Image.open(io.BytesIO(raw[start:start + length]))
+    if max(thumb.size) < size:
+        return None
+    thumb.load()
+    return thumb
+
+
+def abrir_miniatura(path, size, usar_exif=True):
+    # Caminho rápido: miniatura EXIF; senão decodifica o JPEG já reduzido
+    # (draft, escala DCT 1/2, 1/4 ou 1/8); outros formatos decodificam inteiros.
+    # Devolve (miniatura ou None, corrompida). Com usar_exif=False a imagem
+    # é sempre decodificada, o que também detecta arquivo corrompido.
     try:
-        img = Image.open(path)
-        img.thumbnail((size, size))
-        return img
+        with Image.open(path) as img:
+            if usar_exif and img.format == 'JPEG':
+                try:
+                    thumb = _miniatura_exif(img, size)
+                except Exception:
+                    thumb = None
+                if thumb is not None:
+                    thumb.thumbnail((size, size))
+                    return thumb, False
+            img.draft('RGB', (size, size))
+            img.thumbnail((size, size))
+            img.load()
+            return img.copy(), False
     except Exception:
-        return None
+        return None, True
+
+
+def gerar_miniatura(path, size):
+    return abrir_miniatura(path, size)[0]
 
 
 def existe_arquivo(path):
@@ -0,0 +1,136 @@
+import os
+import stat as stat_mod
+from collections import Counter
+
+import encontra_repetidos_sqlite as scanner
+from raizes_utils import prefixo_raiz
+
+TABLE_NAME = scanner.TABLE_NAME
+
+
+class Indexador:
+    # Aplica no banco os eventos do observador (observador_utils). Movimentos
+    # só trocam o path da linha, sem recalcular hash; o resto passa pela
+    # mesma comparação de stat do delta e só arquivos novos ou alterados
+    # vão para o pool.
+    def __init__(self, conn, raizes, pool, writer):
+        # raizes: [(root_id, path, dispositivo)] de scanner.register_roots
+        self.conn = conn
+        self.raizes = raizes
+        self.pool = pool
+        self.writer = writer
+        self.contagem = Counter()
+
+    def raiz_de(self, path):
+        for root_id, raiz, _ in self.raizes:
+            if path.startswith(prefixo_raiz(raiz)):
+                return root_id
+        return None
+
+    def delta(self, size_first=False, staged=False):
+        # Delta completo: no início e quando o observador perdeu eventos
+        scanner.update_only_changes([raiz for _, raiz, _ in self.raizes], self.conn, size_first=size_first,
+                                    staged=staged, pool=self.pool, writer=self.writer)
+
+    def aplicar(self, estrutura, paths):
+        # estrutura e paths vêm de Agregador.prontos. Devolve a contagem do
+        # lote ('renomeados', 'removidos', 'novo', 'modificado'...)
+        self.contagem = Counter()
+        paths = list(paths)
+        for evento in estrutura:
+            tipo = evento[0]
+            if tipo == 'movido':
+                if not self.renomear(evento[1], evento[2]):
+                    paths.append(evento[2])  # origem não estava no banco
+            elif tipo == 'pasta_movida':
+                self.renomear_pasta(evento[1], evento[2])
+            elif tipo == 'pasta_removida':
+                self.remover_pasta(evento[1])
+        self.conn.commit()
+        if paths:
+            self.verificar(dict.fromkeys(paths))
+        return self.contagem
+
+    def renomear(self, origem, destino):
+        if self.conn.execute(f"SELECT 1 FROM {TABLE_NAME} WHERE path=? LIMIT 1", (origem,)).fetchone() is None:
+            return False
+        # Destino sobrescrito pelo movimento: a linha antiga dele sai
+        self.conn.execute(f"DELETE FROM {TABLE_NAME} WHERE path=?", (destino,))
+        self.conn.execute(f"UPDATE {TABLE_NAME} SET path=?, nome=?, root_id=? WHERE path=?",
+                          (destino, os.path.basename(destino), self.raiz_de(destino), origem))
+        self.contagem['renomeados'] += 1
+        return True
+
+    def renomear_pasta(self, origem, destino):
+        origem, destino = prefixo_raiz(origem), prefixo_raiz(destino)
+        cur = self.conn.execute(
+            f"UPDATE {TABLE_NAME} SET path = ? || substr(path, ?), root_id=? WHERE substr(path, 1, ?) = ?",
+            (destino, len(origem) + 1, self.raiz_de(destino), len(origem), origem))
+        self.contagem['renomeados'] += cur.rowcount
+
+    def remover_pasta(self, pasta):
+        pasta = prefixo_raiz(pasta)
+        cur = self.conn.execute(f"DELETE FROM {TABLE_NAME} WHERE substr(path, 1, ?) = ?",
+                                (len(pasta), pasta))
+        self.contagem['removidos'] += cur.rowcount
+
+    def origem_renomeada(self, path, st):
+        # Arquivo sem linha, mas com o mesmo (dispositivo, inode, tamanho,
+        # mtime) de uma linha cujo path sumiu: movimento que o observador
+        # não casou (MOVED_FROM/TO separados, polling, eventos perdidos)
+        if not st.st_ino:
+            return None
+        cur = self.conn.execute(
+            f"SELECT path FROM {TABLE_NAME} WHERE dispositivo=? AND inode=? AND tamanho=? AND mtime_ns=?",
+            (st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns))
+        for (candidato,) in cur.fetchall():
+            if candidato != path and not os.path.lexists(candidato):
+                return candidato
+        return None
+
+    def verificar(self, paths):
+        jobs = []
+        for path in paths:
+            ext = os.path.splitext(path)[1].lower()
+            if ext not in scanner.SCAN_EXTS:
+                continue
+            try:
+                st = os.stat(path)
+            except OSError:
+                st = None
+            row = self.conn.execute(
+                f"SELECT tamanho, mtime_ns, inode, dispositivo, data_criacao FROM {TABLE_NAME} WHERE path=?",
+                (path,)).fetchone()
+            if st is None or not stat_mod.S_ISREG(st.st_mode):
+                if row is not None:
+                    self.conn.execute(f"DELETE FROM {TABLE_NAME} WHERE path=?", (path,))
+                    self.contagem['removidos'] += 1
+                continue
+            if row is None:
+                origem = self.origem_renomeada(path, st)
+                if origem is not None:
+                    self.renomear(origem, path)
+                    continue
+                known = None
+            elif scanner.stat_unchanged(row, st):
+                continue
+            else:
+                # Linha antiga, sem mtime_ns: compara como o delta
+                known = (row[0], row[4]) if row[1] is None else ()
+            jobs.append((path, ext, True, known, st, self.raiz_de(path)))
+        self.conn.commit()
+        metricas = self.pool.metricas
+        tamanhos = set()
+        for (path, _, _, known, _, root_id), info, error in self.pool.imap(jobs):
+            if error is not None:
+                print(f'Falha ao obter metadados de : {path}')
+                metricas.erro('metadados', path, error)
+                self.contagem['erros'] += 1
+                continue
+            info['root_id'] = root_id
+            self.contagem[scanner.store_scan_result(self.writer, info, known)] += 1
+            metricas.arquivo(info)
+            if info['hash'] is not None:
+                tamanhos.add(info['tamanho'])
+        self.writer.flush()
+        scanner.hash_size_partners(self.conn, tamanhos, self.pool, self.writer)
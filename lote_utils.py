@@ -0,0 +1,61 @@
+import threading
+
+# Threads para operações de arquivo em lote (lixeira, links)
+LOTE_WORKERS = 4
+
+
+class LoteEmThreads:
+    # Roda fn(item) para cada item em threads, sem tocar no sqlite: os
+    # resultados ficam em self.resultados para a thread principal gravar
+    # tudo numa transação só. Itens com a mesma chave(item) vão para a
+    # mesma thread, em ordem (ex.: arquivos com o mesmo nome, que disputariam
+    # o mesmo nome na lixeira). A GUI acompanha por feitos/total/concluido.
+    def __init__(self, itens, fn, workers=LOTE_WORKERS, chave=None):
+        self.fn = fn
+        self.itens = list(itens)
+        self.total = len(self.itens)
+        self.feitos = 0
+        self.resultados = []  # (item, retorno, erro)
+        self._lock = threading.Lock()
+        self._cancelado = threading.Event()
+        workers = max(1, workers)
+        filas = [[] for _ in range(workers)]
+        for n, item in enumerate(self.itens):
+            destino = hash(chave(item)) if chave is not None else n
+            filas[destino % workers].append(item)
+        self._threads = [threading.Thread(target=self._rodar, args=(fila,), daemon=True)
+                         for fila in filas if fila]
+
+    def iniciar(self):
+        for thread in self._threads:
+            thread.start()
+        return self
+
+    def _rodar(self, fila):
+        for item in fila:
+            if self._cancelado.is_set():
+                return
+            try:
+                retorno, erro = self.fn(item), None
+            except Exception as e:
+                retorno, erro = None, e
+            with self._lock:
+                self.resultados.append((item, retorno, erro))
+                self.feitos += 1
+
+    def cancelar(self):
+        # Os itens em andamento terminam; os que faltam não são feitos
+        self._cancelado.set()
+
+    @property
+    def cancelado(self):
+        return self._cancelado.is_set()
+
+    @property
+    def concluido(self):
+        return not any(thread.is_alive() for thread in self._threads)
+
+    def esperar(self):
+        for thread in self._threads:
+            thread.join()
+        return self.resultados
@@ -0,0 +1,210 @@
+import heapq
+import json
+import os
+import socket
+import sys
+import threading
+import time
+from collections import Counter
+
+# Segundos entre dois snapshots JSON
+INTERVALO_METRICAS = 10.0
+# Quantos arquivos mais lentos guardar
+MAIS_LENTOS = 10
+
+
+class _DestinoUDP:
+    # udp://host:porta; um datagrama por snapshot, sem bloquear o scan
+    def __init__(self, endereco):
+        host, porta = endereco.rsplit(':', 1)
+        self.endereco = (host, int(porta))
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+
+    def write(self, linha):
+        try:
+            self.sock.sendto(linha.encode('utf-8'), self.endereco)
+        except OSError:
+            pass
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.sock.close()
+
+
+def abrir_destino(destino):
+    # None: sem snapshots; '-': stderr; udp://host:porta; senão um arquivo
+    # JSON Lines (um snapshot por linha, anexado)
+    if not destino:
+        return None
+    if destino == '-':
+        return sys.stderr
+    if destino.startswith('udp://'):
+        return _DestinoUDP(destino[len('udp://'):])
+    return open(destino, 'a', encoding='utf-8')
+
+
+class Metricas:
+    # Contadores do escaneamento. Só a thread principal registra (os
+    # workers devolvem os tempos junto com o resultado), mas os snapshots
+    # saem de uma thread própria, então tudo passa pelo lock.
+    # Os tempos por etapa são somados entre as threads: com 8 workers,
+    # 80 s de hash em 10 s de relógio é o esperado.
+    def __init__(self, destino=None, intervalo=INTERVALO_METRICAS):
+        self.inicio = time.monotonic()
+        self.etapa_atual = None
+        self.contagem = Counter()  # 'arquivos', 'sem_alteracao' e itens por etapa
+        self.etapas = Counter()  # segundos por etapa
+        self.por_ext = Counter()  # segundos por extensão
+        self.erros = Counter()  # (etapa, tipo do erro) -> quantidade
+        self.bytes_hash = 0
+        self.lentos = []  # heap (segundos, path, etapa mais demorada)
+        # RLock: o handler de Ctrl+C pode pedir o resumo no meio de um registro
+        self._lock = threading.RLock()
+        self._anterior = (self.inicio, 0, 0)
+        self._destino = abrir_destino(destino)
+        self._parar = threading.Event()
+        self._thread = None
+        if self._destino is not None:
+            self._thread = threading.Thread(
+                target=self._emitir_periodico, args=(intervalo,), daemon=True)
+            self._thread.start()
+
+    def etapa(self, nome):
+        self.etapa_atual = nome
+
+    def tempo(self, etapa, segundos):
+        with self._lock:
+            self.etapas[etapa] += segundos
+
+    def medir_iter(self, etapa, iteravel):
+        # Tempo gasto dentro do iterador (ex.: scandir + stat do walk)
+        iterador = iter(iteravel)
+        while True:
+            inicio = time.perf_counter()
+            try:
+                item = next(iterador)
+            except StopIteration:
+                self.tempo(etapa, time.perf_counter() - inicio)
+                return
+            self.tempo(etapa, time.perf_counter() - inicio)
+            yield item
+
+    def arquivo(self, info):
+        # info de scan_file_metadata, com os tempos medidos no worker
+        tempos = info.get('tempos') or {}
+        lido = (info['tamanho'] or 0) if 'hash' in tempos else 0
+        self._registrar(info['path'], info['ext'], tempos, lido)
+        with self._lock:
+            self.contagem['arquivos'] += 1
+
+    def item(self, etapa, path, segundos, lido=0):
+        # Um arquivo de um estágio de hash (prefixo, amostra, phash...)
+        self._registrar(path, os.path.splitext(path)[1].lower(),
+                        {etapa: segundos}, lido)
+        with self._lock:
+            self.contagem[etapa] += 1
+
+    def contar(self, chave, n=1):
+        with self._lock:
+            self.contagem[chave] += n
+
+    def _registrar(self, path, ext, tempos, lido):
+        total = sum(tempos.values())
+        with self._lock:
+            for etapa, segundos in tempos.items():
+                self.etapas[etapa] += segundos
+            self.por_ext[ext] += total
+            self.bytes_hash += lido
+            if tempos:
+                entrada = (total, path, max(tempos, key=tempos.get))
+                if len(self.lentos) < MAIS_LENTOS:
+                    heapq.heappush(self.lentos, entrada)
+                elif entrada > self.lentos[0]:
+                    heapq.heapreplace(self.lentos, entrada)
+
+    def erro(self, etapa, path, erro):
+        with self._lock:
+            self.erros[(etapa, type(erro).__name__)] += 1
+
+    def snapshot(self):
+        agora = time.monotonic()
+        with self._lock:
+            decorrido = max(agora - self.inicio, 1e-9)
+            vistos = self.contagem['arquivos'] + self.contagem['sem_alteracao']
+            t0, vistos0, bytes0 = self._anterior
+            janela = max(agora - t0, 1e-9)
+            self._anterior = (agora, vistos, self.bytes_hash)
+            return {
+                'instante': time.time(),
+                'decorrido_s': round(decorrido, 3),
+                'etapa_atual': self.etapa_atual,
+                'arquivos': vistos,
+                'arquivos_s': round(vistos / decorrido, 2),
+                'arquivos_s_recente': round((vistos - vistos0) / janela, 2),
+                'bytes_hash': self.bytes_hash,
+                'bytes_s': round(self.bytes_hash / decorrido),
+                'bytes_s_recente': round((self.bytes_hash - bytes0) / janela),
+                'contagem': dict(self.contagem),
+                'etapas_s': {k: round(v, 3) for k, v in self.etapas.most_common()},
+                'extensoes_s': {k: round(v, 3) for k, v in self.por_ext.most_common(10)},
+                'mais_lentos': [{'path': p, 'segundos': round(s, 3), 'etapa': e}
+                                for s, p, e in sorted(self.lentos, reverse=True)],
+                'erros': {f'{etapa}:{tipo}': n for (etapa, tipo), n in self.erros.most_common()},
+            }
+
+    def emitir(self):
+        if self._destino is None:
+            return
+        linha = json.dumps(self.snapshot(), ensure_ascii=False) + '\n'
+        self._destino.write(linha)
+        self._destino.flush()
+
+    def _emitir_periodico(self, intervalo):
+        while not self._parar.wait(intervalo):
+            try:
+                self.emitir()
+            except (OSError, ValueError):
+                return
+
+    def taxa(self):
+        # Texto curto para a linha de progresso
+        decorrido = max(time.monotonic() - self.inicio, 1e-9)
+        vistos = self.contagem['arquivos'] + self.contagem['sem_alteracao']
+        return f"{vistos / decorrido:.1f} arq/s, {self.bytes_hash / decorrido / 1024 / 1024:.1f} MB/s"
+
+    def encerrar(self):
+        # Último snapshot e fecha o destino
+        self._parar.set()
+        if self._thread is not None:
+            self._thread.join()
+        if self._destino is not None:
+            self.emitir()
+            if self._destino is not sys.stderr:
+                self._destino.close()
+            self._destino = None
+
+    def resumo(self):
+        s = self.snapshot()
+        linhas = ['', '[i] Resumo do escaneamento',
+                  f"    {s['arquivos']} arquivos em {s['decorrido_s']:.1f} s "
+                  f"({s['arquivos_s']:.1f} arq/s), "
+                  f"{s['bytes_hash'] / 1024 / 1024:.1f} MB de hash "
+                  f"({s['bytes_s'] / 1024 / 1024:.1f} MB/s)",
+                  f"    {'etapa':<24}{'segundos':>12}{'itens':>10}"]
+        for etapa, segundos in s['etapas_s'].items():
+            linhas.append(
+                f"    {etapa:<24}{segundos:>12.2f}{s['contagem'].get(etapa, ''):>10}")
+        if s['extensoes_s']:
+            linhas.append('    por extensão: ' + ', '.join(
+                f'{ext or "(sem)"} {seg:.1f} s' for ext, seg in s['extensoes_s'].items()))
+        if s['mais_lentos']:
+            linhas.append('    mais lentos:')
+            for lento in s['mais_lentos']:
+                linhas.append(
+                    f"      {lento['segundos']:>8.2f} s  {lento['etapa']:<14}{lento['path']}")
+        if s['erros']:
+            linhas.append('    erros: ' + ', '.join(
+                f'{chave} {n}' for chave, n in s['erros'].items()))
+        return '\n'.join(linhas)
@@ -0,0 +1,322 @@
+import ctypes
+import ctypes.util
+import errno
+import os
+import select
+import struct
+import sys
+import time
+
+from walk_utils import iter_files, normalize_root
+
+# Segundos sem eventos num arquivo antes de indexá-lo (rajadas de escrita
+# viram uma só verificação), e o máximo que um arquivo que não para de
+# mudar espera
+ESPERA = 2.0
+ESPERA_MAXIMA = 30.0
+# Sem inotify: segundos entre duas varreduras completas
+INTERVALO_POLLING = 60.0
+# MOVED_FROM sem o MOVED_TO (saiu da árvore) depois deste tempo é remoção
+ESPERA_MOVIMENTO = 0.5
+
+# Eventos devolvidos por ler():
+#   ('arquivo', path)             criado, alterado ou removido: o stat decide
+#   ('movido', origem, destino)   arquivo renomeado dentro das raízes
+#   ('pasta_movida', origem, destino)
+#   ('pasta_removida', path)
+#   ('transbordou',)              eventos perdidos: é preciso um delta completo
+
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_DONT_FOLLOW = 0x02000000
+IN_EXCL_UNLINK = 0x04000000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+MASCARA = (IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE |
+           IN_DELETE | IN_DELETE_SELF | IN_ONLYDIR | IN_DONT_FOLLOW | IN_EXCL_UNLINK)
+EVENTO = struct.Struct('iIII')  # wd, mask, cookie, len (struct inotify_event)
+
+
+def _libc():
+    if not sys.platform.startswith('linux'):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        libc.inotify_init1.argtypes = [ctypes.c_int]
+        libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        libc.inotify_rm_watch.argtypes = [ctypes.c_int, ctypes.c_int]
+        return libc
+    except (OSError, AttributeError):
+        return None
+
+
+def _dentro(path, pasta):
+    return path == pasta or path.startswith(os.path.join(pasta, ''))
+
+
+def _trocar_prefixo(path, origem, destino):
+    return destino + path[len(origem):]
+
+
+class ObservadorInotify:
+    # Um watch por pasta (inotify não é recursivo). Pastas criadas ou
+    # trazidas de fora ganham watch na hora e os arquivos que já estão
+    # nelas saem como 'arquivo' (podem ter sido criados antes do watch).
+    def __init__(self, raizes, exts, libc=None):
+        self.libc = libc or _libc()
+        if self.libc is None:
+            raise OSError(errno.ENOSYS, 'inotify indisponível')
+        self.exts = exts
+        self.fd = self.libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1')
+        self.pastas = {}  # wd -> pasta
+        self.movendo = {}  # cookie -> (path, é pasta, instante)
+        self.eventos = []
+        # OSError de quando os watches acabaram com o observador rodando
+        self.esgotado = None
+        try:
+            for raiz in raizes:
+                self._observar_arvore(normalize_root(raiz), novos=False)
+        except OSError:
+            self.fechar()
+            raise
+
+    def _observar(self, pasta):
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(pasta), MASCARA)
+        if wd < 0:
+            erro = ctypes.get_errno()
+            if erro in (errno.ENOENT, errno.ENOTDIR, errno.EACCES):
+                return  # sumiu ou não dá para ler: segue sem ela
+            # ENOSPC: acabou fs.inotify.max_user_watches
+            raise OSError(erro, os.strerror(erro), pasta)
+        self.pastas[wd] = pasta
+
+    def _observar_arvore(self, raiz, novos=True):
+        # Watch antes de listar: o que for criado durante a listagem gera evento
+        pilha = [raiz]
+        while pilha:
+            pasta = pilha.pop()
+            self._observar(pasta)
+            try:
+                with os.scandir(pasta) as it:
+                    for entry in it:
+                        try:
+                            if entry.is_dir(follow_symlinks=False):
+                                pilha.append(entry.path)
+                            elif novos and self._interessa(entry.path):
+                                self.eventos.append(('arquivo', entry.path))
+                        except OSError:
+                            continue
+            except OSError:
+                continue
+
+    def _observar_nova(self, pasta):
+        # Pasta criada ou trazida de fora. Sem watch (ENOSPC) ela ficaria sem
+        # eventos: guarda o erro e pede um delta completo; quem lê troca o
+        # observador por polling (ver esgotado)
+        try:
+            self._observar_arvore(pasta)
+        except OSError as e:
+            self.esgotado = e
+            self.eventos.append(('transbordou',))
+
+    def _esquecer_arvore(self, raiz):
+        for wd, pasta in list(self.pastas.items()):
+            if _dentro(pasta, raiz):
+                del self.pastas[wd]
+                self.libc.inotify_rm_watch(self.fd, wd)
+
+    def _interessa(self, path):
+        return os.path.splitext(path)[1].lower() in self.exts
+
+    def ler(self, timeout):
+        # Eventos de até timeout segundos (menos, se algo chegar antes)
+        if not self.eventos and not self.movendo:
+            select.select([self.fd], [], [], timeout)
+        elif not self.eventos:
+            select.select([self.fd], [], [], min(timeout, ESPERA_MOVIMENTO))
+        while True:
+            try:
+                dados = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                break
+            self._interpretar(dados)
+        self._movimentos_vencidos(time.monotonic())
+        eventos, self.eventos = self.eventos, []
+        return eventos
+
+    def _interpretar(self, dados):
+        pos = 0
+        while pos + EVENTO.size <= len(dados):
+            wd, mascara, cookie, tamanho = EVENTO.unpack_from(dados, pos)
+            nome = dados[pos + EVENTO.size:pos + EVENTO.size + tamanho].rstrip(b'\0')
+            pos += EVENTO.size + tamanho
+            if mascara & IN_Q_OVERFLOW:
+                self.eventos.append(('transbordou',))
+                continue
+            pasta = self.pastas.get(wd)
+            if mascara & IN_IGNORED:
+                self.pastas.pop(wd, None)
+                continue
+            if pasta is None or mascara & IN_DELETE_SELF:
+                continue
+            path = os.path.join(pasta, os.fsdecode(nome))
+            e_pasta = bool(mascara & IN_ISDIR)
+            if mascara & IN_MOVED_FROM:
+                self.movendo[cookie] = (path, e_pasta, time.monotonic())
+            elif mascara & IN_MOVED_TO:
+                self._chegou(cookie, path, e_pasta)
+            elif e_pasta:
+                if mascara & IN_CREATE:
+                    self._observar_nova(path)
+                elif mascara & IN_DELETE:
+                    self.eventos.append(('pasta_removida', path))
+            elif self._interessa(path):
+                self.eventos.append(('arquivo', path))
+
+    def _chegou(self, cookie, destino, e_pasta):
+        origem = self.movendo.pop(cookie, (None,))[0]
+        if e_pasta:
+            if origem is None:
+                self._observar_nova(destino)  # veio de fora das raízes
+                return
+            for wd, pasta in self.pastas.items():
+                if _dentro(pasta, origem):
+                    self.pastas[wd] = _trocar_prefixo(pasta, origem, destino)
+            self.eventos.append(('pasta_movida', origem, destino))
+        elif origem is not None and self._interessa(origem) and self._interessa(destino):
+            self.eventos.append(('movido', origem, destino))
+        else:
+            # De fora, ou trocou a extensão (ex.: .part -> .jpg)
+            for path in (origem, destino):
+                if path is not None and self._interessa(path):
+                    self.eventos.append(('arquivo', path))
+
+    def _movimentos_vencidos(self, agora):
+        for cookie, (path, e_pasta, instante) in list(self.movendo.items()):
+            if agora - instante < ESPERA_MOVIMENTO:
+                continue
+            del self.movendo[cookie]
+            if e_pasta:
+                self._esquecer_arvore(path)
+                self.eventos.append(('pasta_removida', path))
+            elif self._interessa(path):
+                self.eventos.append(('arquivo', path))
+
+    def fechar(self):
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+
+class ObservadorPolling:
+    # Varre as raízes a cada intervalo e compara com a varredura anterior.
+    # Arquivo que sumiu e apareceu com o mesmo (dispositivo, inode, tamanho,
+    # mtime) em outro lugar é um movimento.
+    def __init__(self, raizes, exts, intervalo=INTERVALO_POLLING):
+        self.raizes = [normalize_root(raiz) for raiz in raizes]
+        self.exts = exts
+        self.intervalo = intervalo
+        self.proxima = time.monotonic() + intervalo
+        self.estado = self._varrer()
+        self.esgotado = None  # mesma interface do ObservadorInotify
+
+    def _varrer(self):
+        estado = {}
+        for raiz in self.raizes:
+            for path, _, _, st in iter_files(raiz, self.exts):
+                estado[path] = (st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns)
+        return estado
+
+    def ler(self, timeout):
+        agora = time.monotonic()
+        if agora < self.proxima:
+            time.sleep(min(timeout, self.proxima - agora))
+            return []
+        self.proxima = time.monotonic() + self.intervalo
+        anterior, self.estado = self.estado, self._varrer()
+        sumiram = {chave: path for path, chave in anterior.items()
+                   if path not in self.estado}
+        eventos = []
+        for path, chave in self.estado.items():
+            antes = anterior.get(path)
+            if antes == chave:
+                continue
+            origem = sumiram.pop(chave, None) if antes is None and chave[1] else None
+            if origem is not None:
+                eventos.append(('movido', origem, path))
+            else:
+                eventos.append(('arquivo', path))
+        eventos.extend(('arquivo', path) for path in sumiram.values())
+        return eventos
+
+    def fechar(self):
+        pass
+
+
+def criar_observador(raizes, exts, polling=False, intervalo=INTERVALO_POLLING):
+    # inotify no Linux; polling em outros sistemas, com --polling (ex.:
+    # NFS/SMB, onde o inotify não vê mudanças feitas por outras máquinas)
+    # ou quando os watches acabam (fs.inotify.max_user_watches)
+    if not polling:
+        try:
+            return ObservadorInotify(raizes, exts)
+        except OSError as e:
+            print(f"[!] inotify indisponível ({e}); usando polling a cada {intervalo:g} s.",
+                  file=sys.stderr)
+    return ObservadorPolling(raizes, exts, intervalo)
+
+
+class Agregador:
+    # Junta os eventos até o arquivo ficar ESPERA segundos quieto. Movimentos
+    # e pastas removidas saem já na próxima rodada, na ordem em que vieram;
+    # um arquivo pendente que foi movido continua pendente com o novo nome.
+    def __init__(self, espera=ESPERA, espera_maxima=ESPERA_MAXIMA):
+        self.espera = espera
+        self.espera_maxima = espera_maxima
+        self.arquivos = {}  # path -> (primeiro evento, último evento)
+        self.estrutura = []
+        self.transbordou = False
+
+    def adicionar(self, evento, agora):
+        tipo = evento[0]
+        if tipo == 'arquivo':
+            primeiro = self.arquivos.get(evento[1], (agora,))[0]
+            self.arquivos[evento[1]] = (primeiro, agora)
+        elif tipo == 'movido':
+            _, origem, destino = evento
+            if origem in self.arquivos:
+                self.arquivos[destino] = self.arquivos.pop(origem)
+            self.estrutura.append(evento)
+        elif tipo == 'pasta_movida':
+            _, origem, destino = evento
+            for path in [p for p in self.arquivos if _dentro(p, origem)]:
+                self.arquivos[_trocar_prefixo(path, origem, destino)] = self.arquivos.pop(path)
+            self.estrutura.append(evento)
+        elif tipo == 'pasta_removida':
+            self.estrutura.append(evento)
+        elif tipo == 'transbordou':
+            self.transbordou = True
+
+    def prontos(self, agora):
+        # (eventos de estrutura, paths a verificar, transbordou)
+        estrutura, self.estrutura = self.estrutura, []
+        transbordou, self.transbordou = self.transbordou, False
+        paths = [path for path, (primeiro, ultimo) in self.arquivos.items()
+                 if agora - ultimo >= self.espera or agora - primeiro >= self.espera_maxima]
+        for path in paths:
+            del self.arquivos[path]
+        return estrutura, paths, transbordou
+
+    def pendentes(self):
+        return len(self.arquivos)
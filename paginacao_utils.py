@@ -0,0 +1,210 @@
+import fnmatch
+import threading
+from concurrent.futures import Future
+
+from db_utils import (agrupar_similares, agrupar_videos_similares,
+                      exts_do_contexto, itens_similares, itens_videos_similares)
+from file_exts import IMG_EXTS, VIDEO_EXTS
+
+
+# Contextos cujos grupos saem de uma busca em memória, fora do SQL:
+# contexto -> (lê as linhas do banco, agrupa sem usar o banco)
+BUSCAS_EM_MEMORIA = {
+    'similares': (itens_similares, agrupar_similares),
+    'videos_similares': (itens_videos_similares, agrupar_videos_similares),
+}
+
+
+def _fnmatch_lower(path, filtro):
+    return fnmatch.fnmatch(str(path).lower(), filtro)
+
+
+def normalizar_filtro(filtro):
+    # Se não houver coringa, adiciona '*' ao final
+    filtro = filtro.strip()
+    if filtro and '*' not in filtro and '?' not in filtro:
+        filtro += '*'
+    return filtro.lower()
+
+
+class FonteDuplicadas:
+    # Fonte paginada para a GUI. carregar() monta uma tabela temporária só
+    # com (seq, id do arquivo, grupo), dentro do próprio sqlite; pagina()
+    # busca apenas as linhas da página pedida (keyset em seq).
+    def __init__(self, conn):
+        self.conn = conn
+        self.total = 0
+        self.total_grupos = 0
+        self._cache = {}
+        # contexto -> (chave do estado do banco, Future com os grupos), para
+        # os contextos de BUSCAS_EM_MEMORIA
+        self._buscas = {}
+        # Escritas da própria fonte na tabela temporária (ver _chave_busca)
+        self._mudancas_temp = 0
+        conn.create_function('fnmatch_lower', 2, _fnmatch_lower)
+        conn.execute('''CREATE TEMP TABLE IF NOT EXISTS tmp_duplicadas (
+            seq INTEGER PRIMARY KEY,
+            arquivo_id INTEGER,
+            grupo INTEGER,
+            qtd_grupo INTEGER
+        )''')
+
+    def _chave_busca(self, considerar_deletados, considerar_ignorados):
+        # Muda quando o banco muda: data_version pega as escritas de outras
+        # conexões (scan, observar) e total_changes as desta, tirando as da
+        # tabela temporária
+        versao = self.conn.execute('PRAGMA data_version').fetchone()[0]
+        return (versao, self.conn.total_changes - self._mudancas_temp,
+                considerar_deletados, considerar_ignorados)
+
+    def busca_em_segundo_plano(self, contexto, considerar_deletados=True, considerar_ignorados=True):
+        # As buscas por similares levam de segundos a minutos em bancos
+        # grandes. Lê as linhas aqui (na thread da conexão) e agrupa numa
+        # thread à parte; devolve o Future. Enquanto o banco não muda, o
+        # resultado fica guardado e o carregar() do contexto (filtro,
+        # página) é rápido.
+        chave = self._chave_busca(considerar_deletados, considerar_ignorados)
+        if not self._busca_guardada(contexto, chave):
+            ler, agrupar = BUSCAS_EM_MEMORIA[contexto]
+            itens = ler(self.conn, considerar_deletados, considerar_ignorados)
+            futuro = Future()
+
+            def rodar():
+                try:
+                    futuro.set_result(agrupar(itens))
+                except Exception as e:
+                    futuro.set_exception(e)
+            threading.Thread(target=rodar, daemon=True).start()
+            self._buscas[contexto] = (chave, futuro)
+        return self._buscas[contexto][1]
+
+    def _busca_guardada(self, contexto, chave):
+        # Em andamento ou pronta para esta chave; uma busca que falhou é refeita
+        guardada = self._buscas.get(contexto)
+        if guardada is None or guardada[0] != chave:
+            return False
+        futuro = guardada[1]
+        return not futuro.done() or futuro.exception() is None
+
+    def _grupos_busca(self, contexto, considerar_deletados, considerar_ignorados):
+        chave = self._chave_busca(considerar_deletados, considerar_ignorados)
+        if not self._busca_guardada(contexto, chave):
+            ler, agrupar = BUSCAS_EM_MEMORIA[contexto]
+            futuro = Future()
+            futuro.set_result(agrupar(ler(self.conn, considerar_deletados, considerar_ignorados)))
+            self._buscas[contexto] = (chave, futuro)
+        return self._buscas[contexto][1].result()
+
+    def limpar(self):
+        # Fonte vazia (ex.: enquanto uma busca em memória roda)
+        self._cache.clear()
+        mudancas = self.conn.total_changes
+        self.conn.execute('DELETE FROM tmp_duplicadas')
+        self.conn.commit()
+        self._mudancas_temp += self.conn.total_changes - mudancas
+        self.total = self.total_grupos = 0
+
+    def carregar(self, contexto, considerar_data_criacao=True, considerar_deletados=True, considerar_ignorados=True, filtro=''):
+        self._cache.clear()
+        grupos = None
+        if contexto in BUSCAS_EM_MEMORIA:
+            grupos = self._grupos_busca(contexto, considerar_deletados, considerar_ignorados)
+        mudancas = self.conn.total_changes
+        self.conn.execute('DELETE FROM tmp_duplicadas')
+        filtro = normalizar_filtro(filtro)
+        if contexto == 'corrompidos':
+            self._carregar_corrompidos(filtro)
+        elif contexto in BUSCAS_EM_MEMORIA:
+            self._carregar_grupos(grupos, filtro)
+        else:
+            self._carregar_duplicadas(
+                contexto, considerar_data_criacao, considerar_deletados, considerar_ignorados, filtro)
+        self.total, self.total_grupos = self.conn.execute(
+            'SELECT COUNT(*), COUNT(DISTINCT grupo) FROM tmp_duplicadas').fetchone()
+        self.conn.commit()
+        self._mudancas_temp += self.conn.total_changes - mudancas
+
+    def _carregar_duplicadas(self, contexto, considerar_data_criacao, considerar_deletados, considerar_ignorados, filtro):
+        exts = exts_do_contexto(contexto)
+        if considerar_data_criacao:
+            chave = 'hash, tamanho, data_criacao'
+        else:
+            chave = 'hash, tamanho'
+        where = f"hash IS NOT NULL AND ext IN ({','.join(['?']*len(exts))})"
+        if not considerar_deletados:
+            where += " AND (deletado=0 OR deletado IS NULL)"
+        if not considerar_ignorados:
+            where += " AND (ignorado=0 OR ignorado IS NULL)"
+        having = 'COUNT(*) > 1'
+        params = list(exts)
+        if filtro:
+            # Mantém o grupo inteiro se algum arquivo dele casar com o filtro
+            having += ' AND MAX(fnmatch_lower(path, ?))'
+            params.append(filtro)
+        params += list(exts)
+        ordem = ', '.join('a.' + c.strip() for c in chave.split(','))
+        self.conn.execute(f'''INSERT INTO tmp_duplicadas (seq, arquivo_id, grupo, qtd_grupo)
+            WITH grupos AS (
+                SELECT {chave} FROM arquivos WHERE {where}
+                GROUP BY {chave} HAVING {having})
+            SELECT ROW_NUMBER() OVER (ORDER BY {ordem}, a.id),
+                   a.id,
+                   DENSE_RANK() OVER (ORDER BY {ordem}) - 1,
+                   COUNT(*) OVER (PARTITION BY {ordem})
+            FROM grupos g JOIN arquivos a USING ({chave})
+            WHERE {where}''', params)
+
+    def _carregar_corrompidos(self, filtro):
+        # Cada corrompido é um "grupo" de um arquivo só
+        exts = IMG_EXTS + VIDEO_EXTS
+        where = f"corrompida=1 AND ext IN ({','.join(['?']*len(exts))})"
+        params = list(exts)
+        if filtro:
+            where += ' AND fnmatch_lower(path, ?)'
+            params.append(filtro)
+        self.conn.execute(f'''INSERT INTO tmp_duplicadas (seq, arquivo_id, grupo, qtd_grupo)
+            SELECT ROW_NUMBER() OVER (ORDER BY id), id,
+                   ROW_NUMBER() OVER (ORDER BY id) - 1, 1
+            FROM arquivos WHERE {where}''', params)
+
+    def _carregar_grupos(self, grupos, filtro):
+        # Grupos vindos de uma busca por distância (fora do SQL); só os ids
+        # vão para a tabela temporária, como nos outros contextos
+        if filtro:
+            casam = {row[0] for row in self.conn.execute(
+                'SELECT id FROM arquivos WHERE fnmatch_lower(path, ?)', (filtro,))}
+            grupos = [ids for ids in grupos if casam.intersection(ids)]
+        linhas = []
+        for grupo, ids in enumerate(grupos):
+            for arquivo_id in ids:
+                linhas.append((len(linhas) + 1, arquivo_id, grupo, len(ids)))
+        self.conn.executemany(
+            'INSERT INTO tmp_duplicadas (seq, arquivo_id, grupo, qtd_grupo) VALUES (?, ?, ?, ?)', linhas)
+
+    def pagina(self, page, per_page):
+        chave = (page, per_page)
+        if chave not in self._cache:
+            # Mantém só a página atual e as vizinhas já buscadas
+            for antiga in [k for k in self._cache if abs(k[0] - page) > 1 or k[1] != per_page]:
+                del self._cache[antiga]
+            self._cache[chave] = self.conn.execute('''SELECT a.*, t.seq, t.grupo, t.qtd_grupo
+                FROM tmp_duplicadas t JOIN arquivos a ON a.id = t.arquivo_id
+                WHERE t.seq > ? ORDER BY t.seq LIMIT ?''', (page * per_page, per_page)).fetchall()
+        return self._cache[chave]
+
+    def prefetch(self, page, per_page):
+        if 0 <= page * per_page < self.total:
+            self.pagina(page, per_page)
+
+    def ids_por_filtro(self, filtro):
+        # Ids dos arquivos (não deletados) que casam com o filtro
+        cur = self.conn.execute('''SELECT a.id FROM tmp_duplicadas t JOIN arquivos a ON a.id = t.arquivo_id
+            WHERE fnmatch_lower(a.path, ?) AND NOT IFNULL(a.deletado, 0)''', (normalizar_filtro(filtro),))
+        return {row[0] for row in cur}
+
+    def arquivos_por_ids(self, ids, lote=500):
+        ids = sorted(ids)
+        for i in range(0, len(ids), lote):
+            parte = ids[i:i + lote]
+            yield from self.conn.execute(
+                f"SELECT * FROM arquivos WHERE id IN ({','.join(['?']*len(parte))}) ORDER BY id", parte)
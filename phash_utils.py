@@ -0,0 +1,265 @@
+import numpy as np
+from PIL import Image
+
+# dHash de 8x8 = 64 bits
+LADO_HASH = 8
+# Distância de Hamming máxima para duas imagens serem "similares"
+DISTANCIA_SIMILAR = 6
+_MASCARA_64 = (1 << 64) - 1
+# Busca em blocos: BLOCO_LINHAS x BLOCO_COLUNAS comparações por vez
+# (256 x 2048 = 4 MB de XOR em uint64 + 0,5 MB de contagens; blocos que
+# cabem no cache foram ~2x mais rápidos que blocos de 32 MB)
+BLOCO_LINHAS = 256
+BLOCO_COLUNAS = 2048
+# Multi-index hashing (k+1 faixas) abaixo desta distância; a partir dela
+# as faixas têm 5 bits ou menos e a força bruta em blocos foi mais rápida
+FAIXAS_ATE = 11
+# Popcount por byte, para NumPy sem np.bitwise_count (< 2.0)
+_BITS_POR_BYTE = np.array([bin(i).count('1')
+                          for i in range(256)], dtype=np.uint8)
+
+
+def dhash(img, lado=LADO_HASH):
+    # Hash de diferença: compara cada pixel com o vizinho da direita numa
+    # versão (lado+1)x(lado) em tons de cinza. Resiste a redimensionar,
+    # recomprimir e pequenos ajustes de cor. O draft faz o JPEG decodificar
+    # já reduzido.
+    img.draft('L', (lado * 8, lado * 8))
+    pequena = img.convert('L').resize((lado + 1, lado), Image.Resampling.BOX)
+    return dhash_pixels(pequena.tobytes(), lado)
+
+
+def dhash_pixels(px, lado=LADO_HASH):
+    # px: bytes de uma imagem em cinza de (lado+1) x lado, linha a linha
+    bits = 0
+    for y in range(lado):
+        linha = px[y * (lado + 1):(y + 1) * (lado + 1)]
+        for x in range(lado):
+            bits = (bits << 1) | (linha[x] < linha[x + 1])
+    return bits
+
+
+def para_int64(valor):
+    # O INTEGER do sqlite é de 64 bits com sinal
+    if valor is None:
+        return None
+    return valor - (1 << 64) if valor >= (1 << 63) else valor
+
+
+def de_int64(valor):
+    if valor is None:
+        return None
+    return valor & _MASCARA_64
+
+
+def distancia(a, b):
+    return (a ^ b).bit_count()
+
+
+class ArvoreBK:
+    # Árvore BK sobre a distância de Hamming: cada filho fica na aresta com
+    # a sua distância ao pai, então a busca por raio k só desce nas arestas
+    # entre d-k e d+k. Hashes repetidos ficam num único nó.
+    def __init__(self, hashes=()):
+        self.raiz = None
+        self.tamanho = 0
+        for h in hashes:
+            self.adicionar(h)
+
+    def adicionar(self, h):
+        if self.raiz is None:
+            self.raiz = (h, {})
+            self.tamanho = 1
+            return
+        no = self.raiz
+        while True:
+            d = distancia(h, no[0])
+            if d == 0:
+                return
+            filho = no[1].get(d)
+            if filho is None:
+                no[1][d] = (h, {})
+                self.tamanho += 1
+                return
+            no = filho
+
+    def buscar(self, h, k=DISTANCIA_SIMILAR):
+        # Todos os hashes da árvore a no máximo k de h
+        encontrados = []
+        pilha = [self.raiz] if self.raiz is not None else []
+        while pilha:
+            valor, filhos = pilha.pop()
+            d = distancia(h, valor)
+            if d <= k:
+                encontrados.append(valor)
+            for aresta, filho in filhos.items():
+                if d - k <= aresta <= d + k:
+                    pilha.append(filho)
+        return encontrados
+
+
+class UniaoBusca:
+    # Union-find com compressão de caminho, para juntar pares em grupos
+    def __init__(self):
+        self.pai = {}
+
+    def achar(self, x):
+        pai = self.pai
+        raiz = pai.setdefault(x, x)
+        while raiz != pai[raiz]:
+            raiz = pai[raiz]
+        while x != raiz:
+            pai[x], x = raiz, pai[x]
+        return raiz
+
+    def unir(self, a, b):
+        ra, rb = self.achar(a), self.achar(b)
+        if ra != rb:
+            self.pai[max(ra, rb)] = min(ra, rb)
+
+    def grupos(self):
+        grupos = {}
+        for x in self.pai:
+            grupos.setdefault(self.achar(x), []).append(x)
+        return list(grupos.values())
+
+
+def agrupar_por_hash(itens, uniao):
+    # itens: [(id, hash)]; hashes iguais ou ligados pela uniao formam um
+    # grupo. Devolve listas de ids (só grupos com 2 ou mais), em ordem.
+    por_hash = {}
+    for id_, h in itens:
+        por_hash.setdefault(h, []).append(id_)
+    grupos = []
+    for hashes in uniao.grupos():
+        ids = sorted(i for h in hashes for i in por_hash[h])
+        if len(ids) > 1:
+            grupos.append(ids)
+    for h, ids in por_hash.items():
+        if h not in uniao.pai and len(ids) > 1:
+            grupos.append(sorted(ids))
+    grupos.sort(key=lambda ids: ids[0])
+    return grupos
+
+
+def grupos_similares(itens, k=DISTANCIA_SIMILAR):
+    # itens: [(id, hash sem sinal)]. Monta a árvore com os hashes distintos
+    # e busca cada um nela; cada par a <= k liga dois hashes no union-find.
+    distintos = list({h for _, h in itens})
+    arvore = ArvoreBK(distintos)
+    uniao = UniaoBusca()
+    for h in distintos:
+        for vizinho in arvore.buscar(h, k):
+            if vizinho != h:
+                uniao.unir(h, vizinho)
+    return agrupar_por_hash(itens, uniao)
+
+
+def popcount64(x, out=None):
+    # Bits ligados de cada elemento de um array uint64
+    if hasattr(np, 'bitwise_count'):
+        return np.bitwise_count(x, out=out)
+    contagem = _BITS_POR_BYTE[x.view(np.uint8)].reshape(
+        *x.shape, 8).sum(axis=-1, dtype=np.uint8)
+    if out is None:
+        return contagem
+    out[...] = contagem
+    return out
+
+
+def pares_similares_numpy(hashes, k=DISTANCIA_SIMILAR, linhas=BLOCO_LINHAS, colunas=BLOCO_COLUNAS):
+    # hashes: array uint64 sem repetidos. Compara um bloco de linhas com
+    # blocos de colunas (só o triângulo superior), reaproveitando os mesmos
+    # buffers, então a memória não cresce com n. Gera pares (i, j) com i < j.
+    n = len(hashes)
+    xor = np.empty((linhas, colunas), dtype=np.uint64)
+    contagem = np.empty((linhas, colunas), dtype=np.uint8)
+    perto = np.empty((linhas, colunas), dtype=bool)
+    for i0 in range(0, n, linhas):
+        a = hashes[i0:i0 + linhas, None]
+        for j0 in range(i0, n, colunas):
+            b = hashes[None, j0:j0 + colunas]
+            r, c = a.shape[0], b.shape[1]
+            x, cont, m = xor[:r, :c], contagem[:r, :c], perto[:r, :c]
+            np.bitwise_xor(a, b, out=x)
+            popcount64(x, out=cont)
+            np.less_equal(cont, k, out=m)
+            if not m.any():
+                continue
+            ii, jj = np.nonzero(m)
+            ii += i0
+            jj += j0
+            acima = ii < jj
+            yield from zip(ii[acima].tolist(), jj[acima].tolist())
+
+
+def _faixas(k):
+    # k+1 faixas de bits contíguos cobrindo os 64 bits: [(deslocamento, máscara)]
+    quantidade = k + 1
+    base, resto = divmod(64, quantidade)
+    faixas, deslocamento = [], 0
+    for i in range(quantidade):
+        bits = base + (i < resto)
+        faixas.append((np.uint64(deslocamento), np.uint64((1 << bits) - 1)))
+        deslocamento += bits
+    return faixas
+
+
+def pares_similares_faixas(hashes, k=DISTANCIA_SIMILAR):
+    # Multi-index hashing: com os 64 bits divididos em k+1 faixas, dois
+    # hashes a no máximo k bits de distância são idênticos em pelo menos uma
+    # faixa. Para cada faixa, ordena os hashes por ela e só compara os que
+    # caem no mesmo balde; o par sai só na primeira faixa idêntica. hashes:
+    # array uint64 sem repetidos. Gera pares (i, j) com i < j.
+    if k >= FAIXAS_ATE:
+        yield from pares_similares_numpy(hashes, k)
+        return
+    n = len(hashes)
+    faixas = _faixas(k)
+    for f, (deslocamento, mascara) in enumerate(faixas):
+        chave = (hashes >> deslocamento) & mascara
+        ordem = np.argsort(chave, kind='stable')
+        chave = chave[ordem]
+        ordenados = hashes[ordem]
+        # fim[p]: onde termina o balde da posição p (na ordem); ativos: as
+        # posições p cujo balde ainda tem alguém em p + d
+        limites = np.flatnonzero(chave[1:] != chave[:-1]) + 1
+        fim = np.repeat(np.append(limites, n), np.diff(limites, prepend=0, append=n))
+        d = 1
+        ativos = np.flatnonzero(fim[:-1] > np.arange(1, n))
+        while len(ativos):
+            xor = ordenados[ativos] ^ ordenados[ativos + d]
+            perto = np.flatnonzero(popcount64(xor) <= k)
+            if len(perto):
+                xor = xor[perto]
+                primeira = np.ones(len(perto), dtype=bool)
+                for deslocamento_anterior, mascara_anterior in faixas[:f]:
+                    primeira &= ((xor >> deslocamento_anterior) & mascara_anterior) != 0
+                a = ordem[ativos[perto[primeira]]]
+                b = ordem[ativos[perto[primeira]] + d]
+                yield from zip(np.minimum(a, b).tolist(), np.maximum(a, b).tolist())
+            d += 1
+            ativos = ativos[ativos + d < fim[ativos]]
+
+
+def grupos_similares_faixas(itens, k=DISTANCIA_SIMILAR):
+    # Mesmo resultado de grupos_similares, comparando só os candidatos que
+    # dividem uma faixa (os pares de cada balde) em vez de todos os pares.
+    # É o motor padrão.
+    return _agrupar_pares(itens, k, pares_similares_faixas)
+
+
+def grupos_similares_numpy(itens, k=DISTANCIA_SIMILAR):
+    # Mesmo resultado de grupos_similares, com a força bruta vetorizada
+    # (todos os pares, em blocos)
+    return _agrupar_pares(itens, k, pares_similares_numpy)
+
+
+def _agrupar_pares(itens, k, pares):
+    # pares(hashes, k): gerador de pares (i, j) sobre os hashes distintos
+    hashes = np.unique(np.fromiter((h for _, h in itens), dtype=np.uint64, count=len(itens)))
+    valores = hashes.tolist()
+    uniao = UniaoBusca()
+    for i, j in pares(hashes, k):
+        uniao.unir(valores[i], valores[j])
+    return agrupar_por_hash(itens, uniao)
@@ -0,0 +1,79 @@
+import os
+
+from walk_utils import normalize_root
+
+# Pastas escaneadas; arquivos.root_id aponta para a raiz pela qual o
+# arquivo foi gravado
+TABELA_RAIZES = 'raizes'
+
+
+def criar_tabela_raizes(conn):
+    conn.execute(f'''CREATE TABLE IF NOT EXISTS {TABELA_RAIZES} (
+        id INTEGER PRIMARY KEY,
+        path TEXT UNIQUE,
+        dispositivo INTEGER
+    )''')
+    conn.commit()
+
+
+def ler_arquivo_raizes(path):
+    # Uma pasta por linha; linhas vazias e começando com # são ignoradas
+    with open(path, encoding='utf-8') as f:
+        linhas = (linha.strip() for linha in f)
+        return [linha for linha in linhas if linha and not linha.startswith('#')]
+
+
+def prefixo_raiz(raiz):
+    # Raiz com a barra no fim, para comparar com o início dos paths
+    return os.path.join(raiz, '')
+
+
+def normalizar_raizes(raizes):
+    # Mesmo formato dos paths gravados, sem repetidas e sem as que estão
+    # dentro de outra raiz (seriam percorridas duas vezes).
+    # Devolve (raízes, [(ignorada, raiz que a contém)]).
+    normalizadas = []
+    for raiz in raizes:
+        raiz = normalize_root(raiz)
+        if raiz not in normalizadas:
+            normalizadas.append(raiz)
+    mantidas, ignoradas = [], []
+    for raiz in normalizadas:
+        contem = next((outra for outra in normalizadas if outra != raiz
+                       and raiz.startswith(prefixo_raiz(outra))), None)
+        if contem is None:
+            mantidas.append(raiz)
+        else:
+            ignoradas.append((raiz, contem))
+    return mantidas, ignoradas
+
+
+def registrar_raizes(conn, raizes):
+    # Grava as raízes que existem e devolve [(id, path, dispositivo)], com
+    # as do mesmo dispositivo juntas (na ordem em que o primeiro aparece).
+    # Raiz que não existe (disco desmontado) fica de fora: no delta, os
+    # arquivos dela seriam removidos do banco.
+    raizes, ignoradas = normalizar_raizes(raizes)
+    for raiz, contem in ignoradas:
+        print(f"[!] {raiz} está dentro de {contem}; ignorada.")
+    grupos = {}
+    for raiz in raizes:
+        try:
+            dispositivo = os.stat(raiz).st_dev
+        except OSError as e:
+            print(f"[!] Raiz não encontrada, ignorada: {raiz} ({e})")
+            continue
+        conn.execute(f"INSERT OR IGNORE INTO {TABELA_RAIZES} (path) VALUES (?)", (raiz,))
+        conn.execute(f"UPDATE {TABELA_RAIZES} SET dispositivo=? WHERE path=?", (dispositivo, raiz))
+        root_id = conn.execute(f"SELECT id FROM {TABELA_RAIZES} WHERE path=?", (raiz,)).fetchone()[0]
+        atribuir_raiz(conn, root_id, raiz)
+        grupos.setdefault(dispositivo, []).append((root_id, raiz, dispositivo))
+    conn.commit()
+    return [raiz for grupo in grupos.values() for raiz in grupo]
+
+
+def atribuir_raiz(conn, root_id, raiz):
+    # Linhas gravadas antes da coluna root_id
+    prefixo = prefixo_raiz(raiz)
+    conn.execute("UPDATE arquivos SET root_id=? WHERE root_id IS NULL AND substr(path, 1, ?) = ?",
+                 (root_id, len(prefixo), prefixo))
@@ -0,0 +1,48 @@
+import os
+
+from walk_utils import normalize_root
+
+# Regras para escolher a cópia mantida de cada grupo, aplicadas em ordem
+# (a seguinte só desempata a anterior); no fim desempata pelo menor id.
+REGRAS = ('prefixo', 'mais-antigo', 'caminho-curto')
+# data_criacao vazia perde para qualquer data no 'mais-antigo'
+_SEM_DATA = '9999'
+
+
+def normalizar_prefixos(prefixos):
+    return [os.path.normcase(normalize_root(p)).rstrip('/\\') for p in prefixos]
+
+
+def dentro_de(path, prefixos):
+    # prefixos já normalizados; casa a pasta inteira ('/a/b' não casa '/a/bc')
+    path = os.path.normcase(path)
+    return any(path == p or path.startswith(p + os.sep) or path.startswith(p + '/')
+               for p in prefixos)
+
+
+def chave_manter(regras=(), prefixos=()):
+    # Função de ordenação: o menor elemento do grupo é o mantido
+    prefixos = normalizar_prefixos(prefixos)
+
+    def chave(row):
+        valores = []
+        for regra in regras:
+            if regra == 'prefixo':
+                valores.append(not dentro_de(row['path'], prefixos))
+            elif regra == 'mais-antigo':
+                valores.append(row['data_criacao'] or _SEM_DATA)
+            elif regra == 'caminho-curto':
+                valores.append((len(row['path']), row['path']))
+            else:
+                raise ValueError(f'regra desconhecida: {regra}')
+        valores.append(row['id'])
+        return valores
+    return chave
+
+
+def separar_grupo(grupo, chave, protegidos=()):
+    # Devolve (mantido, [descartados]) na ordem original do grupo. Arquivos
+    # dentro de 'protegidos' (prefixos normalizados) nunca são descartados.
+    mantido = min(grupo, key=chave)
+    return mantido, [row for row in grupo if row['id'] != mantido['id']
+                     and not dentro_de(row['path'], protegidos)]
@@ -0,0 +1,75 @@
+# Troca arquivos duplicados por hardlinks ou reflinks (btrfs/XFS), mantendo
+# todos os paths válidos. Em cada grupo o primeiro arquivo (menor id) é a
+# cópia mantida; os outros viram links depois de uma comparação byte a byte.
+import argparse
+import os
+import sys
+from collections import Counter
+
+from db_utils import (ensure_indices, get_connection, iter_duplicadas,
+                      marcar_ligados)
+from dedup_utils import MODOS, executar_links
+
+DB_PATH = os.path.join(os.path.dirname(
+    os.path.abspath(__file__)), 'arquivos.db')
+
+
+def pares_dos_grupos(conn, contexto, considerar_data_criacao=True):
+    pares = []
+    for grupo in iter_duplicadas(conn, contexto, considerar_data_criacao, considerar_deletados=False):
+        origem = grupo[0]
+        for destino in grupo[1:]:
+            # Já são o mesmo inode (o scan detecta pelo stat): nada a ganhar
+            if destino['inode'] and (destino['inode'], destino['dispositivo']) == (origem['inode'], origem['dispositivo']):
+                continue
+            pares.append((origem, destino))
+    return pares
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Substitui duplicados por hardlinks/reflinks em vez de excluir.')
+    parser.add_argument('--modo', choices=MODOS, default='auto',
+                        help='auto tenta reflink e cai para hardlink (padrão: auto)')
+    parser.add_argument('--contexto', choices=['imagens', 'videos', 'documentos', 'todos'], default='todos',
+                        help='Tipos de arquivo considerados (padrão: todos)')
+    parser.add_argument('--ignorar-data', action='store_true',
+                        help='Agrupa só por hash e tamanho, sem a data de criação')
+    parser.add_argument('--simular', action='store_true',
+                        help='Só mostra o que seria feito')
+    parser.add_argument('--db', default=DB_PATH,
+                        help='Banco gerado pelo encontra_repetidos_sqlite.py')
+    return parser.parse_args(argv)
+
+
+def main():
+    args = parse_args()
+    conn = get_connection(args.db)
+    ensure_indices(conn)
+    pares = pares_dos_grupos(conn, args.contexto,
+                             considerar_data_criacao=not args.ignorar_data)
+    print(f"[i] {len(pares)} arquivos a substituir por links ({args.modo}).")
+
+    def progresso(n, total, path):
+        if n % 10 == 0 or n == total:
+            sys.stdout.write(f"\r[i] {n}/{total}")
+            sys.stdout.flush()
+    resultados, recuperado = executar_links(
+        pares, args.modo, simular=args.simular, progresso=progresso)
+    sys.stdout.write("\n")
+    for destino_id, origem_id, status, _, erro in resultados:
+        if erro:
+            print(f"[!] id {destino_id}: {erro}")
+    if not args.simular:
+        marcar_ligados(conn, resultados)
+    conn.close()
+    contagem = Counter(r[2] for r in resultados)
+    if contagem:
+        print('[i] ' + ', '.join(f'{status}: {n}' for status,
+              n in sorted(contagem.items())))
+    print(f"[✓] {recuperado / 1024 / 1024:.2f} MB recuperados" +
+          (" (simulação)" if args.simular else ""))
+
+
+if __name__ == '__main__':
+    main()
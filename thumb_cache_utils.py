@@ -0,0 +1,136 @@
+import io
+import os
+import sqlite3
+import threading
+import time
+
+from PIL import Image
+
+THUMB_DB_PATH = os.path.join(os.path.dirname(
+    os.path.abspath(__file__)), 'miniaturas.db')
+# As miniaturas são geradas num destes tamanhos e reduzidas na leitura
+SIZE_BUCKETS = (128, 256, 512, 1024)
+# Limite do cache em disco (LRU por último acesso)
+MAX_CACHE_BYTES = 512 * 1024 * 1024
+
+
+def size_bucket(size):
+    for bucket in SIZE_BUCKETS:
+        if size <= bucket:
+            return bucket
+    return SIZE_BUCKETS[-1]
+
+
+def chave_arquivo(arquivo):
+    # Hash do conteúdo quando existe; sem hash (tamanho único), usa
+    # path + tamanho + mtime, que também muda quando o arquivo muda.
+    keys = arquivo.keys()
+    if 'hash' in keys and arquivo['hash']:
+        return arquivo['hash']
+    mtime = arquivo['mtime_ns'] if 'mtime_ns' in keys else None
+    return f"{arquivo['path']}|{arquivo['tamanho']}|{mtime}"
+
+
+class CacheMiniaturas:
+    # Cache persistente de miniaturas num sqlite separado (blobs WebP),
+    # chaveado por hash + tamanho. Pode ser usado de várias threads.
+    def __init__(self, db_path=THUMB_DB_PATH, max_bytes=MAX_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.execute('''CREATE TABLE IF NOT EXISTS miniaturas (
+            chave TEXT,
+            tamanho INTEGER,
+            path TEXT,
+            dados BLOB,
+            bytes INTEGER,
+            ultimo_acesso REAL,
+            PRIMARY KEY (chave, tamanho)
+        )''')
+        self.conn.execute(
+            'CREATE INDEX IF NOT EXISTS idx_miniaturas_acesso ON miniaturas (ultimo_acesso)')
+        self.conn.execute(
+            'CREATE INDEX IF NOT EXISTS idx_miniaturas_path ON miniaturas (path)')
+        self.conn.commit()
+        self.total_bytes = self.conn.execute(
+            'SELECT IFNULL(SUM(bytes), 0) FROM miniaturas').fetchone()[0]
+
+    def obter(self, arquivo, size, gerar, variante=''):
+        # gerar(size) -> PIL.Image ou None; só é chamado se não houver no cache.
+        # variante separa outras versões do mesmo arquivo (ex.: tira de quadros).
+        base = chave_arquivo(arquivo)
+        chave = f'{base}|{variante}' if variante else base
+        bucket = size_bucket(size)
+        img = self._ler(chave, bucket)
+        if img is None:
+            img = gerar(bucket)
+            if img is None:
+                return None
+            self._gravar(chave, bucket, arquivo['path'], img, base)
+        if max(img.size) > size:
+            img.thumbnail((size, size))
+        return img
+
+    def _ler(self, chave, bucket):
+        with self._lock:
+            row = self.conn.execute('SELECT dados FROM miniaturas WHERE chave=? AND tamanho=?',
+                                    (chave, bucket)).fetchone()
+            if row is None:
+                return None
+            self.conn.execute('UPDATE miniaturas SET ultimo_acesso=? WHERE chave=? AND tamanho=?',
+                              (time.time(), chave, bucket))
+            self.conn.commit()
+        try:
+            img = Image.open(io.BytesIO(row[0]))
+            img.load()
+            return img
+        except Exception:
+            return None
+
+    def _gravar(self, chave, bucket, path, img, base=None):
+        buf = io.BytesIO()
+        try:
+            if img.mode not in ('RGB', 'RGBA'):
+                img = img.convert('RGBA' if 'A' in img.getbands() or img.mode == 'P' else 'RGB')
+            img.save(buf, 'WEBP', quality=80)
+        except Exception:
+            buf = io.BytesIO()
+            img.save(buf, 'PNG')
+        dados = buf.getvalue()
+        base = base or chave
+        with self._lock:
+            # O conteúdo do path mudou (hash novo): descarta as miniaturas antigas,
+            # mantendo as outras variantes do mesmo conteúdo
+            outras = 'path=? AND substr(chave, 1, ?)<>?'
+            params = (path, len(base), base)
+            antigas = self.conn.execute(f'SELECT IFNULL(SUM(bytes), 0) FROM miniaturas WHERE {outras}',
+                                        params).fetchone()[0]
+            self.conn.execute(f'DELETE FROM miniaturas WHERE {outras}', params)
+            anterior = self.conn.execute('SELECT IFNULL(SUM(bytes), 0) FROM miniaturas WHERE chave=? AND tamanho=?',
+                                         (chave, bucket)).fetchone()[0]
+            self.conn.execute('INSERT OR REPLACE INTO miniaturas (chave, tamanho, path, dados, bytes, ultimo_acesso) VALUES (?, ?, ?, ?, ?, ?)',
+                              (chave, bucket, path, dados, len(dados), time.time()))
+            self.total_bytes += len(dados) - antigas - anterior
+            if self.total_bytes > self.max_bytes:
+                self._evict()
+            self.conn.commit()
+
+    def _evict(self):
+        # Remove as menos acessadas até ficar em 90% do limite
+        alvo = int(self.max_bytes * 0.9)
+        cur = self.conn.execute(
+            'SELECT chave, tamanho, bytes FROM miniaturas ORDER BY ultimo_acesso')
+        remover = []
+        for chave, tamanho, n_bytes in cur:
+            if self.total_bytes <= alvo:
+                break
+            remover.append((chave, tamanho))
+            self.total_bytes -= n_bytes
+        self.conn.executemany(
+            'DELETE FROM miniaturas WHERE chave=? AND tamanho=?', remover)
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
@@ -0,0 +1,94 @@
+import time
+
+import cv2
+from phash_utils import LADO_HASH, UniaoBusca, distancia, dhash_pixels
+from video_thumb_utils import duracao_video, ler_quadro
+
+# Quadros amostrados por vídeo, em posições relativas fixas da duração;
+# assim uma recodificação do mesmo vídeo amostra os mesmos instantes
+QUADROS_ASSINATURA = 8
+# Tempo máximo gasto decodificando um arquivo; passou disso, desiste
+ORCAMENTO_SEGUNDOS = 5.0
+# Distância média (bits por quadro) para dois vídeos serem "similares"
+DISTANCIA_VIDEO = 8
+# Diferença de duração aceita: o maior entre 1 s e 2%
+TOLERANCIA_DURACAO_S = 1.0
+TOLERANCIA_DURACAO_REL = 0.02
+
+
+def dhash_quadro(frame):
+    # Mesmo dHash das imagens, reduzindo o quadro (BGR) direto no OpenCV
+    cinza = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    pequeno = cv2.resize(cinza, (LADO_HASH + 1, LADO_HASH),
+                         interpolation=cv2.INTER_AREA)
+    return dhash_pixels(pequeno.tobytes(), LADO_HASH)
+
+
+def assinatura_video(path, duracao=None, quadros=QUADROS_ASSINATURA, orcamento=ORCAMENTO_SEGUNDOS):
+    # (hashes, duração): lista de dHashes (um por quadro amostrado), ou None
+    # se o vídeo não puder ser lido inteiro dentro do orçamento de tempo, e
+    # a duração usada (a recebida ou a lida pelo OpenCV, para ser gravada
+    # quando o banco não tinha)
+    limite = time.monotonic() + orcamento
+    try:
+        cap = cv2.VideoCapture(str(path))
+    except Exception:
+        return None, duracao
+    try:
+        if not duracao:
+            duracao = duracao_video(cap)
+        if not duracao:
+            return None, duracao
+        hashes = []
+        for n in range(quadros):
+            if time.monotonic() > limite:
+                return None, duracao
+            frame = ler_quadro(cap, duracao * (n + 0.5) / quadros)
+            if frame is None:
+                return None, duracao
+            hashes.append(dhash_quadro(frame))
+        return hashes, duracao
+    except Exception:
+        return None, duracao
+    finally:
+        cap.release()
+
+
+def assinatura_para_blob(hashes):
+    # 8 bytes por quadro; b'' marca "já tentado, sem assinatura"
+    if not hashes:
+        return b''
+    return b''.join(h.to_bytes(8, 'big') for h in hashes)
+
+
+def blob_para_assinatura(blob):
+    if not blob:
+        return None
+    return [int.from_bytes(blob[i:i + 8], 'big') for i in range(0, len(blob), 8)]
+
+
+def distancia_assinaturas(a, b):
+    # Média de bits diferentes por quadro, comparando quadro a quadro
+    if len(a) != len(b):
+        return LADO_HASH * LADO_HASH
+    return sum(distancia(x, y) for x, y in zip(a, b)) / len(a)
+
+
+def grupos_videos_similares(itens, limite=DISTANCIA_VIDEO):
+    # itens: [(id, duracao, assinatura)]. Ordenados por duração, cada vídeo
+    # só é comparado com os anteriores dentro da tolerância de duração (uma
+    # janela deslizante); a assinatura decide entre esses candidatos.
+    itens = sorted(itens, key=lambda item: item[1])
+    uniao = UniaoBusca()
+    inicio = 0
+    for i, (id_, duracao, assinatura) in enumerate(itens):
+        tolerancia = max(TOLERANCIA_DURACAO_S,
+                         duracao * TOLERANCIA_DURACAO_REL)
+        while duracao - itens[inicio][1] > tolerancia:
+            inicio += 1
+        for outro_id, _, outra in itens[inicio:i]:
+            if distancia_assinaturas(assinatura, outra) <= limite:
+                uniao.unir(id_, outro_id)
+    grupos = [sorted(ids) for ids in uniao.grupos() if len(ids) > 1]
+    grupos.sort(key=lambda ids: ids[0])
+    return grupos
@@ -0,0 +1,101 @@
+import json
+import shutil
+import subprocess
+import threading
+
+# Quantos ffprobe podem rodar ao mesmo tempo e quanto cada um pode demorar
+FFPROBE_CONCURRENCY = 4
+FFPROBE_TIMEOUT = 3
+
+
+class VideoMetaService:
+    # Extrai data de criação e duração dos vídeos com uma única chamada
+    # ao ffprobe por arquivo (ele só aceita uma entrada por execução).
+    # Um semáforo limita quantos processos rodam juntos, cada um com
+    # timeout próprio. Sem ffprobe no PATH, usa o OpenCV (só duração).
+    def __init__(self, concurrency=FFPROBE_CONCURRENCY, timeout=FFPROBE_TIMEOUT):
+        self.timeout = timeout
+        self.concurrency = max(1, concurrency)
+        self._slots = threading.BoundedSemaphore(self.concurrency)
+        self._ffprobe = shutil.which('ffprobe')
+
+    @property
+    def has_ffprobe(self):
+        return self._ffprobe is not None
+
+    def probe(self, path):
+        # Devolve {'creation_time': str ou None, 'duracao': float ou None}
+        if self._ffprobe is not None:
+            meta = self._probe_ffprobe(path)
+            if meta is not None:
+                return meta
+        return self._probe_cv2(path)
+
+    def _probe_ffprobe(self, path):
+        cmd = [
+            self._ffprobe, '-v', 'error',
+            '-show_entries', 'format=duration:format_tags=creation_time',
+            '-of', 'json', str(path)
+        ]
+        with self._slots:
+            try:
+                result = subprocess.run(
+                    cmd, capture_output=True, text=True, timeout=self.timeout)
+            except FileNotFoundError:
+                # ffprobe sumiu do PATH durante a execução
+                self._ffprobe = None
+                return None
+            except subprocess.TimeoutExpired:
+                return {'creation_time': None, 'duracao': None}
+        if result.returncode != 0:
+            return None
+        try:
+            fmt = json.loads(result.stdout).get('format', {})
+        except ValueError:
+            return None
+        duracao = fmt.get('duration')
+        return {
+            'creation_time': fmt.get('tags', {}).get('creation_time'),
+            'duracao': float(duracao) if duracao not in (None, 'N/A') else None
+        }
+
+    def _probe_cv2(self, path):
+        meta = {'creation_time': None, 'duracao': None}
+        try:
+            import cv2
+        except ImportError:
+            return meta
+        with self._slots:
+            cap = cv2.VideoCapture(str(path))
+            try:
+                fps = cap.get(cv2.CAP_PROP_FPS)
+                frames = cap.get(cv2.CAP_PROP_FRAME_COUNT)
+                if fps and frames:
+                    meta['duracao'] = frames / fps
+            finally:
+                cap.release()
+        return meta
+
+
+_service = None
+_service_lock = threading.Lock()
+
+
+def get_video_meta_service():
+    # Serviço único por processo (cada worker de processo tem o seu)
+    global _service
+    with _service_lock:
+        if _service is None:
+            _service = VideoMetaService()
+        return _service
+
+
+def configure_video_meta_service(concurrency=FFPROBE_CONCURRENCY, timeout=FFPROBE_TIMEOUT):
+    global _service
+    with _service_lock:
+        _service = VideoMetaService(concurrency, timeout)
+    return _service
+
+
+def probe_video(path):
+    return get_video_meta_service().probe(path)
@@ -1,27 +1,149 @@
+import math
 import os
+import threading
 from pathlib import Path
 
 import cv2
 from PIL import Image
 
+# Quantos vídeos podem ser decodificados ao mesmo tempo
+DECODIFICADORES = 2
+# Ponto "representativo" (fração da duração): foge da abertura, muitas vezes preta
+PONTO_MINIATURA = 0.1
+# Abaixo deste brilho médio (0-255) o quadro é considerado preto
+BRILHO_MINIMO = 16
+# Tentativas de achar um quadro não preto a partir do ponto escolhido
+TENTATIVAS_QUADRO = 3
 
-def get_video_thumbnail(video_path, thumb_size=200):
+
+def duracao_video(cap):
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    frames = cap.get(cv2.CAP_PROP_FRAME_COUNT)
+    if fps and frames and fps > 0 and frames > 0:
+        return frames / fps
+    return None
+
+
+def ler_quadro(cap, segundos):
+    # Posiciona por tempo (o decoder pula para o keyframe anterior) e lê um quadro
+    if segundos:
+        cap.set(cv2.CAP_PROP_POS_MSEC, segundos * 1000)
+    success, frame = cap.read()
+    if not success or frame is None:
+        return None
+    return frame
+
+
+def _quadro_representativo(cap, segundos, passo):
+    # Primeiro quadro não preto a partir de 'segundos'; senão o mais claro
+    melhor = None
+    melhor_brilho = -1
+    for tentativa in range(TENTATIVAS_QUADRO):
+        frame = ler_quadro(cap, segundos + tentativa * passo)
+        if frame is None:
+            continue
+        brilho = frame.mean()
+        if brilho >= BRILHO_MINIMO:
+            return frame
+        if brilho > melhor_brilho:
+            melhor, melhor_brilho = frame, brilho
+    return melhor
+
+
+def _para_pil(frame, size):
+    # Converte BGR para RGB
+    frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+    img = Image.fromarray(frame)
+    img.thumbnail((size, size))
+    return img
+
+
+def _montar_tira(imagens, size):
+    # Até 3 quadros numa linha (3x1 para 3); mais que isso em grade
+    # quadrada (2x2 para 4, 3x3 para 9), cabendo em size x size
+    if len(imagens) <= 3:
+        colunas = len(imagens)
+    else:
+        colunas = math.ceil(math.sqrt(len(imagens)))
+    linhas = math.ceil(len(imagens) / colunas)
+    celula = size // colunas
+    for img in imagens:
+        img.thumbnail((celula, celula))
+    largura = max(img.width for img in imagens)
+    altura = max(img.height for img in imagens)
+    tira = Image.new('RGB', (largura * colunas, altura * linhas))
+    for n, img in enumerate(imagens):
+        x = (n % colunas) * largura + (largura - img.width) // 2
+        y = (n // colunas) * altura + (altura - img.height) // 2
+        tira.paste(img, (x, y))
+    return tira
+
+
+def get_video_thumbnail(video_path, thumb_size=200, quadros=1, duracao=None):
     """
-    Gera uma miniatura PIL.Image de um frame do vídeo (primeiro frame válido).
-    Requer opencv-python (cv2).
+    Gera uma miniatura PIL.Image do vídeo a partir de um ponto representativo
+    (não do primeiro quadro, que costuma ser preto). Com quadros > 1 devolve
+    uma tira com quadros espalhados pela duração. Um único VideoCapture é
+    usado para todos os quadros. Requer opencv-python (cv2).
     """
     if not os.path.exists(video_path):
         return None
     try:
-        cap = cv2.VideoCapture(video_path)
-        success, frame = cap.read()
-        cap.release()
-        if not success or frame is None:
-            return None
-        # Converte BGR para RGB
-        frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        img = Image.fromarray(frame)
-        img.thumbnail((thumb_size, thumb_size))
-        return img
+        cap = cv2.VideoCapture(str(video_path))
+    except Exception:
+        return None
+    try:
+        if not duracao:
+            duracao = duracao_video(cap)
+        if not duracao:
+            # Sem duração conhecida não dá para buscar por tempo
+            frame = _quadro_representativo(cap, 0, 0)
+            return _para_pil(frame, thumb_size) if frame is not None else None
+        if quadros <= 1:
+            pontos = [duracao * PONTO_MINIATURA]
+        else:
+            pontos = [duracao * (n + 0.5) / quadros for n in range(quadros)]
+        passo = duracao * 0.05
+        imagens = []
+        for segundos in pontos:
+            frame = _quadro_representativo(cap, segundos, passo)
+            if frame is not None:
+                imagens.append(_para_pil(frame, thumb_size))
+        if not imagens:
+            # Alguns containers não aceitam busca: volta ao início
+            cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            frame = _quadro_representativo(cap, 0, 0)
+            return _para_pil(frame, thumb_size) if frame is not None else None
+        if len(imagens) == 1:
+            return imagens[0]
+        return _montar_tira(imagens, thumb_size)
     except Exception:
         return None
+    finally:
+        cap.release()
+
+
+class VideoThumbService:
+    # Gera miniaturas de vídeo com um número limitado de decoders abertos
+    # ao mesmo tempo, para não travar as miniaturas de imagem que dividem o
+    # mesmo pool na GUI. Cada chamada abre o seu VideoCapture: o OpenCV
+    # não reaproveita o decoder de um arquivo para outro.
+    def __init__(self, concurrency=DECODIFICADORES):
+        self.concurrency = max(1, concurrency)
+        self._slots = threading.BoundedSemaphore(self.concurrency)
+
+    def gerar(self, path, size, quadros=1, duracao=None):
+        with self._slots:
+            return get_video_thumbnail(path, size, quadros, duracao)
+
+
+_service = None
+_service_lock = threading.Lock()
+
+
+def get_video_thumb_service():
+    global _service
+    with _service_lock:
+        if _service is None:
+            _service = VideoThumbService()
+        return _service
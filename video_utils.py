@@ -1,11 +1,12 @@
 import os
 
-from video_thumb_utils import get_video_thumbnail
+from video_thumb_utils import get_video_thumb_service
 
 
-def gerar_thumb_video(path, size):
+def gerar_thumb_video(path, size, quadros=1, duracao=None):
+    # Passa pelo serviço, que limita quantos vídeos são decodificados juntos
     try:
-        thumb_img = get_video_thumbnail(path, thumb_size=size)
+        thumb_img = get_video_thumb_service().gerar(path, size, quadros, duracao)
         return thumb_img
     except Exception:
         return None
@@ -0,0 +1,55 @@
+import os
+import sys
+from pathlib import Path
+
+
+def normalize_root(root_folder):
+    # Mesmo formato de path gravado no banco (Path no Windows, posix no resto)
+    if sys.platform.startswith('win'):
+        return str(Path(root_folder))
+    return Path(root_folder).as_posix()
+
+
+def iter_files(root_folder, exts, with_stat=True, on_error=None, skip_dir=None, on_dir=None):
+    # Percorre a árvore uma única vez com os.scandir, devolvendo
+    # (path_str, nome, ext, stat) já com o stat em mãos.
+    # with_stat=False devolve stat None (só para contagem).
+    # on_error(path, erro) recebe as pastas que não puderam ser listadas.
+    # skip_dir(path) True pula a subárvore inteira (sem listar);
+    # on_dir(path, subpastas) é chamado depois do último arquivo da pasta.
+    root = normalize_root(root_folder)
+    if skip_dir is not None and skip_dir(root):
+        return
+    stack = [root]
+    while stack:
+        folder = stack.pop()
+        try:
+            entries = os.scandir(folder)
+        except OSError as e:
+            print(f'Falha ao listar : {folder}')
+            if on_error is not None:
+                on_error(folder, e)
+            continue
+        subdirs = []
+        with entries:
+            for entry in entries:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        if skip_dir is None or not skip_dir(entry.path):
+                            subdirs.append(entry.path)
+                        continue
+                    ext = os.path.splitext(entry.name)[1].lower()
+                    if ext not in exts or not entry.is_file():
+                        continue
+                    stat = entry.stat() if with_stat else None
+                except OSError:
+                    continue
+                yield entry.path, entry.name, ext, stat
+        if on_dir is not None:
+            on_dir(folder, subdirs)
+        # Mantém a ordem de os.walk (pastas em ordem de listagem)
+        stack.extend(reversed(subdirs))
+
+
+def count_files(root_folder, exts):
+    return sum(1 for _ in iter_files(root_folder, exts, with_stat=False))